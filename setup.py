@@ -21,5 +21,9 @@ setup(
         'numpy',
         'pandas',
     ],
-    python_requires='>=3.6',
+    extras_require={
+        'parquet': ['pyarrow'],
+        'jit': ['numba'],
+    },
+    python_requires='>=3.9',
 )
@@ -1,10 +1,84 @@
 # Import statements
-from .pandaplyr import *
+import importlib
 
 # Variables
 version = "0.1.8"
 author = "Nick Olivier"
 
+# Lazily loaded attributes (attribute name -> submodule). numpy and pandas are
+# only imported the first time one of these is accessed, which keeps a bare
+# `import PandaPlyr` cheap for short-lived processes.
+_LAZY_ATTRS = {name: 'pandaplyr' for name in (
+    'Pipe', 'Pipeline', 'map_frames', 'group_by', 'summarise', 'summarize', 'mutate', 'where', 'select',
+    'rename', 'arrange', 'order_by', 'left_join', 'inner_join', 'right_join',
+    'full_join', 'asof_join', 'range_join', 'union', 'union_all', 'distinct', 'fill_na', 'drop_na',
+    'sample_n', 'sample_frac', 'head', 'tail', 'compact', 'count', 'tally', 'add_count', 'spread', 'gather', 'case_when', 'if_else',
+    'column_search',
+    'set_option', 'get_option', 'np', 'pd',
+)}
+_LAZY_ATTRS.update({name: 'utils' for name in (
+    'read_titanic_dataset', 'read_grades_dataset', 'read_grades_by_year_dataset',
+    'read_subject_dataset', 'read_dataset', 'clear_dataset_cache',
+)})
+_LAZY_ATTRS.update({name: 'scan' for name in (
+    'Scan', 'scan_csv', 'scan_parquet', 'collect',
+)})
+_LAZY_ATTRS.update({name: 'incremental' for name in (
+    'MaterializedSummary', 'materialize',
+)})
+_LAZY_ATTRS.update({name: 'udfs' for name in (
+    'udf', 'UDF',
+)})
+_LAZY_ATTRS.update({name: 'backends' for name in (
+    'Backend', 'PandasBackend', 'register_backend', 'get_backend',
+)})
+_LAZY_ATTRS.update({name: 'arrow_backend' for name in (
+    'ArrowBackend', 'to_arrow', 'to_pandas',
+)})
+_LAZY_ATTRS.update({name: 'selection' for name in (
+    'Selector', 'starts_with', 'ends_with', 'contains', 'matches', 'one_of', 'col_range',
+    'of_type', 'everything',
+)})
+_LAZY_ATTRS.update({name: 'windows' for name in (
+    'rolling', 'time_bucket',
+)})
+_LAZY_ATTRS.update({name: 'runner' for name in (
+    'run_async', 'run_pipeline', 'RunResult', 'read_source',
+)})
+_LAZY_ATTRS.update({name: 'sinks' for name in (
+    'write_parquet', 'write_csv', 'write_dataset', 'WriteStats',
+)})
+_LAZY_ATTRS.update({name: 'microbatch' for name in (
+    'micro_batch', 'MicroBatch', 'latency_benchmark',
+)})
+_SUBMODULES = ('pandaplyr', 'utils', 'scan', 'incremental', 'udfs', 'backends', 'arrow_backend', 'selection',
+               'windows', 'runner', 'sinks', 'microbatch')
+
+# Names that need an optional dependency (pyarrow) stay out of `from PandaPlyr import *`,
+# which resolves every name in __all__; import them explicitly
+_OPTIONAL_ATTRS = ('ArrowBackend', 'to_arrow', 'to_pandas')
+
+__all__ = [name for name in _LAZY_ATTRS if name not in _OPTIONAL_ATTRS]
+
+
 # Function
 def greet():
     print("Welcome to PandaPlyr!")
+
+
+def __getattr__(name):
+    """
+    Resolve verbs, dataset helpers and submodules on first access (PEP 562).
+    """
+    if name in _SUBMODULES:
+        return importlib.import_module(f'.{name}', __name__)
+    if name not in _LAZY_ATTRS:
+        raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
+    module = importlib.import_module(f'.{_LAZY_ATTRS[name]}', __name__)
+    value = getattr(module, name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__) | set(_SUBMODULES))
@@ -0,0 +1,431 @@
+### Configuration
+###############################################################################
+# Import packages
+import ast
+import functools
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# Import modules
+from . import pandaplyr as pp
+from .backends import Backend, register_backend
+from .expressions import parse_condition
+from .selection import resolve_columns
+
+# summarise() aggregation names -> pyarrow hash aggregation and options
+_AGGREGATIONS = {
+    'sum': ('sum', pc.ScalarAggregateOptions(min_count=0)),
+    'mean': ('mean', None),
+    'min': ('min', None),
+    'max': ('max', None),
+    'count': ('count', None),
+    'nunique': ('count_distinct', None),
+    'first': ('first', None),
+    'last': ('last', None),
+    'var': ('variance', pc.VarianceOptions(ddof=1)),
+    'std': ('stddev', pc.VarianceOptions(ddof=1)),
+}
+
+# Python operators -> pyarrow.compute functions
+_ARITHMETIC = {ast.Add: 'add', ast.Sub: 'subtract', ast.Mult: 'multiply', ast.Pow: 'power'}
+_COMPARISONS = {ast.Eq: 'equal', ast.NotEq: 'not_equal', ast.Lt: 'less', ast.LtE: 'less_equal',
+                ast.Gt: 'greater', ast.GtE: 'greater_equal'}
+
+# Pandas merge `how` -> pyarrow join type
+_JOIN_TYPES = {'left': 'left outer', 'inner': 'inner', 'right': 'right outer', 'outer': 'full outer'}
+
+# Helper columns used to restore pandas row order after a join
+_LEFT_ROW, _RIGHT_ROW = '__pandaplyr_left_row', '__pandaplyr_right_row'
+
+
+### Define Classes & Functions
+###############################################################################
+class ArrowGroupBy:
+    """
+    The result of group_by() on a pyarrow.Table: the table and its group columns.
+
+    Parameters:
+    -----------
+    table : pyarrow.Table
+        The grouped table.
+    keys : list
+        The group columns.
+    kwargs : dict
+        Other keyword arguments given to group_by(), used when falling back to pandas.
+    """
+    def __init__(self, table, keys, kwargs):
+        self.table = table
+        self.keys = keys
+        self.kwargs = kwargs
+
+    def __repr__(self):
+        return f"ArrowGroupBy(keys={self.keys}, num_rows={self.table.num_rows})"
+
+
+class _NotCompilable(Exception):
+    """
+    Raised while compiling an expression that has to be left to pandas.
+    """
+
+
+def _divide(left, right):
+    # True division, as in pandas, even for integer columns
+    left = pc.cast(left, pa.float64()) if isinstance(left, (pa.Array, pa.ChunkedArray)) else float(left)
+    right = pc.cast(right, pa.float64()) if isinstance(right, (pa.Array, pa.ChunkedArray)) else float(right)
+    return pc.divide(left, right)
+
+
+def _call(module, name, *args, **keywords):
+    return ast.Call(func=ast.Attribute(value=ast.Name(id=module, ctx=ast.Load()), attr=name, ctx=ast.Load()),
+                    args=list(args), keywords=[ast.keyword(arg=k, value=v) for k, v in keywords.items()])
+
+
+class _ArrowCompiler(ast.NodeTransformer):
+    """
+    Rewrite a parsed condition or mutate() operation into pyarrow.compute calls over the
+    columns of a table bound to the name `t`. Comparison results have nulls replaced by
+    False (True for !=) so that boolean logic matches pandas, where comparisons with NaN
+    are False except for !=.
+    """
+    def __init__(self, columns):
+        self.columns = columns
+
+    def generic_visit(self, node):
+        raise _NotCompilable(type(node).__name__)
+
+    def visit_Name(self, node):
+        if node.id not in self.columns:
+            raise _NotCompilable(node.id)
+        return ast.Call(func=ast.Attribute(value=ast.Name(id='t', ctx=ast.Load()), attr='column', ctx=ast.Load()),
+                        args=[ast.Constant(node.id)], keywords=[])
+
+    def visit_Constant(self, node):
+        return node
+
+    def visit_UnaryOp(self, node):
+        if isinstance(node.op, ast.UAdd):
+            return self.visit(node.operand)
+        name = 'negate' if isinstance(node.op, ast.USub) else 'invert'
+        return _call('pc', name, self.visit(node.operand))
+
+    def visit_BinOp(self, node):
+        if isinstance(node.op, ast.Div):
+            return ast.Call(func=ast.Name(id='_divide', ctx=ast.Load()),
+                            args=[self.visit(node.left), self.visit(node.right)], keywords=[])
+        if type(node.op) not in _ARITHMETIC:
+            raise _NotCompilable(type(node.op).__name__)
+        return _call('pc', _ARITHMETIC[type(node.op)], self.visit(node.left), self.visit(node.right))
+
+    def visit_BoolOp(self, node):
+        name = 'and_' if isinstance(node.op, ast.And) else 'or_'
+        return functools.reduce(lambda left, right: _call('pc', name, left, right),
+                                [self.visit(value) for value in node.values])
+
+    def visit_Compare(self, node):
+        operands = [node.left] + node.comparators
+        terms = []
+        for left, op, right in zip(operands, node.ops, operands[1:]):
+            is_list = isinstance(right, (ast.List, ast.Tuple))
+            if isinstance(op, (ast.In, ast.NotIn)) or (is_list and isinstance(op, (ast.Eq, ast.NotEq))):
+                if not is_list or not all(isinstance(elt, ast.Constant) for elt in right.elts):
+                    raise _NotCompilable('in')
+                values = _call('pa', 'array', ast.List(elts=right.elts, ctx=ast.Load()))
+                term = _call('pc', 'is_in', self.visit(left), value_set=values)
+                if isinstance(op, (ast.NotIn, ast.NotEq)):
+                    term = _call('pc', 'invert', term)
+            elif type(op) in _COMPARISONS:
+                term = _call('pc', _COMPARISONS[type(op)], self.visit(left), self.visit(right))
+            else:
+                raise _NotCompilable(type(op).__name__)
+            # Pandas comparisons with NaN are False, except != which is True
+            terms.append(_call('pc', 'fill_null', term, ast.Constant(isinstance(op, ast.NotEq))))
+        return functools.reduce(lambda left, right: _call('pc', 'and_', left, right), terms)
+
+
+@functools.lru_cache(maxsize=1024)
+def _arrow_code(expression, columns, is_condition):
+    if is_condition:
+        tree = parse_condition(expression)
+    else:
+        try:
+            tree = ast.parse(expression, mode='eval')
+        except SyntaxError:
+            tree = None
+    if tree is None:
+        return None
+    try:
+        body = _ArrowCompiler(columns).visit(tree.body)
+    except _NotCompilable:
+        return None
+    return compile(ast.fix_missing_locations(ast.Expression(body=body)), '<arrow>', 'eval')
+
+
+def _evaluate(table, expression, is_condition):
+    """
+    Evaluate a string expression over a table with pyarrow.compute, or return None if it
+    cannot be compiled. Compiled expressions are cached per set of column names.
+    """
+    code = _arrow_code(expression, frozenset(table.column_names), is_condition)
+    if code is None:
+        return None
+    return eval(code, {'pa': pa, 'pc': pc, '_divide': _divide}, {'t': table})
+
+
+def _as_column(value, num_rows):
+    if isinstance(value, (pa.Array, pa.ChunkedArray)):
+        return value
+    if isinstance(value, pa.Scalar):
+        value = value.as_py()
+    return pa.array([value] * num_rows)
+
+
+def _set_column(table, name, values):
+    if name in table.column_names:
+        return table.set_column(table.column_names.index(name), name, values)
+    return table.append_column(name, values)
+
+
+def _to_pandas(data):
+    if isinstance(data, ArrowGroupBy):
+        return data.table.to_pandas() >> pp.group_by(data.keys, **data.kwargs)
+    if isinstance(data, pa.Table):
+        return data.to_pandas()
+    return data
+
+
+class ArrowBackend(Backend):
+    """
+    Backend for pyarrow.Table inputs, using pyarrow.compute kernels. It implements where,
+    select, mutate, group_by >> summarise, the joins, distinct, arrange, rename, head and
+    tail. Other verbs, expressions or aggregations it cannot translate, and joins on keys
+    with missing values, run on a pandas copy of the table and the result is converted back
+    to a pyarrow.Table.
+    """
+    name = 'arrow'
+
+    def __init__(self):
+        super().__init__()
+        self.verbs = {
+            pp.where.func: self.where,
+            pp.select.func: self.select,
+            pp.mutate.func: self.mutate,
+            pp.group_by.func: self.group_by,
+            pp.summarise.func: self.summarise,
+            pp.left_join.func: functools.partial(self._join, 'left', pp.left_join),
+            pp.inner_join.func: functools.partial(self._join, 'inner', pp.inner_join),
+            pp.right_join.func: functools.partial(self._join, 'right', pp.right_join),
+            pp.full_join.func: functools.partial(self._join, 'outer', pp.full_join),
+            pp.distinct.func: self.distinct,
+            pp.arrange.func: self.arrange,
+            pp.rename.func: self.rename,
+            pp.head.func: self.head,
+            pp.tail.func: self.tail,
+        }
+
+    def fallback(self, func, data, args, kwargs):
+        """
+        Run a verb on a pandas copy of the data. Verbs defined outside PandaPlyr are called
+        with the table unchanged.
+        """
+        if func.__module__ != pp.__name__:
+            return func(data, *args, **kwargs)
+        args = [_to_pandas(arg) for arg in args]
+        result = func(_to_pandas(data), *args, **kwargs)
+        if isinstance(result, pd.DataFrame):
+            return pa.Table.from_pandas(result, preserve_index=False)
+        return result
+
+    def where(self, table, condition):
+        try:
+            mask = _evaluate(table, condition, is_condition=True)
+        except Exception:
+            mask = None
+        if not isinstance(mask, (pa.Array, pa.ChunkedArray)):
+            return self.fallback(pp.where.func, table, (condition,), {})
+        return table.filter(mask)
+
+    def select(self, table, *args):
+        if all(isinstance(arg, str) for arg in args):
+            return table.select(list(args))
+        # Resolve selectors against an empty pandas frame with the same columns and dtypes
+        return table.select(resolve_columns(table.schema.empty_table().to_pandas(), args).tolist())
+
+    def mutate(self, table, **kwargs):
+        operations = list(kwargs.items())
+        for position, (column, operation) in enumerate(operations):
+            values = operation
+            if isinstance(operation, str):
+                try:
+                    values = _evaluate(table, operation, is_condition=False)
+                except Exception:
+                    values = None
+            if values is None or callable(operation):
+                # Run this and the remaining operations on pandas
+                return self.fallback(pp.mutate.func, table, (), dict(operations[position:]))
+            table = _set_column(table, column, _as_column(values, table.num_rows))
+        return table
+
+    def group_by(self, table, *args, **kwargs):
+        group_columns = list(args[0]) if isinstance(args[0], list) else list(args)
+        for gc in group_columns:
+            if gc not in table.column_names:
+                raise KeyError(f"Column '{gc}' does not exist in the DataFrame")
+        return ArrowGroupBy(table, group_columns, kwargs)
+
+    def summarise(self, grouped, *args, **kwargs):
+        aggregations = {}
+        for arg in args:
+            aggregations.update({col: (col, agg) for col, agg in arg.items()} if isinstance(arg, dict) else {None: None})
+        aggregations.update(kwargs)
+        supported = (isinstance(grouped, ArrowGroupBy)
+                     and set(grouped.kwargs) <= {'as_index', 'factorize'} and grouped.kwargs.get('as_index', False) is False
+                     and all(isinstance(spec, tuple) and len(spec) == 2 and spec[1] in _AGGREGATIONS
+                             for spec in aggregations.values()))
+        if not supported:
+            return self.fallback(pp.summarise.func, grouped, args, kwargs)
+
+        table, keys = grouped.table, grouped.keys
+        requests = list(dict.fromkeys((col, agg) for col, agg in aggregations.values()))
+        result = table.group_by(keys, use_threads=False).aggregate(
+            [(col, *_AGGREGATIONS[agg]) if _AGGREGATIONS[agg][1] else (col, _AGGREGATIONS[agg][0]) for col, agg in requests])
+        # Pandas drops groups with missing keys and sorts by the keys
+        for key in keys:
+            result = result.filter(pc.is_valid(result.column(key)))
+        result = result.sort_by([(key, 'ascending') for key in keys])
+        columns = {key: result.column(key) for key in keys}
+        for name, (col, agg) in aggregations.items():
+            columns[name] = result.column(f'{col}_{_AGGREGATIONS[agg][0]}')
+        return pa.table(columns)
+
+    def _join(self, how, verb, left, right, on=None, fill_na=None, factorize=None, **kwargs):
+        if kwargs or not isinstance(right, pa.Table) or (how == 'inner' and fill_na is not None):
+            if fill_na is not None:
+                kwargs['fill_na'] = fill_na
+            return self.fallback(verb.func, left, (right,), dict(on=on, factorize=factorize, **kwargs))
+        keys = [on] if isinstance(on, str) else list(on) if on is not None else \
+            [col for col in left.column_names if col in right.column_names]
+        if any(key in left.column_names and key in right.column_names
+               and (left.column(key).null_count or right.column(key).null_count) for key in keys):
+            # Arrow joins never match null keys, while pandas matches them to each other
+            if fill_na is not None:
+                kwargs['fill_na'] = fill_na
+            return self.fallback(verb.func, left, (right,), dict(on=on, factorize=factorize, **kwargs))
+        overlap = set(left.column_names) & set(right.column_names) - set(keys)
+        left_rows = left.append_column(_LEFT_ROW, pa.array(np.arange(left.num_rows)))
+        right_rows = right.append_column(_RIGHT_ROW, pa.array(np.arange(right.num_rows)))
+        joined = left_rows.join(right_rows, keys=keys, join_type=_JOIN_TYPES[how],
+                                left_suffix='_x', right_suffix='_y', coalesce_keys=True)
+
+        # Restore pandas row order: left order for left and inner joins, right order for
+        # right joins, and sorted keys for full joins
+        if how == 'right':
+            order = [(_RIGHT_ROW, 'ascending'), (_LEFT_ROW, 'ascending')]
+        else:
+            order = [(_LEFT_ROW, 'ascending'), (_RIGHT_ROW, 'ascending')]
+        if how == 'outer':
+            order = [(key, 'ascending') for key in keys] + order
+        joined = joined.sort_by(order)
+
+        columns = [f'{col}_x' if col in overlap else col for col in left.column_names]
+        columns += [f'{col}_y' if col in overlap else col for col in right.column_names if col not in keys]
+        joined = joined.select(columns)
+        if fill_na is not None:
+            # Only columns missing from the side whose rows are all kept, as in pandas
+            if isinstance(fill_na, dict):
+                kept = {'left': left.column_names, 'right': right.column_names}.get(how, ())
+                shared = set(left.column_names) & set(right.column_names) if how == 'outer' else set(kept)
+                fill_values = {col: value for col, value in fill_na.items() if col not in shared}
+            else:
+                fill_values = dict.fromkeys(joined.column_names, fill_na)
+            for col, value in fill_values.items():
+                try:
+                    joined = _set_column(joined, col, pc.fill_null(joined.column(col), value))
+                except pa.ArrowException:
+                    # Arrow columns have one type, so nulls stay where the value does not fit
+                    continue
+        return joined
+
+    def distinct(self, table, *args):
+        # Keep the first row of each distinct combination, in input order
+        columns = list(args) or table.column_names
+        rows = table.append_column(_LEFT_ROW, pa.array(np.arange(table.num_rows)))
+        first_rows = rows.group_by(columns, use_threads=False).aggregate([(_LEFT_ROW, 'min')])
+        indices = first_rows.column(f'{_LEFT_ROW}_min')
+        return table.take(pc.take(indices, pc.sort_indices(indices)))
+
+    def arrange(self, table, column_name, order=None, ascending=None):
+        if ascending is None:
+            if isinstance(order, str):
+                if order.lower() not in ('asc', 'desc'):
+                    raise ValueError('Order should be either "asc" or "desc".')
+                ascending = order.lower() == 'asc'
+            else:
+                ascending = True
+        elif not isinstance(ascending, bool):
+            raise ValueError('Ascending should be either True or False.')
+        direction = 'ascending' if ascending else 'descending'
+        columns = column_name if isinstance(column_name, list) else [column_name]
+        return table.sort_by([(col, direction) for col in columns])
+
+    def rename(self, table, **kwargs):
+        # Same column order as the pandas version: renamed columns move to the end
+        for column, operation in kwargs.items():
+            values = table.column(operation)
+            table = _set_column(table.drop_columns([operation]), column, values)
+        return table
+
+    def head(self, table, n=5):
+        return table.slice(0, n)
+
+    def tail(self, table, n=5):
+        return table.slice(max(table.num_rows - n, 0))
+
+
+@pp.Pipe
+def to_arrow(df, preserve_index=False):
+    """
+    Convert a pandas DataFrame to a pyarrow.Table, so that the following verbs run on the
+    Arrow backend. Numeric columns without missing values are converted without copying.
+
+    Parameters:
+    -----------
+    df : pandas.DataFrame
+        The input DataFrame.
+    preserve_index : bool, default False
+        Store the index as a column.
+
+    Returns:
+    --------
+    pyarrow.Table
+        The converted table.
+    """
+    if isinstance(df, pa.Table):
+        return df
+    return pa.Table.from_pandas(df, preserve_index=preserve_index)
+
+
+@pp.Pipe
+def to_pandas(table, arrow_dtypes=False):
+    """
+    Convert a pyarrow.Table back to a pandas DataFrame.
+
+    Parameters:
+    -----------
+    table : pyarrow.Table
+        The input table.
+    arrow_dtypes : bool, default False
+        Keep the Arrow memory by using pandas.ArrowDtype columns instead of NumPy dtypes.
+
+    Returns:
+    --------
+    pandas.DataFrame
+        The converted DataFrame.
+    """
+    if isinstance(table, pd.DataFrame):
+        return table
+    return table.to_pandas(types_mapper=pd.ArrowDtype if arrow_dtypes else None)
+
+
+register_backend(ArrowBackend(), pa.Table, ArrowGroupBy)
@@ -0,0 +1,121 @@
+### Configuration
+###############################################################################
+# Import packages
+import importlib
+import pandas as pd
+
+# Backend instances by input type, filled by register_backend()
+_BACKENDS = {}
+
+# Backends registered on first use, so optional dependencies are only imported when
+# data of their type reaches a verb (fully qualified type name -> module)
+_LAZY_BACKENDS = {
+    'pyarrow.lib.Table': '.arrow_backend',
+}
+
+
+### Define Classes & Functions
+###############################################################################
+class Backend:
+    """
+    Base class for execution backends. Verbs dispatch on the type of their input: when
+    data reaches a verb, the backend registered for its type runs the verb.
+
+    Subclasses fill `verbs`, a dictionary mapping verb functions (e.g. where.func) to
+    methods with the same signature. Verbs without an entry go to fallback().
+    """
+    name = None
+
+    def __init__(self):
+        self.verbs = {}
+
+    def __repr__(self):
+        return f"{type(self).__name__}()"
+
+    def run(self, func, data, args, kwargs):
+        """
+        Run a verb on data of this backend's type.
+
+        Parameters:
+        -----------
+        func : function
+            The verb's function.
+        data : Any
+            The input data.
+        args : tuple
+            Positional arguments bound to the verb.
+        kwargs : dict
+            Keyword arguments bound to the verb.
+        """
+        method = self.verbs.get(func)
+        if method is None:
+            return self.fallback(func, data, args, kwargs)
+        return method(data, *args, **kwargs)
+
+    def fallback(self, func, data, args, kwargs):
+        """
+        Run a verb the backend does not implement. By default the verb function is called as is.
+        """
+        return func(data, *args, **kwargs)
+
+
+class PandasBackend(Backend):
+    """
+    The default backend: verbs run their pandas implementation unchanged.
+    """
+    name = 'pandas'
+
+
+def register_backend(backend, *types):
+    """
+    Register a backend for one or more input types.
+
+    Parameters:
+    -----------
+    backend : Backend
+        The backend instance.
+    *types : type
+        The input types the backend handles. Subclasses are matched too.
+    """
+    for data_type in types:
+        _BACKENDS[data_type] = backend
+    # Drop cached lookups for subclasses, which may now resolve differently
+    for data_type in [t for t in _BACKENDS if any(issubclass(t, registered) for registered in types)]:
+        if data_type not in types:
+            del _BACKENDS[data_type]
+
+
+def get_backend(data):
+    """
+    The backend registered for the type of data (or one of its base classes), or None.
+
+    Parameters:
+    -----------
+    data : Any
+        The input of a verb.
+
+    Returns:
+    --------
+    Backend or None
+        The backend, or None if no backend handles this type.
+    """
+    data_type = type(data)
+    try:
+        return _BACKENDS[data_type]
+    except KeyError:
+        pass
+    backend = None
+    for base in data_type.__mro__:
+        if base not in _BACKENDS:
+            module = _LAZY_BACKENDS.get(f'{base.__module__}.{base.__qualname__}')
+            if module is None:
+                continue
+            importlib.import_module(module, __package__)
+        backend = _BACKENDS.get(base)
+        if backend is not None:
+            break
+    _BACKENDS[data_type] = backend
+    return backend
+
+
+register_backend(PandasBackend(), pd.DataFrame, pd.core.groupby.DataFrameGroupBy)
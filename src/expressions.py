@@ -0,0 +1,204 @@
+### Configuration
+###############################################################################
+# Import packages
+import ast
+import functools
+import io
+import re
+import tokenize
+
+# Number of distinct expressions kept compiled
+_CACHE_SIZE = 1024
+
+
+### Define Classes & Functions
+###############################################################################
+class _NotCompilable(Exception):
+    """
+    Raised while compiling a condition that has to be left to DataFrame.query.
+    """
+
+
+def expression_names(expression):
+    """
+    Names referenced by a query/eval-style string expression. String literals are ignored
+    and `backticked` names are kept whole. Unrelated identifiers (np, where, ...) are
+    included, so the result should be intersected with real column names.
+    """
+    expression = re.sub(r'"[^"]*"|\'[^\']*\'', '', expression)
+    names = set(re.findall(r'`([^`]*)`', expression))
+    names.update(re.findall(r'[A-Za-z_]\w*', re.sub(r'`[^`]*`', '', expression)))
+    return names
+
+
+def query_to_python(condition):
+    """
+    Rewrite & and | as `and` and `or` so that they get the same (low) precedence they
+    have in DataFrame.query, and Python's ast can parse the condition.
+    """
+    tokens = []
+    for token in tokenize.generate_tokens(io.StringIO(condition).readline):
+        if token.type == tokenize.OP and token.string in ('&', '|'):
+            token = token._replace(string=' and ' if token.string == '&' else ' or ')
+        tokens.append((token.type, token.string))
+    return tokenize.untokenize(tokens)
+
+
+@functools.lru_cache(maxsize=_CACHE_SIZE)
+def parse_condition(condition):
+    """
+    Parse a where() condition into a Python expression tree, or return None if it uses
+    query-only syntax (`backticks`, @variables) or does not parse.
+    """
+    if '`' in condition or '@' in condition:
+        return None
+    try:
+        return ast.parse(query_to_python(condition), mode='eval')
+    except (SyntaxError, tokenize.TokenError):
+        return None
+
+
+@functools.lru_cache(maxsize=_CACHE_SIZE)
+def _condition_names(condition):
+    tree = parse_condition(condition)
+    if tree is None:
+        return ()
+    return tuple({node.id for node in ast.walk(tree) if isinstance(node, ast.Name)})
+
+
+class _ConditionCompiler(ast.NodeTransformer):
+    """
+    Turn a parsed where() condition into an expression over df["column"] Series that
+    evaluates to a boolean mask with the same meaning as DataFrame.query. With arrays=True,
+    df["column"] is a NumPy array: membership tests call _isin() instead of Series.isin,
+    and // and % (whose division by zero differs from pandas) are not compiled.
+    """
+    _ALLOWED_BINOPS = (ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow)
+    _ALLOWED_ARRAY_BINOPS = (ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Pow)
+
+    def __init__(self, columns, arrays=False):
+        self.columns = columns
+        self.arrays = arrays
+
+    def generic_visit(self, node):
+        raise _NotCompilable(type(node).__name__)
+
+    def visit_Name(self, node):
+        if node.id not in self.columns:
+            raise _NotCompilable(node.id)
+        return ast.Subscript(value=ast.Name(id='df', ctx=ast.Load()), slice=ast.Constant(node.id), ctx=ast.Load())
+
+    def visit_Constant(self, node):
+        return node
+
+    def visit_List(self, node):
+        if not all(isinstance(elt, ast.Constant) for elt in node.elts):
+            raise _NotCompilable('list')
+        return node
+
+    visit_Tuple = visit_List
+
+    def visit_UnaryOp(self, node):
+        op = ast.Invert() if isinstance(node.op, ast.Not) else node.op
+        return ast.UnaryOp(op=op, operand=self.visit(node.operand))
+
+    def visit_BinOp(self, node):
+        if not isinstance(node.op, self._ALLOWED_ARRAY_BINOPS if self.arrays else self._ALLOWED_BINOPS):
+            raise _NotCompilable(type(node.op).__name__)
+        return ast.BinOp(left=self.visit(node.left), op=node.op, right=self.visit(node.right))
+
+    def visit_BoolOp(self, node):
+        op = ast.BitAnd() if isinstance(node.op, ast.And) else ast.BitOr()
+        return functools.reduce(lambda left, right: ast.BinOp(left=left, op=op, right=right),
+                                [self.visit(value) for value in node.values])
+
+    def visit_Compare(self, node):
+        operands = [node.left] + node.comparators
+        terms = []
+        for left, op, right in zip(operands, node.ops, operands[1:]):
+            is_list = isinstance(right, (ast.List, ast.Tuple))
+            if isinstance(op, (ast.In, ast.NotIn)) or (is_list and isinstance(op, (ast.Eq, ast.NotEq))):
+                # DataFrame.query treats `A in [...]` and `A == [...]` as membership tests
+                if not is_list:
+                    raise _NotCompilable('in')
+                if self.arrays:
+                    term = ast.Call(func=ast.Name(id='_isin', ctx=ast.Load()),
+                                    args=[self.visit(left), self.visit(right)], keywords=[])
+                else:
+                    term = ast.Call(func=ast.Attribute(value=self.visit(left), attr='isin', ctx=ast.Load()),
+                                    args=[self.visit(right)], keywords=[])
+                if isinstance(op, (ast.NotIn, ast.NotEq)):
+                    term = ast.UnaryOp(op=ast.Invert(), operand=term)
+            else:
+                term = ast.Compare(left=self.visit(left), ops=[op], comparators=[self.visit(right)])
+            terms.append(term)
+        return functools.reduce(lambda left, right: ast.BinOp(left=left, op=ast.BitAnd(), right=right), terms)
+
+
+@functools.lru_cache(maxsize=_CACHE_SIZE)
+def _condition_code(condition, columns, arrays=False):
+    tree = parse_condition(condition)
+    if tree is None:
+        return None
+    try:
+        body = _ConditionCompiler(columns, arrays).visit(tree.body)
+    except _NotCompilable:
+        return None
+    return compile(ast.fix_missing_locations(ast.Expression(body=body)), '<where>', 'eval')
+
+
+def compile_condition(condition, columns, arrays=False):
+    """
+    Compile a where() condition once per set of referenced columns.
+
+    Parameters:
+    -----------
+    condition : str
+        The filtering condition, in DataFrame.query syntax.
+    columns : pandas.Index or set
+        Column names of the DataFrame the condition will be applied to.
+    arrays : bool, optional
+        Compile for a dictionary of NumPy arrays instead of a DataFrame. The code must then
+        be run with numpy.isin bound to the name `_isin`. Default is False.
+
+    Returns:
+    --------
+    code or None
+        A code object that evaluates to a boolean mask when run with the DataFrame bound
+        to the name `df`, or None when the condition should be left to DataFrame.query.
+    """
+    names = frozenset(name for name in _condition_names(condition) if name in columns)
+    return _condition_code(condition, names, arrays)
+
+
+@functools.lru_cache(maxsize=_CACHE_SIZE)
+def _operation_tokens(operation):
+    return tuple(re.split(r'(\W+)', operation))
+
+
+@functools.lru_cache(maxsize=_CACHE_SIZE)
+def _operation_code(operation, is_column):
+    tokens = _operation_tokens(operation)
+    source = ''.join(f'df_copy["{token}"]' if column else token for token, column in zip(tokens, is_column))
+    return compile(source, '<mutate>', 'eval')
+
+
+def compile_operation(operation, columns):
+    """
+    Compile a mutate() string operation once per set of referenced columns. Column names
+    are replaced by df_copy["column"], so the code must be run with the DataFrame bound
+    to the name `df_copy`.
+
+    Parameters:
+    -----------
+    operation : str
+        The operation, e.g. 'B * 2'.
+    columns : pandas.Index or set
+        Column names of the DataFrame the operation will be applied to.
+
+    Returns:
+    --------
+    code
+        The compiled operation.
+    """
+    return _operation_code(operation, tuple(token in columns for token in _operation_tokens(operation)))
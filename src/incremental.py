@@ -0,0 +1,267 @@
+### Configuration
+###############################################################################
+# Import packages
+import os
+import numpy as np
+import pandas as pd
+
+# Import modules
+from .pandaplyr import Pipe, Pipeline, group_by, summarise
+
+# Mergeable statistics kept per group and source column for each aggregation
+_AGG_STATS = {
+    'sum': ('sum',),
+    'count': ('count',),
+    'mean': ('count', 'sum'),
+    'min': ('min',),
+    'max': ('max',),
+    'var': ('count', 'mean', 'm2'),
+    'std': ('count', 'mean', 'm2'),
+}
+
+
+### Define Classes & Functions
+###############################################################################
+class MaterializedSummary:
+    """
+    An incrementally maintained group_by >> summarise result for append-only data.
+    Instead of re-aggregating the full history, each call to append() folds the new rows
+    into a per-group state (counts, sums, extremes and running variance terms), touching
+    only the groups that appear in the new rows. Supported aggregations are 'sum', 'count',
+    'mean', 'min', 'max', 'var' and 'std'.
+
+    Parameters:
+    -----------
+    pipeline : Pipeline
+        A group_by(...) >> summarise(...) pipeline. summarise() takes named aggregations,
+        e.g. AVG_B = ('B', 'mean'), or a dictionary of column names to aggregation names.
+    path : str, optional
+        File used to persist the state. If it exists, the state is loaded from it, and
+        save() writes to it by default.
+
+    Example Usage:
+    --------------
+    import pandas as pd
+    summary = MaterializedSummary(group_by('A') >> summarise(AVG_B = ('B', 'mean'), N = ('B', 'count')),
+                                  path='hourly_summary.pkl')
+    summary.append(pd.DataFrame({'A': ['foo', 'bar'], 'B': [10, 20]}))
+    summary.save()
+    new_df = summary.to_frame()
+    """
+    def __init__(self, pipeline, path=None):
+        self.group_columns, self.aggregations = _parse_pipeline(pipeline)
+        self.path = path
+        self.state = None
+        self.dtypes = {}
+        self._stats = {}
+        for col, agg in self.aggregations.values():
+            self._stats.setdefault(col, set()).update(_AGG_STATS[agg])
+        if path is not None and os.path.exists(path):
+            self._load_state(path)
+
+    def __repr__(self):
+        n_groups = 0 if self.state is None else len(self.state)
+        return f"MaterializedSummary(by={self.group_columns}, aggregations={self.aggregations}, groups={n_groups})"
+
+    def append(self, df):
+        """
+        Fold new rows into the summary.
+
+        Parameters:
+        -----------
+        df : pandas.DataFrame
+            The new rows.
+
+        Returns:
+        --------
+        MaterializedSummary
+            The summary itself, so calls can be chained.
+        """
+        # Error handling
+        if not isinstance(df, pd.DataFrame):
+            raise TypeError(f"Expected pandas DataFrame, but got {type(df).__name__}")
+        for col in self.group_columns + list(self._stats):
+            if col not in df.columns:
+                raise KeyError(f"Column '{col}' does not exist in the DataFrame")
+        if df.empty:
+            return self
+        for col in self._stats:
+            self.dtypes.setdefault(col, df[col].dtype)
+
+        batch = self._batch_state(df)
+        if self.state is None:
+            self.state = self._merge_states(batch.iloc[:0].reindex(batch.index), batch)
+            return self
+        merged = self._merge_states(self.state.reindex(batch.index), batch)
+        existing = batch.index.isin(self.state.index)
+        self.state.loc[batch.index[existing]] = merged[existing]
+        self.state = pd.concat([self.state, merged[~existing]])
+        return self
+
+    def to_frame(self):
+        """
+        The current summary, as group_by(...) >> summarise(...) would return it for all rows
+        appended so far.
+
+        Returns:
+        --------
+        pandas.DataFrame
+            One row per group, sorted by the group columns.
+        """
+        if self.state is None:
+            return pd.DataFrame(columns=self.group_columns + list(self.aggregations))
+        state = self.state.sort_index()
+        out = {}
+        for name, (col, agg) in self.aggregations.items():
+            if agg in ('sum', 'count', 'min', 'max'):
+                values = state[(col, agg)]
+            elif agg == 'mean':
+                values = state[(col, 'sum')] / state[(col, 'count')].where(state[(col, 'count')] > 0)
+            else:
+                values = state[(col, 'm2')] / (state[(col, 'count')] - 1).where(state[(col, 'count')] > 1)
+                values = np.sqrt(values) if agg == 'std' else values
+            if agg in ('mean', 'var', 'std'):
+                values = values.astype(np.float64)
+            if agg == 'count' or (agg in ('sum', 'min', 'max') and pd.api.types.is_integer_dtype(self.dtypes[col])
+                                  and not values.isna().any()):
+                values = values.astype(np.int64)
+            out[name] = values
+        return pd.DataFrame(out, index=state.index).reset_index()
+
+    def save(self, path=None):
+        """
+        Write the summary state to disk. The file is replaced atomically.
+
+        Parameters:
+        -----------
+        path : str, optional
+            Destination file. Defaults to the path given at construction.
+        """
+        path = path or self.path
+        if path is None:
+            raise ValueError('No path given to save the summary state to.')
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        pd.to_pickle({'group_columns': self.group_columns, 'aggregations': self.aggregations,
+                      'dtypes': self.dtypes, 'state': self.state}, tmp_path)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, pipeline, path):
+        """
+        Create a summary for pipeline from state previously written with save().
+        """
+        summary = cls(pipeline)
+        summary._load_state(path)
+        summary.path = path
+        return summary
+
+    def _load_state(self, path):
+        saved = pd.read_pickle(path)
+        if saved['group_columns'] != self.group_columns or saved['aggregations'] != self.aggregations:
+            raise ValueError(f"Summary state in '{path}' was saved for a different pipeline")
+        self.dtypes = saved['dtypes']
+        self.state = saved['state']
+
+    def _batch_state(self, df):
+        grouped = df.groupby(self.group_columns, sort=False)
+        state = {}
+        for col, stats in self._stats.items():
+            values = grouped[col]
+            is_integer = pd.api.types.is_integer_dtype(df[col].dtype)
+            for stat in stats:
+                if stat == 'm2':
+                    result = values.var(ddof=0) * values.count()
+                else:
+                    result = getattr(values, stat)()
+                # Counts, and sums and extremes of integer columns, are kept exact (nullable
+                # Int64, so that new groups can be missing); the other terms are float64
+                exact = stat == 'count' or (is_integer and stat in ('sum', 'min', 'max'))
+                state[(col, stat)] = result.astype('Int64' if exact else np.float64)
+        return pd.DataFrame(state)
+
+    def _merge_states(self, old, new):
+        """
+        Combine two aligned states. Rows of old that are all missing stand for new groups.
+        """
+        merged = {}
+        for col, stats in self._stats.items():
+            if 'count' in stats:
+                n_old, n_new = old[(col, 'count')].fillna(0), new[(col, 'count')].fillna(0)
+                merged[(col, 'count')] = n_old + n_new
+            if 'sum' in stats:
+                merged[(col, 'sum')] = old[(col, 'sum')].fillna(0) + new[(col, 'sum')].fillna(0)
+            if 'min' in stats:
+                merged[(col, 'min')] = _fold(np.minimum, old[(col, 'min')], new[(col, 'min')])
+            if 'max' in stats:
+                merged[(col, 'max')] = _fold(np.maximum, old[(col, 'max')], new[(col, 'max')])
+            if 'm2' in stats:
+                # Chan et al. pairwise update of the mean and sum of squared deviations
+                n_old, n_new = n_old.astype(np.float64), n_new.astype(np.float64)
+                n = n_old + n_new
+                mean_old, mean_new = old[(col, 'mean')].fillna(0), new[(col, 'mean')].fillna(0)
+                delta = mean_new - mean_old
+                merged[(col, 'mean')] = (mean_old + delta * n_new / n).where(n > 0)
+                merged[(col, 'm2')] = (old[(col, 'm2')].fillna(0) + new[(col, 'm2')].fillna(0)
+                                       + (delta ** 2 * n_old * n_new / n).where(n > 0, 0))
+        return pd.DataFrame(merged, index=new.index)
+
+
+def _fold(func, old, new):
+    """
+    Combine two aligned extremes with func, ignoring missing values on either side (like
+    np.fmin / np.fmax, which do not skip the missing values of nullable Int64 columns).
+    """
+    return func(old.fillna(new), new.fillna(old))
+
+
+def _parse_pipeline(pipeline):
+    """
+    Extract the group columns and {output name: (column, aggregation)} from a
+    group_by(...) >> summarise(...) pipeline.
+    """
+    steps = pipeline.steps if isinstance(pipeline, Pipeline) else []
+    if len(steps) != 2 or steps[0].func is not group_by.func or steps[1].func is not summarise.func:
+        raise ValueError('Expected a group_by(...) >> summarise(...) pipeline.')
+    group_args = steps[0].args
+    group_columns = list(group_args[0]) if group_args and isinstance(group_args[0], list) else list(group_args)
+
+    aggregations = {}
+    for arg in steps[1].args:
+        if not isinstance(arg, dict):
+            raise ValueError('summarise() arguments should be named aggregations or a dictionary.')
+        aggregations.update({col: (col, agg) for col, agg in arg.items()})
+    for name, spec in steps[1].kwargs.items():
+        if not isinstance(spec, tuple) or len(spec) != 2:
+            raise ValueError(f"Aggregation '{name}' should be a (column, aggregation) tuple.")
+        aggregations[name] = spec
+    for name, (col, agg) in aggregations.items():
+        if agg not in _AGG_STATS:
+            raise ValueError(f"Aggregation '{agg}' for '{name}' cannot be maintained incrementally. "
+                             f"Expected one of {list(_AGG_STATS)}")
+    return group_columns, aggregations
+
+
+@Pipe
+def materialize(df, summary):
+    """
+    Append the rows of a DataFrame to a MaterializedSummary and return the updated summary frame.
+    This function can be used in a pyplyr pipeline.
+
+    Parameters:
+    -----------
+    df : pandas.DataFrame
+        The new rows.
+    summary : MaterializedSummary
+        The summary to update.
+
+    Returns:
+    --------
+    pandas.DataFrame
+        The updated summary.
+
+    Example Usage:
+    --------------
+    summary = MaterializedSummary(group_by('A') >> summarise(SUM_B = ('B', 'sum')))
+    new_df = new_rows >> where('B > 0') >> materialize(summary)
+    """
+    return summary.append(df).to_frame()
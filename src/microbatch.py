@@ -0,0 +1,497 @@
+### Configuration
+###############################################################################
+# Import packages
+import ast
+import inspect
+import time
+import numpy as np
+import pandas as pd
+
+# Import modules
+from .expressions import compile_condition, compile_operation
+from .pandaplyr import Pipeline, get_option, left_join, mutate, select, where
+
+# Largest DataFrame run as NumPy arrays by default. Larger ones go through the regular
+# verbs, whose fixed costs no longer dominate.
+_MAX_ROWS = 5000
+
+# Names available to compiled where() and mutate() expressions
+_ARRAY_GLOBALS = {'_isin': np.isin, 'np': np}
+
+# Expression nodes whose NumPy results match pandas. // and % are left out because their
+# division by zero differs (pandas gives inf and NaN).
+_ARRAY_NODES = (ast.Expression, ast.BinOp, ast.UnaryOp, ast.Compare, ast.Name, ast.Constant, ast.Load,
+                ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Pow, ast.USub, ast.UAdd, ast.BitAnd, ast.BitOr,
+                ast.BitXor, ast.Invert, ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE)
+
+
+### Define Classes & Functions
+###############################################################################
+class _NotArrayable(Exception):
+    """
+    Raised when a step's result on arrays would not match the regular verb.
+    """
+
+
+def _is_array_dtype(dtype):
+    return (isinstance(dtype, np.dtype) and dtype.kind in 'biufcmMO') or isinstance(dtype, pd.StringDtype)
+
+
+def _is_array_operation(operation, columns):
+    """
+    Whether a mutate() string operation only uses columns, constants, arithmetic,
+    comparisons and np.<function>() calls, which give the same values on NumPy arrays.
+    """
+    try:
+        tree = ast.parse(operation, mode='eval')
+    except SyntaxError:
+        return False
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Call):
+            func = node.func
+            if not (isinstance(func, ast.Attribute) and isinstance(func.value, ast.Name) and func.value.id == 'np'):
+                return False
+            if node.keywords:
+                return False
+        elif isinstance(node, ast.Attribute):
+            if not (isinstance(node.value, ast.Name) and node.value.id == 'np'):
+                return False
+        elif isinstance(node, ast.Name):
+            if node.id not in columns and node.id != 'np':
+                return False
+        elif not isinstance(node, _ARRAY_NODES):
+            return False
+    return True
+
+
+def _broadcast(value, n_rows):
+    """
+    A mutate() result as a 1-d array of n_rows values, with strings stored as objects.
+    """
+    values = np.asarray(value)
+    if values.dtype.kind == 'U':
+        values = values.astype(object)
+    if values.ndim == 0:
+        return np.full(n_rows, values[()], dtype=values.dtype)
+    if values.shape != (n_rows,):
+        raise _NotArrayable('length mismatch')
+    return values
+
+
+def _with_missing(values):
+    """
+    A copy of values with one missing value appended, upcast as pandas does for the
+    unmatched rows of a left join (integers to float, booleans to object).
+    """
+    if values.dtype.kind in 'iu':
+        values = values.astype(np.float64)
+    elif values.dtype.kind == 'b':
+        values = values.astype(object)
+    missing = np.array([np.datetime64('NaT') if values.dtype.kind == 'M' else
+                        np.timedelta64('NaT') if values.dtype.kind == 'm' else np.nan], dtype=values.dtype)
+    return np.concatenate([values, missing])
+
+
+def _fill_missing(values, value):
+    missing = pd.isna(values)
+    if not missing.any():
+        return values
+    if values.dtype == object and not isinstance(value, str):
+        # pandas turns str columns filled with non-strings into object columns
+        raise _NotArrayable('fill value changes the column dtype')
+    values = values.copy()
+    values[missing] = value
+    return values
+
+
+def _restored_dtypes(schema):
+    """
+    The (column, dtype) pairs of a schema that NumPy arrays do not preserve: extension
+    dtypes (e.g. str) and object, which pandas would otherwise infer as str.
+    """
+    return [(name, dtype) for name, dtype in schema.dtypes.items()
+            if not isinstance(dtype, np.dtype) or dtype == object]
+
+
+def _to_arrays(df):
+    return {name: series.to_numpy() for name, series in df.items()}
+
+
+def _to_frame(arrays, index, dtypes):
+    data = dict(arrays)
+    for name, dtype in dtypes:
+        if dtype == object:
+            # A Series keeps the object dtype, where a bare object array is inferred as str
+            data[name] = pd.Series(data[name], index=index, dtype=object, copy=False)
+        elif data[name].dtype != dtype:
+            data[name] = pd.array(data[name], dtype=dtype)
+    return pd.DataFrame(data, index=index)
+
+
+def _where_kernel(arguments, schema):
+    condition = arguments['condition']
+    if not isinstance(condition, str):
+        return None
+    code = compile_condition(condition, schema.columns, arrays=True)
+    if code is None:
+        return None
+
+    def kernel(arrays, index):
+        mask = eval(code, _ARRAY_GLOBALS, {'df': arrays})
+        if not (isinstance(mask, np.ndarray) and mask.dtype == bool and mask.shape == (len(index),)):
+            raise _NotArrayable('condition did not give a boolean mask')
+        return {name: values[mask] for name, values in arrays.items()}, index[mask]
+
+    return kernel
+
+
+def _mutate_kernel(arguments, schema):
+    columns = list(schema.columns)
+    operations = []
+    for name, operation in arguments['kwargs'].items():
+        if isinstance(operation, str):
+            if not _is_array_operation(operation, columns):
+                return None
+            operations.append((name, compile_operation(operation, columns), None))
+        elif callable(operation):
+            return None
+        else:
+            operations.append((name, None, operation))
+        if name not in columns:
+            columns.append(name)
+
+    def kernel(arrays, index):
+        arrays = dict(arrays)
+        for name, code, value in operations:
+            if code is not None:
+                value = eval(code, _ARRAY_GLOBALS, {'df_copy': arrays})
+            arrays[name] = _broadcast(value, len(index))
+        return arrays, index
+
+    return kernel
+
+
+def _select_kernel(arguments, schema, output):
+    names = list(output.columns)
+    return lambda arrays, index: ({name: arrays[name] for name in names}, index)
+
+
+def _left_join_kernel(arguments, schema, output):
+    right, on, fill_na = arguments['df2'], arguments['on'], arguments['fill_na']
+    if arguments.get('kwargs') or not isinstance(right, pd.DataFrame) or right.columns.duplicated().any():
+        return None
+    keys = [on] if isinstance(on, str) else list(on) if on is not None else \
+        [col for col in schema.columns if col in right.columns]
+    right_keys = right[keys]
+    if not keys or right_keys.isna().any().any():
+        return None
+    # Right rows by key, built once per pipeline; joins with repeated keys use the verb
+    key_values = right_keys[keys[0]].tolist() if len(keys) == 1 else list(zip(*(right_keys[k].tolist() for k in keys)))
+    lookup = {key: i for i, key in enumerate(key_values)}
+    if len(lookup) != len(right):
+        return None
+
+    right_columns = [col for col in right.columns if col not in keys]
+    left_names = [f'{col}_x' if col in right_columns else col for col in schema.columns]
+    right_names = [f'{col}_y' if col in schema.columns else col for col in right_columns]
+    if left_names + right_names != list(output.columns):
+        return None
+    left_columns = list(zip(left_names, schema.columns))
+    right_values = [(name, right[col].to_numpy(), _with_missing(right[col].to_numpy()))
+                    for name, col in zip(right_names, right_columns)]
+    n_right = len(right)
+
+    def kernel(arrays, index):
+        if len(keys) == 1:
+            row_keys = arrays[keys[0]].tolist()
+        else:
+            row_keys = zip(*(arrays[key].tolist() for key in keys))
+        positions = np.array([lookup.get(key, n_right) for key in row_keys], dtype=np.intp)
+        matched = len(positions) == 0 or positions.max() < n_right
+        joined = {name: arrays[col] for name, col in left_columns}
+        for name, values, padded in right_values:
+            joined[name] = values.take(positions) if matched else padded.take(positions)
+        if isinstance(fill_na, dict):
+            for col, value in fill_na.items():
+                if col not in schema.columns:
+                    joined[col] = _fill_missing(joined[col], value)
+        elif fill_na is not None:
+            joined = {name: _fill_missing(values, fill_na) for name, values in joined.items()}
+        return joined, pd.RangeIndex(len(positions))
+
+    return kernel
+
+
+# Array kernels of the verbs that have one
+_KERNELS = {
+    where.func: lambda arguments, schema, output: _where_kernel(arguments, schema),
+    mutate.func: lambda arguments, schema, output: _mutate_kernel(arguments, schema),
+    select.func: _select_kernel,
+    left_join.func: _left_join_kernel,
+}
+
+
+class _Plan:
+    """
+    A pipeline compiled for one input schema: one kernel per step, working on a dictionary
+    of NumPy arrays and an index, and the dtypes to restore on the result. Steps without
+    a kernel run through their verb on a DataFrame built from the arrays.
+    """
+    def __init__(self, steps, schemas, kernels, dtypes):
+        self.steps = steps
+        self.schemas = [_restored_dtypes(schema) for schema in schemas]
+        self.kernels = kernels
+        self.dtypes = dtypes
+
+    @staticmethod
+    def _casts(dtypes, objects):
+        """
+        The dtypes to restore: the schema's, except for columns that a verb left as
+        objects on this data (e.g. str columns filled with numbers).
+        """
+        return [(name, np.dtype(object) if name in objects else dtype) for name, dtype in dtypes]
+
+    def run(self, df, arrays, timings=None):
+        # The data is held either as a DataFrame (for verbs) or as arrays (for kernels), and
+        # only converted when the next step needs the other form
+        frame, index, objects = df, df.index, set()
+        with np.errstate(all='ignore'):
+            for i, kernel in enumerate(self.kernels):
+                start = time.perf_counter()
+                if kernel is not None:
+                    if arrays is None:
+                        arrays, index = _to_arrays(frame), frame.index
+                        if frame is not df:
+                            # Columns a verb left as objects keep that dtype in the result
+                            objects = {name for name, dtype in frame.dtypes.items() if dtype == object}
+                    try:
+                        arrays, index = kernel(arrays, index)
+                        frame = None
+                    except Exception:
+                        # The step cannot run as arrays on this data (e.g. datetimes compared
+                        # with strings): use its verb from now on
+                        self.kernels[i] = kernel = None
+                if kernel is None:
+                    if frame is None:
+                        frame = _to_frame(arrays, index, self._casts(self.schemas[i], objects))
+                    frame = frame >> self.steps[i]
+                    arrays = None
+                if timings is not None:
+                    timings.append(time.perf_counter() - start)
+        if frame is not None:
+            return frame
+        return _to_frame(arrays, index, self._casts(self.dtypes, objects))
+
+
+def _compile_plan(steps, df):
+    """
+    Validate the pipeline on the zero-row version of df and compile a kernel per step.
+    Returns None when df or an intermediate result cannot be held as arrays, or when the
+    pipeline fails on zero rows (the regular verbs then report the error on real data).
+    """
+    schema = df.iloc[:0]
+    if schema.columns.duplicated().any() or not all(_is_array_dtype(dtype) for dtype in schema.dtypes):
+        return None
+    schemas, kernels = [], []
+    for step in steps:
+        try:
+            output = schema >> step
+        except Exception:
+            return None
+        if not isinstance(output, pd.DataFrame) or output.columns.duplicated().any():
+            return None
+        kernel = None
+        if step.func in _KERNELS:
+            arguments = inspect.signature(step.func).bind(schema, *step.args, **step.kwargs)
+            arguments.apply_defaults()
+            kernel = _KERNELS[step.func](arguments.arguments, schema, output)
+        schemas.append(schema)
+        kernels.append(kernel)
+        schema = output
+    return _Plan(list(steps), schemas, kernels, _restored_dtypes(schema))
+
+
+class MicroBatch:
+    """
+    A pipeline prepared for many small DataFrames, such as the rows of a single request in
+    an online service. On the first DataFrame of each schema (column names and dtypes),
+    the pipeline is validated on zero rows and compiled: where() conditions and mutate()
+    operations are parsed once, selections are resolved, and the right side of each
+    left_join() is indexed by key. Later DataFrames with that schema skip all of this and
+    run as plain NumPy arrays with boolean masks, turned back into a DataFrame once at
+    the end. The result is the same as applying the pipeline itself.
+
+    Steps without an array version (other verbs, mutate() functions, conditions in query-only
+    syntax, joins on repeated keys, ...) run through their regular verb. DataFrames larger
+    than max_rows, or any call whose arrays cannot reproduce the verbs' result, run the
+    regular pipeline.
+
+    Parameters:
+    -----------
+    pipeline : Pipeline or Pipe
+        The pipeline to run.
+    max_rows : int, optional
+        Largest DataFrame run as arrays. Default is 5000.
+
+    Attributes:
+    -----------
+    calls : dict
+        Number of calls run as arrays ('arrays') and through the regular pipeline ('pandas').
+    """
+    def __init__(self, pipeline, max_rows=_MAX_ROWS):
+        self.pipeline = pipeline if isinstance(pipeline, Pipeline) else Pipeline([pipeline])
+        self.max_rows = max_rows
+        self.plans = {}
+        self.calls = {'arrays': 0, 'pandas': 0}
+
+    def __call__(self, df):
+        return self.run(df)
+
+    def __rrshift__(self, other):
+        return self.run(other)
+
+    def __repr__(self):
+        return f"MicroBatch({self.pipeline!r})"
+
+    def plan(self, df, dtypes=None):
+        """
+        The compiled plan for the schema of df, compiling it on first use. None if the
+        pipeline runs through the regular verbs for this schema.
+        """
+        key = (tuple(df.columns), tuple(df.dtypes) if dtypes is None else dtypes)
+        try:
+            return self.plans[key]
+        except KeyError:
+            plan = self.plans[key] = _compile_plan(self.pipeline.steps, df)
+            return plan
+
+    def run(self, df, timings=None):
+        """
+        Apply the pipeline to df.
+
+        Parameters:
+        -----------
+        df : pandas.DataFrame
+            The input DataFrame.
+        timings : list, optional
+            If given, the seconds spent in each step are appended to it (array runs only).
+
+        Returns:
+        --------
+        pandas.DataFrame
+            The result of the pipeline.
+        """
+        if isinstance(df, pd.DataFrame) and len(df) <= self.max_rows and not get_option('compact'):
+            # One pass over the columns gives both the arrays and the schema
+            arrays, dtypes = {}, []
+            for name, series in df.items():
+                arrays[name] = series.to_numpy()
+                dtypes.append(series.dtype)
+            plan = self.plan(df, tuple(dtypes))
+            if plan is not None:
+                try:
+                    result = plan.run(df, arrays, timings)
+                except Exception:
+                    pass
+                else:
+                    self.calls['arrays'] += 1
+                    return result
+        self.calls['pandas'] += 1
+        return df >> self.pipeline
+
+
+def micro_batch(pipeline, max_rows=_MAX_ROWS, schema=None):
+    """
+    Prepare a pipeline for low-latency runs on small DataFrames (see MicroBatch).
+
+    Parameters:
+    -----------
+    pipeline : Pipeline or Pipe
+        The pipeline to run.
+    max_rows : int, optional
+        Largest DataFrame run as NumPy arrays. Default is 5000.
+    schema : pandas.DataFrame, optional
+        An example DataFrame (only its columns and dtypes are used) to compile the
+        pipeline for ahead of the first request.
+
+    Returns:
+    --------
+    MicroBatch
+        The prepared pipeline. Apply it with >> or by calling it.
+
+    Example Usage:
+    --------------
+    scorer = micro_batch(where('amount > 0') >>
+                         mutate(ratio = 'amount / balance') >>
+                         left_join(segments, on='segment') >>
+                         select('id', 'ratio', 'weight'), schema=example_df)
+    scored_df = request_df >> scorer
+    """
+    prepared = MicroBatch(pipeline, max_rows=max_rows)
+    if schema is not None:
+        prepared.plan(schema.iloc[:0])
+    return prepared
+
+
+def _percentiles(seconds):
+    micros = np.asarray(seconds) * 1e6
+    return np.percentile(micros, 50), np.percentile(micros, 99)
+
+
+def latency_benchmark(pipeline, df, sizes=(10, 100, 1000), repeat=200):
+    """
+    Measure the latency of each step of a pipeline on small DataFrames, run as usual and
+    with micro_batch(). Each size is a DataFrame of that many rows cycled from df.
+
+    Parameters:
+    -----------
+    pipeline : Pipeline or Pipe
+        The pipeline to time.
+    df : pandas.DataFrame
+        Example input rows.
+    sizes : tuple, optional
+        Numbers of rows to time. Default is (10, 100, 1000).
+    repeat : int, optional
+        Number of timed runs per size and mode. Default is 200.
+
+    Returns:
+    --------
+    pandas.DataFrame
+        One row per size, mode ('pandas' or 'micro_batch') and step, plus a 'total' row
+        for the whole pipeline, with the median (p50_us) and 99th percentile (p99_us)
+        latency in microseconds. Micro-batch step times exclude the conversion to and from
+        arrays, which the total includes.
+
+    Example Usage:
+    --------------
+    report = latency_benchmark(where('x > 0') >> mutate(y = 'x * 2') >> select('y'), df)
+    print(report.pivot_table(index=['rows', 'verb'], columns='mode', values='p99_us'))
+    """
+    pipeline = pipeline if isinstance(pipeline, Pipeline) else Pipeline([pipeline])
+    verbs = [step.func.__name__ for step in pipeline.steps] + ['total']
+    records = []
+    for size in sizes:
+        frame = df.iloc[np.arange(size) % len(df)].reset_index(drop=True)
+        prepared = MicroBatch(pipeline, max_rows=max(sizes))
+        prepared(frame)
+        step_seconds = {'pandas': [[] for _ in verbs], 'micro_batch': [[] for _ in verbs]}
+        for _ in range(repeat):
+            result, start = frame, time.perf_counter()
+            for i, step in enumerate(pipeline.steps):
+                step_start = time.perf_counter()
+                result = result >> step
+                step_seconds['pandas'][i].append(time.perf_counter() - step_start)
+            step_seconds['pandas'][-1].append(time.perf_counter() - start)
+
+            timings, start = [], time.perf_counter()
+            prepared.run(frame, timings)
+            step_seconds['micro_batch'][-1].append(time.perf_counter() - start)
+            for i, seconds in enumerate(timings):
+                step_seconds['micro_batch'][i].append(seconds)
+        for mode, seconds_by_step in step_seconds.items():
+            for step, (verb, seconds) in enumerate(zip(verbs, seconds_by_step), start=1):
+                if seconds:
+                    p50, p99 = _percentiles(seconds)
+                    records.append({'rows': size, 'mode': mode, 'step': step, 'verb': verb,
+                                    'p50_us': p50, 'p99_us': p99})
+    return pd.DataFrame(records)
@@ -1,13 +1,25 @@
 ### Configuration
 ###############################################################################
 # Import packages
+import importlib
 import numpy as np
 import pandas as pd
-import re
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
 # Import modules
+from .backends import get_backend
+from .expressions import compile_condition, compile_operation
+from .selection import resolve_columns, take_columns
+from .udfs import UDF, grouped_aggregate
 from .utils import *
 
+# Pipeline-wide settings, changed with set_option()
+_OPTIONS = {
+    'compact': False,
+    'factorize_keys': False,
+}
+
 
 ### Define Classes & Functions
 ###############################################################################
@@ -16,25 +28,338 @@ class Pipe:
     A class to enable functionality similar to R dplyr on pandas dataframes.
     Instead of the pipe operator in R %>%, this class uses >>.
 
+    Calling a Pipe returns a new Pipe bound to the given arguments, so the same verb can
+    appear several times in one pipeline. Two Pipes joined with >> make a Pipeline.
+
     Parameters:
     -----------
     func : function
         The function to be executed in the pipeline.
+    args : tuple, optional
+        Positional arguments bound to the function.
+    kwargs : dict, optional
+        Keyword arguments bound to the function.
     """
-    def __init__(self, func):
+    def __init__(self, func, args=(), kwargs=None):
         self.func = func
+        self.args = args
+        self.kwargs = kwargs or {}
 
     def __call__(self, *args, **kwargs):
-        self.args = args
-        self.kwargs = kwargs
-        return self
+        return Pipe(self.func, args, kwargs)
+
+    def __rrshift__(self, other):
+        if _OPTIONS['compact'] and isinstance(other, pd.DataFrame) and not other.attrs.get('compacted'):
+            other = _compact_frame(other, string_dtype='str', numbers=False)[0]
+        # Non-pandas inputs (e.g. pyarrow.Table) run on the backend registered for their type
+        backend = get_backend(other)
+        if backend is None:
+            return self.func(other, *self.args, **self.kwargs)
+        return backend.run(self.func, other, self.args, self.kwargs)
+
+    def __rshift__(self, other):
+        if isinstance(other, (Pipe, Pipeline)):
+            return Pipeline([self]) >> other
+        return NotImplemented
+
+    def __reduce__(self):
+        # Pickle by reference to the module-level verb so Pipes can be sent to worker processes
+        return (_load_pipe, (self.func.__module__, self.func.__name__, self.args, self.kwargs))
+
+    def __repr__(self):
+        return f"{self.func.__name__}({', '.join([repr(a) for a in self.args] + [f'{k}={v!r}' for k, v in self.kwargs.items()])})"
+
+
+def _load_pipe(module_name, name, args, kwargs):
+    return getattr(importlib.import_module(module_name), name)(*args, **kwargs)
+
+
+class Pipeline:
+    """
+    A reusable sequence of verbs, built by joining Pipes with >> before any data is seen.
+    Apply it to a DataFrame with >> like a single verb. String conditions and operations
+    used by where() and mutate() are compiled on first use and cached, so applying the same
+    pipeline to many DataFrames does not re-parse them.
+
+    Parameters:
+    -----------
+    steps : list
+        The bound Pipes to run, in order.
+
+    Example Usage:
+    --------------
+    import pandas as pd
+    pipeline = where('B > 15') >> mutate(B_X_2 = 'B * 2') >> select('A', 'B_X_2')
+    df = pd.DataFrame({'A': ['foo', 'foo', 'bar'], 'B': [10, 20, 30]})
+    pipeline.validate(df)
+    new_df = df >> pipeline
+    """
+    def __init__(self, steps=()):
+        self.steps = list(steps)
+
+    def __rshift__(self, other):
+        if isinstance(other, Pipe):
+            return Pipeline(self.steps + [other])
+        if isinstance(other, Pipeline):
+            return Pipeline(self.steps + other.steps)
+        return NotImplemented
 
     def __rrshift__(self, other):
-        return self.func(other, *self.args, **self.kwargs)
+        for step in self.steps:
+            other = other >> step
+        return other
+
+    def __len__(self):
+        return len(self.steps)
+
+    def __repr__(self):
+        return ' >> '.join(repr(step) for step in self.steps)
+
+    def validate(self, schema):
+        """
+        Check the pipeline against a schema by running it on zero rows. This also
+        compiles its where() and mutate() expressions ahead of the first real DataFrame.
+
+        Parameters:
+        -----------
+        schema : pandas.DataFrame, dict or list
+            A DataFrame (only its columns and dtypes are used), a dictionary of column
+            names to dtypes, or a list of column names.
+
+        Returns:
+        --------
+        Pipeline
+            The pipeline itself, so validation can be chained.
+
+        Raises:
+        -------
+        ValueError
+            If a step fails on the schema.
+        """
+        if isinstance(schema, pd.DataFrame):
+            result = schema.iloc[:0]
+        elif isinstance(schema, Mapping):
+            result = pd.DataFrame({col: pd.Series(dtype=dtype) for col, dtype in schema.items()})
+        else:
+            result = pd.DataFrame(columns=list(schema))
+        for i, step in enumerate(self.steps):
+            try:
+                result = result >> step
+            except Exception as e:
+                raise ValueError(f"Step {i + 1} of the pipeline, {step!r}, failed on the schema: {e}") from e
+        return self
+
+
+def map_frames(frames, pipeline, workers=None, executor='thread'):
+    """
+    Apply one pipeline to many DataFrames, optionally spread over a pool of workers.
+
+    Parameters:
+    -----------
+    frames : list or dict
+        The DataFrames to process. A dictionary keeps its keys in the result.
+    pipeline : Pipeline or Pipe
+        The pipeline to apply to each DataFrame.
+    workers : int, optional
+        Number of workers. Default (None or 1) applies the pipeline in the calling thread.
+    executor : str, optional
+        Either "thread" (default) or "process". Processes avoid the GIL but need the
+        pipeline and the DataFrames to be picklable, so mutate() lambdas are not allowed.
+
+    Returns:
+    --------
+    list or dict
+        The results, in the same order (or with the same keys) as frames.
+
+    Example Usage:
+    --------------
+    pipeline = group_by('A') >> summarise(SUM_B = ('B', 'sum'))
+    results = map_frames(frames_by_customer, pipeline, workers=4)
+    """
+    if executor not in ('thread', 'process'):
+        raise ValueError('executor should be either "thread" or "process".')
+    keys = list(frames) if isinstance(frames, Mapping) else None
+    frame_list = [frames[key] for key in keys] if keys is not None else list(frames)
+    if workers is None or workers <= 1:
+        results = [_apply_pipeline(df, pipeline) for df in frame_list]
+    else:
+        pool_class = ThreadPoolExecutor if executor == 'thread' else ProcessPoolExecutor
+        with pool_class(max_workers=workers) as pool:
+            results = list(pool.map(_apply_pipeline, frame_list, [pipeline] * len(frame_list)))
+    return dict(zip(keys, results)) if keys is not None else results
+
+
+def _apply_pipeline(df, pipeline):
+    return df >> pipeline
+
+
+def set_option(name, value):
+    """
+    Change a pipeline-wide setting.
+
+    Parameters:
+    -----------
+    name : str
+        The setting to change. One of:
+        - 'compact': store object columns of strings as the pandas string dtype in
+          every DataFrame entering a verb that has not been compacted yet. Unlike
+          compact(), numeric columns are not narrowed, so results do not change.
+          Default is False.
+        - 'factorize_keys': have group_by() and the join verbs factorize object and
+          string keys to integer codes. Default is False.
+    value : Any
+        The new value.
+
+    Example Usage:
+    --------------
+    set_option('compact', True)
+    """
+    if name not in _OPTIONS:
+        raise KeyError(f"Unknown option '{name}'. Expected one of {list(_OPTIONS)}")
+    _OPTIONS[name] = value
+
+
+def get_option(name):
+    """
+    Return the current value of a pipeline-wide setting (see set_option()).
+    """
+    if name not in _OPTIONS:
+        raise KeyError(f"Unknown option '{name}'. Expected one of {list(_OPTIONS)}")
+    return _OPTIONS[name]
+
+
+def _is_string_column(series):
+    return pd.api.types.is_object_dtype(series.dtype) or pd.api.types.is_string_dtype(series.dtype)
+
+
+def _compact_frame(df, max_unique_ratio=0.5, string_dtype='category', numbers=True):
+    """
+    Return a copy of df with narrower dtypes, and the number of bytes saved.
+    With numbers=False, numeric columns keep their dtype, and with string_dtype='str',
+    object columns of strings become the pandas string dtype: neither changes what later
+    verbs compute, which is what the 'compact' option relies on.
+    """
+    bytes_before = df.memory_usage(deep=True).sum()
+    out_df = df.copy(deep=False)
+    for col in out_df.columns:
+        series = out_df[col]
+        if pd.api.types.is_bool_dtype(series.dtype):
+            continue
+        if pd.api.types.is_numeric_dtype(series.dtype) and not numbers:
+            continue
+        if pd.api.types.is_integer_dtype(series.dtype):
+            # Signed, so that e.g. subtracting from a column of small positive values stays correct
+            out_df[col] = pd.to_numeric(series, downcast='integer')
+        elif pd.api.types.is_float_dtype(series.dtype) and series.dtype != np.float32:
+            narrow = series.astype(np.float32)
+            if np.array_equal(narrow.to_numpy(np.float64), series.to_numpy(np.float64), equal_nan=True):
+                out_df[col] = narrow
+        elif string_dtype == 'str':
+            if pd.api.types.is_object_dtype(series.dtype) and pd.api.types.infer_dtype(series) == 'string':
+                out_df[col] = series.astype('str')
+        elif _is_string_column(series) and not isinstance(series.dtype, pd.CategoricalDtype):
+            if series.nunique(dropna=False) <= max_unique_ratio * len(series):
+                out_df[col] = series.astype('category' if string_dtype == 'category' else 'string[pyarrow]')
+    out_df.attrs['compacted'] = True
+    out_df.attrs['bytes_saved'] = int(bytes_before - out_df.memory_usage(deep=True).sum())
+    return out_df, out_df.attrs['bytes_saved']
+
+
+def _factorize_keys(df, keys):
+    """
+    Return a shallow copy of df with object and string key columns replaced by categoricals,
+    so that grouping works on integer codes computed once.
+    """
+    keys = [key for key in keys if _is_string_column(df[key])]
+    if not keys:
+        return df
+    out_df = df.copy(deep=False)
+    for key in keys:
+        out_df[key] = out_df[key].astype('category')
+    return out_df
+
+
+def _group_codes(df, columns):
+    """
+    Integer codes numbering the distinct combinations of values in columns, in sorted
+    order, and a DataFrame of those combinations (one row per code). Missing values form
+    their own group.
+    """
+    if not columns:
+        return np.zeros(len(df), dtype=np.int64), pd.DataFrame(index=pd.RangeIndex(min(len(df), 1)))
+    factorized = [pd.factorize(df[column], sort=True, use_na_sentinel=False) for column in columns]
+    if len(columns) == 1:
+        codes, uniques = factorized[0]
+        return codes.astype(np.int64, copy=False), pd.DataFrame({columns[0]: uniques})
+    sizes = [len(uniques) for _, uniques in factorized]
+    n_combinations = int(np.prod([float(size) for size in sizes]))
+    if n_combinations < 2 ** 62:
+        combined = np.zeros(len(df), dtype=np.int64)
+        for column_codes, uniques in factorized:
+            combined = combined * len(uniques) + column_codes
+        if n_combinations <= max(len(df), 2 ** 20):
+            # Few enough combinations to number them with a dense lookup table
+            present = np.flatnonzero(np.bincount(combined, minlength=n_combinations))
+            lookup = np.empty(n_combinations, dtype=np.int64)
+            lookup[present] = np.arange(len(present))
+            codes, values = lookup[combined], present
+        else:
+            codes, values = pd.factorize(combined, sort=True)
+        # Decode each combination back into one code per column
+        keys = {}
+        for column, size, (_, uniques) in reversed(list(zip(columns, sizes, factorized))):
+            values, column_codes = np.divmod(values, size)
+            keys[column] = uniques.take(column_codes)
+        return codes, pd.DataFrame({column: keys[column] for column in columns})
+    # Too many combinations for one int64: number rows through the per-column codes instead
+    codes = pd.MultiIndex.from_arrays([column_codes for column_codes, _ in factorized]).factorize(sort=True)[0]
+    first = np.flatnonzero(~pd.Series(codes).duplicated().to_numpy())
+    return codes, df[columns].take(first[np.argsort(codes[first])]).reset_index(drop=True)
+
+
+def _time_values(series):
+    """
+    The values of a time (or numeric) column as a NumPy array that can be compared and
+    subtracted: int64 nanoseconds (UTC) for datetimes, the values themselves otherwise.
+    """
+    if pd.api.types.is_datetime64_any_dtype(series):
+        if getattr(series.dt, 'tz', None) is not None:
+            series = series.dt.tz_convert('UTC').dt.tz_localize(None)
+        return series.to_numpy(dtype='datetime64[ns]').view(np.int64)
+    if pd.api.types.is_timedelta64_dtype(series):
+        return series.to_numpy(dtype='timedelta64[ns]').view(np.int64)
+    return series.to_numpy()
+
+
+def _merge(df1, df2, how, on=None, factorize=None, **kwargs):
+    """
+    DataFrame.merge, optionally on integer codes instead of object and string keys.
+    Both sides' keys are factorized together, in sorted order, so that equal keys get equal
+    codes and outer joins sort the same way. The original key values are restored in the result.
+    Only keys given with `on` are factorized.
+    """
+    if 'left_on' in kwargs or 'right_on' in kwargs:
+        # Differently named keys: pandas rejects on= together with left_on/right_on
+        return df1.merge(df2, how=how, on=on, **kwargs)
+    factorize = _OPTIONS['factorize_keys'] if factorize is None else factorize
+    keys = [on] if isinstance(on, str) else list(on or [])
+    keys = [key for key in keys if _is_string_column(df1[key]) and _is_string_column(df2[key])]
+    if not factorize or not keys:
+        return df1.merge(df2, how=how, left_on=on, right_on=on, **kwargs)
+    left_df, right_df = df1.copy(deep=False), df2.copy(deep=False)
+    uniques = {}
+    for key in keys:
+        codes, uniques[key] = pd.factorize(pd.concat([df1[key], df2[key]], ignore_index=True), sort=True)
+        left_df[key], right_df[key] = codes[:len(df1)], codes[len(df1):]
+    merged_df = left_df.merge(right_df, how=how, left_on=on, right_on=on, **kwargs)
+    for key in keys:
+        restored = pd.Categorical.from_codes(merged_df[key].to_numpy(), categories=uniques[key])
+        merged_df[key] = pd.Series(restored, index=merged_df.index).astype(df1[key].dtype)
+    return merged_df
 
 
 @Pipe
-def group_by(df, *args, **kwargs):
+def group_by(df, *args, factorize=None, **kwargs):
     """
     Function to group a pandas DataFrame by one or more columns.
 
@@ -44,6 +369,10 @@ def group_by(df, *args, **kwargs):
         The input DataFrame.
     *args : str or list
         The column(s) to group by.
+    factorize : bool, optional
+        Convert object and string group columns to categoricals first, so grouping runs on
+        integer codes. Group columns in the result are then categorical. Defaults to the
+        'factorize_keys' option (see set_option()).
     **kwargs : dict, optional
         Additional keyword arguments to be passed to the groupby function.
 
@@ -77,6 +406,9 @@ def group_by(df, *args, **kwargs):
     for gc in group_columns:
         if gc not in df.columns:
             raise KeyError(f"Column '{gc}' does not exist in the DataFrame")
+    if _OPTIONS['factorize_keys'] if factorize is None else factorize:
+        df = _factorize_keys(df, group_columns)
+        kwargs.setdefault('observed', True)
     return df.groupby(group_columns, **kwargs)
 
 
@@ -92,7 +424,8 @@ def summarise(df, *args, **kwargs):
     *args : tuple
         The aggregation functions and columns to apply.
     **kwargs : dict, optional
-        Additional keyword arguments to be passed to the aggregate function.
+        Additional keyword arguments to be passed to the aggregate function. Named
+        aggregations may use a function decorated with udf(kind='agg').
 
     Returns:
     --------
@@ -106,8 +439,22 @@ def summarise(df, *args, **kwargs):
                        'B': [10, 20, 30, 40, 50, 60]})
     new_df = df >> group_by('A') >> summarise(AVG_B = ('B', 'mean'))
     """
-    # Error handling
-    return df.aggregate(*args, **kwargs)
+    # Aggregations using a udf(kind='agg') run as one call over values sorted by group
+    udf_kwargs = {name: spec for name, spec in kwargs.items()
+                  if isinstance(df, pd.core.groupby.DataFrameGroupBy) and isinstance(spec, tuple)
+                  and len(spec) == 2 and isinstance(spec[1], UDF) and spec[1].kind == 'agg'}
+    if not udf_kwargs:
+        return df.aggregate(*args, **kwargs)
+    other_kwargs = {name: spec for name, spec in kwargs.items() if name not in udf_kwargs}
+    if args or other_kwargs:
+        out_df = df.aggregate(*args, **other_kwargs)
+    else:
+        out_df = df.size()
+        out_df = out_df.drop(columns='size') if isinstance(out_df, pd.DataFrame) else out_df.to_frame().iloc[:, :0]
+    for name, (column, agg_udf) in udf_kwargs.items():
+        out_df[name] = grouped_aggregate(df, column, agg_udf)
+    key_columns = [col for col in out_df.columns if col not in kwargs]
+    return out_df[key_columns + list(kwargs)]
 
 summarize = summarise
 
@@ -143,12 +490,8 @@ def mutate(df, **kwargs):
     for column, operation in kwargs.items():
         try:
             if isinstance(operation, str):
-                # split by operations
-                operations = re.split(r'(\W+)', operation)
-                # replace column names with df['column_name']
-                operations = [f'df_copy["{op}"]' if op in df_copy.columns else op for op in operations]
-                # join operations into a single string and evaluate
-                df_copy[column] = eval(''.join(operations))
+                # replace column names with df_copy['column_name'] (compiled once and cached)
+                df_copy[column] = eval(compile_operation(operation, df_copy.columns))
             elif callable(operation):
                 df_copy[column] = operation(df_copy)
             else:
@@ -159,6 +502,114 @@ def mutate(df, **kwargs):
     return df_copy
 
 
+def _condition_mask(df, condition):
+    """
+    Evaluate a condition to a boolean NumPy array. Strings use DataFrame.query syntax and are
+    compiled once and cached, callables are called with the DataFrame, and anything else is
+    used as an array of booleans. Missing values count as False.
+    """
+    if isinstance(condition, str):
+        code = compile_condition(condition, df.columns)
+        mask = eval(code, {}, {'df': df}) if code is not None else df.eval(condition)
+    elif callable(condition):
+        mask = condition(df)
+    else:
+        mask = condition
+    if isinstance(mask, pd.Series):
+        return mask.to_numpy(dtype=bool, na_value=False)
+    return np.asarray(mask, dtype=bool)
+
+
+def _case_value(df, value):
+    """
+    Evaluate a case_when() value the way mutate() evaluates an operation.
+    """
+    if isinstance(value, str):
+        value = eval(compile_operation(value, df.columns), globals(), {'df_copy': df})
+    elif callable(value):
+        value = value(df)
+    return value.to_numpy() if isinstance(value, pd.Series) else value
+
+
+def case_when(*cases, default=None):
+    """
+    Build a multi-branch conditional column for use in mutate(). Each row takes the value of
+    the first case whose condition is true, or the default. All conditions are evaluated to
+    boolean masks and combined in a single np.select pass.
+
+    Conditions are strings in where() syntax (or callables taking the DataFrame). Values work
+    like mutate() operations: strings are expressions over the columns, so a literal string
+    needs its own quotes, e.g. '"high"'. Callables are called with the DataFrame and other
+    values are used as they are.
+
+    Parameters:
+    -----------
+    *cases : tuple
+        (condition, value) pairs, in priority order.
+    default : Any, optional
+        Value for rows matching no condition. Default is np.nan.
+
+    Returns:
+    --------
+    function
+        A function of the DataFrame, to be passed to mutate().
+
+    Example Usage:
+    --------------
+    import pandas as pd
+    df = pd.DataFrame({'A': ['foo', 'foo', 'foo', 'bar', 'bar', 'bar'],
+                       'B': [10, 20, 30, 40, 50, 60]})
+    new_df = df >> mutate(B_SIZE = case_when(('B >= 50', '"large"'),
+                                             ('B >= 30 & A == "foo"', '"medium"'),
+                                             default = '"small"'))
+    """
+    if not cases:
+        raise ValueError('case_when() needs at least one (condition, value) pair.')
+    for case in cases:
+        if not isinstance(case, tuple) or len(case) != 2:
+            raise ValueError(f"Expected a (condition, value) pair, but got {case!r}")
+
+    def evaluate(df):
+        masks = [_condition_mask(df, condition) for condition, _ in cases]
+        choices = [_case_value(df, value) for _, value in cases]
+        fallback = np.nan if default is None else _case_value(df, default)
+        try:
+            return np.select(masks, choices, fallback)
+        except TypeError:
+            # No common dtype (e.g. strings with a NaN default): fall back to object
+            return np.select(masks, [np.asarray(choice, dtype=object) for choice in choices],
+                             np.asarray(fallback, dtype=object))
+
+    return evaluate
+
+
+def if_else(condition, true, false=None):
+    """
+    Build a two-branch conditional column for use in mutate(). Shorthand for
+    case_when((condition, true), default=false).
+
+    Parameters:
+    -----------
+    condition : str or function
+        The condition, in where() syntax.
+    true : Any
+        Value where the condition is true, as in case_when().
+    false : Any, optional
+        Value where the condition is false or missing. Default is np.nan.
+
+    Returns:
+    --------
+    function
+        A function of the DataFrame, to be passed to mutate().
+
+    Example Usage:
+    --------------
+    df = read_grades_by_year_dataset()
+    new_df = df >> mutate(SignedGrade = if_else('Year == 1', '-1 * Grade', 'Grade'))
+    """
+    return case_when((condition, true), default=false)
+
+
 @Pipe
 def where(df, condition):
     """
@@ -187,6 +638,16 @@ def where(df, condition):
     # Error handling
     if not isinstance(df, pd.DataFrame):
         raise TypeError(f"Expected pandas DataFrame, but got {type(df).__name__}")
+    # Evaluate simple conditions as a boolean mask, compiled once and cached. Anything else,
+    # including errors, goes through DataFrame.query.
+    code = compile_condition(condition, df.columns)
+    if code is not None:
+        try:
+            mask = eval(code, {}, {'df': df})
+        except Exception:
+            mask = None
+        if isinstance(mask, pd.Series) and mask.dtype == bool:
+            return df.loc[mask]
     return df.query(condition)
 
 
@@ -199,13 +660,16 @@ def select(df, *args):
     -----------
     df : pandas.DataFrame
         The input DataFrame.
-    *args : str
-        The column names to select.
+    *args : str or Selector
+        The column names to select, or selectors: starts_with(), ends_with(), contains(),
+        matches(), one_of(), col_range(), of_type() and everything(). A selector negated
+        with ~ drops its columns, and as the first argument keeps all the other columns.
 
     Returns:
     --------
     pandas.DataFrame
-        The DataFrame with selected columns.
+        The DataFrame with selected columns. Columns are taken by position, and a run of
+        adjacent columns is returned as a view rather than a copy.
 
     Example Usage:
     --------------
@@ -215,11 +679,13 @@ def select(df, *args):
                        'C': [1, 2, 3, 4, 5, 6]})
 
     new_df = df >> select('A', 'B')
+    new_df = df >> select(of_type('number'))
+    new_df = df >> select(~one_of('B'))
     """
     # Error handling
     if not isinstance(df, pd.DataFrame):
         raise TypeError(f"Expected pandas DataFrame, but got {type(df).__name__}")
-    return df.loc[:, list(args)]
+    return take_columns(df, resolve_columns(df, args))
 
 
 @Pipe
@@ -316,7 +782,7 @@ order_by = arrange
 
 
 @Pipe
-def left_join(df1, df2, on=None, fill_na=None, **kwargs):
+def left_join(df1, df2, on=None, fill_na=None, factorize=None, **kwargs):
     """
     Function to perform a left join between two pandas DataFrames.
 
@@ -331,6 +797,10 @@ def left_join(df1, df2, on=None, fill_na=None, **kwargs):
     fill_na : dict or any, optional
         A dictionary or a single value where keys are column names in `df2` and values are the corresponding fill values,
         or a single value to be applied to all columns in `df2` that are not present in `df1`.
+    factorize : bool, optional
+        Join on integer codes instead of object and string key values. Only applies when
+        the keys are given with `on`; joins on all shared columns or on left_on/right_on
+        use the key values. Defaults to the 'factorize_keys' option (see set_option()).
     **kwargs : dict, optional
         Additional keyword arguments to be passed to the merge function.
 
@@ -357,7 +827,7 @@ def left_join(df1, df2, on=None, fill_na=None, **kwargs):
     df2 = pd.DataFrame({'A': ['foo', 'bar'], 'C': [10, 20], 'D' : [25, 50]})
     df3 = df1 >> left_join(df2, on = ['A'], fill_na = {'C' : 0, 'D' : -999})
     """
-    merged_df = df1.merge(df2, how='left', left_on=on, right_on=on, **kwargs)
+    merged_df = _merge(df1, df2, how='left', on=on, factorize=factorize, **kwargs)
     if fill_na is not None:
         if isinstance(fill_na, dict):
             for col, value in fill_na.items():
@@ -370,7 +840,7 @@ def left_join(df1, df2, on=None, fill_na=None, **kwargs):
 
 
 @Pipe
-def inner_join(df1, df2, on=None, **kwargs):
+def inner_join(df1, df2, on=None, factorize=None, **kwargs):
     """
     Function to perform an inner join between two pandas DataFrames.
 
@@ -382,6 +852,10 @@ def inner_join(df1, df2, on=None, **kwargs):
         The second DataFrame.
     on : str or list, optional
         The column(s) to join on.
+    factorize : bool, optional
+        Join on integer codes instead of object and string key values. Only applies when
+        the keys are given with `on`; joins on all shared columns or on left_on/right_on
+        use the key values. Defaults to the 'factorize_keys' option (see set_option()).
     **kwargs : dict, optional
         Additional keyword arguments to be passed to the merge function.
 
@@ -397,11 +871,11 @@ def inner_join(df1, df2, on=None, **kwargs):
     df2 = pd.DataFrame({'A': ['foo', 'bar'], 'C': [10, 20], 'D' : [25, 50]})
     df3 = df1 >> inner_join(df2, on = ['A'])
     """
-    return df1.merge(df2, how='inner', on=on, **kwargs)
+    return _merge(df1, df2, how='inner', on=on, factorize=factorize, **kwargs)
 
 
 @Pipe
-def right_join(df1, df2, on=None, fill_na=None, **kwargs):
+def right_join(df1, df2, on=None, fill_na=None, factorize=None, **kwargs):
     """
     Function to perform a right join between two pandas DataFrames.
 
@@ -416,6 +890,10 @@ def right_join(df1, df2, on=None, fill_na=None, **kwargs):
     fill_na : dict or any, optional
         A dictionary or a single value where keys are column names in `df1` and values are the corresponding fill values,
         or a single value to be applied to all columns in `df1` that are not present in `df2`.
+    factorize : bool, optional
+        Join on integer codes instead of object and string key values. Only applies when
+        the keys are given with `on`; joins on all shared columns or on left_on/right_on
+        use the key values. Defaults to the 'factorize_keys' option (see set_option()).
     **kwargs : dict, optional
         Additional keyword arguments to be passed to the merge function.
 
@@ -443,7 +921,7 @@ def right_join(df1, df2, on=None, fill_na=None, **kwargs):
     df2 = pd.DataFrame({'A': ['foo', 'bar', 'other'], 'B': [1, 2, 3]})
     df3 = df1 >> right_join(df2, on = ['A'], fill_na = {'C' : 0, 'D' : -999})
     """
-    merged_df = df1.merge(df2, how='right', left_on=on, right_on=on, **kwargs)
+    merged_df = _merge(df1, df2, how='right', on=on, factorize=factorize, **kwargs)
 
     if fill_na is not None:
         if isinstance(fill_na, dict):
@@ -457,7 +935,7 @@ def right_join(df1, df2, on=None, fill_na=None, **kwargs):
 
 
 @Pipe
-def full_join(df1, df2, on=None, fill_na=None, **kwargs):
+def full_join(df1, df2, on=None, fill_na=None, factorize=None, **kwargs):
     """
     Function to perform a full join between two pandas DataFrames.
 
@@ -472,6 +950,10 @@ def full_join(df1, df2, on=None, fill_na=None, **kwargs):
     fill_na : dict or any, optional
         A dictionary or a single value where keys are column names in `df1` or `df2` (or both) and values are the corresponding fill values,
         or a single value to be applied to all columns in `df1` and `df2` that are not present in each other.
+    factorize : bool, optional
+        Join on integer codes instead of object and string key values. Only applies when
+        the keys are given with `on`; joins on all shared columns or on left_on/right_on
+        use the key values. Defaults to the 'factorize_keys' option (see set_option()).
     **kwargs : dict, optional
         Additional keyword arguments to be passed to the merge function.
 
@@ -498,7 +980,7 @@ def full_join(df1, df2, on=None, fill_na=None, **kwargs):
     df2 = pd.DataFrame({'A': ['foo', 'bar', 'other'], 'B': [1, 2, 3]})
     df3 = df1 >> full_join(df2, on = ['A'], fill_na = {'C' : 0, 'D' : -999})
     """
-    merged_df = df1.merge(df2, how='outer', left_on=on, right_on=on, **kwargs)
+    merged_df = _merge(df1, df2, how='outer', on=on, factorize=factorize, **kwargs)
 
     if fill_na is not None:
         if isinstance(fill_na, dict):
@@ -513,6 +995,268 @@ def full_join(df1, df2, on=None, fill_na=None, **kwargs):
     return merged_df
 
 
+def _check_join_input(df1, df2, columns1, columns2):
+    if not isinstance(df1, pd.DataFrame) or not isinstance(df2, pd.DataFrame):
+        raise TypeError('Both inputs should be pandas DataFrames.')
+    for df, columns in ((df1, columns1), (df2, columns2)):
+        for col in columns:
+            if col not in df.columns:
+                raise KeyError(f"Column '{col}' does not exist in the DataFrame")
+
+
+def _join_codes(df1, df2, by):
+    """
+    Group codes of the `by` columns numbered across both DataFrames, so that equal keys
+    get equal codes on either side.
+    """
+    if not by:
+        return np.zeros(len(df1), dtype=np.int64), np.zeros(len(df2), dtype=np.int64)
+    codes, _ = _group_codes(pd.concat([df1[by], df2[by]], ignore_index=True), by)
+    return codes[:len(df1)], codes[len(df1):]
+
+
+def _time_offset(series, value):
+    """
+    A tolerance or distance in the units of _time_values(series).
+    """
+    if pd.api.types.is_datetime64_any_dtype(series) or pd.api.types.is_timedelta64_dtype(series):
+        return pd.Timedelta(value).value
+    return value
+
+
+def _search_sorted(values, queries, side='left'):
+    """
+    np.searchsorted with the queries sorted first: consecutive queries then land near each
+    other, which is several times faster on large arrays than searching in random order.
+    """
+    if len(queries) < 2 or np.all(queries[1:] >= queries[:-1]):
+        return np.searchsorted(values, queries, side=side)
+    order = np.argsort(queries)
+    positions = np.empty(len(queries), dtype=np.intp)
+    positions[order] = np.searchsorted(values, queries[order], side=side)
+    return positions
+
+
+def _sorted_blocks(codes, times):
+    """
+    The order sorting rows by group then time, and for the sorted rows one int64 key per
+    row ranking (group, time), with the sorted distinct times the ranks refer to. Keys of
+    a group occupy the range [code * width, (code + 1) * width).
+    """
+    order = np.lexsort((times, codes))
+    codes, times = codes[order], times[order]
+    distinct_times = np.sort(times)
+    distinct_times = distinct_times[np.concatenate(([True], distinct_times[1:] != distinct_times[:-1]))]
+    width = len(distinct_times) + 1
+    keys = codes * width + _search_sorted(distinct_times, times)
+    return order, keys, distinct_times, width
+
+
+def _joined_frame(df1, df2, left_rows, right_rows, drop, suffixes):
+    """
+    Put the rows left_rows of df1 next to the rows right_rows of df2 (-1 for no match,
+    giving missing values), without df2's `drop` columns. Overlapping names get suffixes.
+    """
+    left_df = df1.reset_index(drop=True)
+    if left_rows is not None:
+        left_df = left_df.take(left_rows).reset_index(drop=True)
+    right_df = df2.drop(columns=drop).reset_index(drop=True).reindex(right_rows).reset_index(drop=True)
+    overlap = set(left_df.columns) & set(right_df.columns)
+    if overlap:
+        left_df = left_df.rename(columns={col: f'{col}{suffixes[0]}' for col in overlap})
+        right_df = right_df.rename(columns={col: f'{col}{suffixes[1]}' for col in overlap})
+    return pd.concat([left_df, right_df], axis=1)
+
+
+@Pipe
+def asof_join(df1, df2, on, by=None, direction='backward', tolerance=None, allow_exact_matches=True,
+              suffixes=('_x', '_y')):
+    """
+    Function to match each row of the first DataFrame with the nearest row of the second by
+    time (or any ordered column), optionally within groups, like pandas.merge_asof. Neither
+    DataFrame needs to be sorted: the second is sorted once by group and time, and every
+    match is found with one vectorized searchsorted over the sorted group blocks.
+
+    Parameters:
+    -----------
+    df1 : pandas.DataFrame
+        The first DataFrame. Every row is kept, in order.
+    df2 : pandas.DataFrame
+        The second DataFrame.
+    on : str
+        The time (or numeric) column, present in both DataFrames.
+    by : str or list, optional
+        Column(s) that must match exactly.
+    direction : str, optional
+        'backward' (default) matches the last row at or before each time, 'forward' the
+        first row at or after it, and 'nearest' the closest one (the earlier on ties).
+    tolerance : str, pandas.Timedelta or number, optional
+        The largest allowed distance between matched times, e.g. '5min'.
+    allow_exact_matches : bool, optional
+        Match rows with equal times. Default is True.
+    suffixes : tuple, optional
+        Suffixes added to overlapping column names. Default is ('_x', '_y').
+
+    Returns:
+    --------
+    pandas.DataFrame
+        The rows of `df1` with the columns of the matched `df2` rows, missing where there
+        is no match.
+
+    Example Usage:
+    --------------
+    trades = pd.DataFrame({'ts': pd.to_datetime(['2024-01-01 10:00:02', '2024-01-01 10:00:05']),
+                           'ticker': ['A', 'B'], 'price': [10.1, 20.3]})
+    quotes = pd.DataFrame({'ts': pd.to_datetime(['2024-01-01 10:00:01', '2024-01-01 10:00:04']),
+                           'ticker': ['A', 'B'], 'bid': [10.0, 20.1]})
+    new_df = trades >> asof_join(quotes, on='ts', by='ticker', tolerance='2s')
+    """
+    by = [by] if isinstance(by, str) else list(by or [])
+    _check_join_input(df1, df2, [on] + by, [on] + by)
+    if direction not in ('backward', 'forward', 'nearest'):
+        raise ValueError('direction should be "backward", "forward" or "nearest".')
+    left_codes, right_codes = _join_codes(df1, df2, by)
+    left_times = _time_values(df1[on])
+    right_rows = np.flatnonzero(df2[on].notna().to_numpy())
+    matches = np.full(len(df1), -1, dtype=np.int64)
+    if len(right_rows) == 0:
+        return _joined_frame(df1, df2, None, matches, [on] + by, suffixes)
+
+    order, keys, distinct_times, width = _sorted_blocks(right_codes[right_rows], _time_values(df2[on])[right_rows])
+    order = right_rows[order]
+    sorted_codes, sorted_times = right_codes[order], _time_values(df2[on])[order]
+
+    def candidates(backward):
+        # Rank of the last (first) distinct time before (after) each time, then the
+        # last (first) row of the group block with that rank
+        if backward:
+            ranks = _search_sorted(distinct_times, left_times, side='right' if allow_exact_matches else 'left') - 1
+            positions = _search_sorted(keys, left_codes * width + ranks, side='right') - 1
+        else:
+            ranks = _search_sorted(distinct_times, left_times, side='left' if allow_exact_matches else 'right')
+            positions = _search_sorted(keys, left_codes * width + ranks, side='left')
+        clipped = np.clip(positions, 0, len(keys) - 1)
+        found = (positions == clipped) & (sorted_codes[clipped] == left_codes)
+        return clipped, found
+
+    if direction == 'nearest':
+        before, found_before = candidates(True)
+        after, found_after = candidates(False)
+        use_after = found_after & (~found_before | (sorted_times[after] - left_times < left_times - sorted_times[before]))
+        positions, found = np.where(use_after, after, before), found_before | found_after
+    else:
+        positions, found = candidates(direction == 'backward')
+    found &= df1[on].notna().to_numpy()
+    if tolerance is not None:
+        found &= np.abs(left_times - sorted_times[positions]) <= _time_offset(df1[on], tolerance)
+    matches[found] = order[positions[found]]
+    return _joined_frame(df1, df2, None, matches, [on] + by, suffixes)
+
+
+# Candidate pairs examined at once by range_join()
+_RANGE_JOIN_BATCH = 2 ** 22
+
+
+@Pipe
+def range_join(df1, df2, on, lo, hi, by=None, closed='both', how='inner', suffixes=('_x', '_y')):
+    """
+    Function to join each row of the first DataFrame with every row of the second whose
+    interval [lo, hi] contains its `on` value, optionally within groups. The second
+    DataFrame is sorted once by group and interval start; for each row, the intervals that
+    can contain it start within one maximum interval length (of its group) before it, and
+    are found with searchsorted and checked in batches. Memory grows with the inputs and
+    the number of matches, never with the cross product.
+
+    Parameters:
+    -----------
+    df1 : pandas.DataFrame
+        The first DataFrame.
+    df2 : pandas.DataFrame
+        The second DataFrame, holding the intervals.
+    on : str
+        The time (or numeric) column of `df1`.
+    lo : str
+        The column of `df2` where intervals start.
+    hi : str
+        The column of `df2` where intervals end.
+    by : str or list, optional
+        Column(s), present in both DataFrames, that must match exactly.
+    closed : str, optional
+        Which interval ends are inclusive: 'both' (default), 'left', 'right' or 'neither'.
+    how : str, optional
+        'inner' (default) keeps matched rows only, 'left' also keeps the rows of `df1`
+        without a match.
+    suffixes : tuple, optional
+        Suffixes added to overlapping column names. Default is ('_x', '_y').
+
+    Returns:
+    --------
+    pandas.DataFrame
+        One row per match, in the order of `df1` then of the interval starts.
+
+    Example Usage:
+    --------------
+    events = pd.DataFrame({'host': ['a', 'a', 'b'], 'ts': [3, 12, 5]})
+    windows = pd.DataFrame({'host': ['a', 'a', 'b'], 'start': [0, 10, 0], 'end': [5, 15, 4],
+                            'label': ['boot', 'deploy', 'boot']})
+    new_df = events >> range_join(windows, on='ts', lo='start', hi='end', by='host')
+    """
+    by = [by] if isinstance(by, str) else list(by or [])
+    _check_join_input(df1, df2, [on] + by, [lo, hi] + by)
+    if closed not in ('both', 'left', 'right', 'neither'):
+        raise ValueError('closed should be "both", "left", "right" or "neither".')
+    if how not in ('inner', 'left'):
+        raise ValueError('how should be either "inner" or "left".')
+    left_codes, right_codes = _join_codes(df1, df2, by)
+    left_times = _time_values(df1[on])
+    right_rows = np.flatnonzero((df2[lo].notna() & df2[hi].notna()).to_numpy())
+    left_parts, right_parts = [], []
+
+    if len(right_rows) > 0:
+        order, keys, distinct_starts, width = _sorted_blocks(right_codes[right_rows], _time_values(df2[lo])[right_rows])
+        order = right_rows[order]
+        sorted_codes = right_codes[order]
+        starts, ends = _time_values(df2[lo])[order], _time_values(df2[hi])[order]
+        # Longest interval of each group block
+        block_starts = np.flatnonzero(np.concatenate(([True], sorted_codes[1:] != sorted_codes[:-1])))
+        block_codes = sorted_codes[block_starts]
+        block_spans = np.maximum.reduceat(np.maximum(ends - starts, 0), block_starts)
+        blocks = np.clip(np.searchsorted(block_codes, left_codes), 0, len(block_codes) - 1)
+        spans = np.where(block_codes[blocks] == left_codes, block_spans[blocks], 0)
+        # Candidates: intervals of the same group starting in [t - span, t]
+        end_ranks = _search_sorted(distinct_starts, left_times, side='right' if closed in ('both', 'left') else 'left')
+        first_ranks = _search_sorted(distinct_starts, left_times - spans, side='left')
+        first = _search_sorted(keys, left_codes * width + first_ranks, side='left')
+        last = _search_sorted(keys, left_codes * width + end_ranks, side='left')
+        sizes = np.where(df1[on].notna().to_numpy(), np.maximum(last - first, 0), 0)
+
+        # Expand and check the candidates in batches of about _RANGE_JOIN_BATCH pairs
+        totals = np.cumsum(sizes)
+        boundaries = np.searchsorted(totals, np.arange(_RANGE_JOIN_BATCH, totals[-1] if len(totals) else 0,
+                                                       _RANGE_JOIN_BATCH), side='left')
+        for batch_start, batch_end in zip(np.concatenate(([0], boundaries)), np.concatenate((boundaries, [len(df1)]))):
+            batch_sizes = sizes[batch_start:batch_end]
+            left_rows = np.repeat(np.arange(batch_start, batch_end), batch_sizes)
+            offsets = np.arange(len(left_rows)) - np.repeat(np.cumsum(batch_sizes) - batch_sizes, batch_sizes)
+            positions = np.repeat(first[batch_start:batch_end], batch_sizes) + offsets
+            if closed in ('both', 'right'):
+                keep = ends[positions] >= left_times[left_rows]
+            else:
+                keep = ends[positions] > left_times[left_rows]
+            left_parts.append(left_rows[keep])
+            right_parts.append(order[positions[keep]])
+
+    left_rows = np.concatenate(left_parts) if left_parts else np.empty(0, dtype=np.int64)
+    right_rows = np.concatenate(right_parts) if right_parts else np.empty(0, dtype=np.int64)
+    if how == 'left':
+        unmatched = np.flatnonzero(np.bincount(left_rows, minlength=len(df1)) == 0)
+        left_rows = np.concatenate((left_rows, unmatched))
+        right_rows = np.concatenate((right_rows, np.full(len(unmatched), -1, dtype=np.int64)))
+        sort = np.argsort(left_rows, kind='stable')
+        left_rows, right_rows = left_rows[sort], right_rows[sort]
+    return _joined_frame(df1, df2, left_rows, right_rows, by, suffixes)
+
+
 @Pipe
 def union(df1, df2, reset_index = True, **kwargs):
     """
@@ -659,6 +1403,68 @@ def drop_na(df, *cols):
 
 
 
+def _random_generator(random_state):
+    """
+    A numpy Generator or RandomState from a seed, or the given generator itself.
+    """
+    if isinstance(random_state, (np.random.Generator, np.random.RandomState)):
+        return random_state
+    return np.random.default_rng(random_state)
+
+
+def _grouped_sample(grouped, rng, n=None, frac=None):
+    """
+    Sample rows within each group in one pass: every row gets a random key, rows are
+    sorted by group then key, and the rows whose rank in their group is below the group's
+    sample size are kept. Rows with missing group keys are dropped, as in summarise().
+    """
+    df = grouped.obj
+    codes = grouped.ngroup().to_numpy()
+    keys = rng.random(len(df))
+    valid = ~np.isnan(codes) if codes.dtype.kind == 'f' else np.ones(len(df), dtype=bool)
+    rows = np.flatnonzero(valid)
+    codes = codes[valid].astype(np.int64)
+    order = rows[np.lexsort((keys[valid], codes))]
+    sizes = np.bincount(codes)
+    starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+    sorted_codes = np.sort(codes, kind='stable')
+    rank = np.arange(len(sorted_codes)) - starts[sorted_codes]
+    limits = np.minimum(n, sizes) if frac is None else np.round(frac * sizes)
+    return df.take(order[rank < limits[sorted_codes]])
+
+
+def _reservoir_sample(chunks, rng, n):
+    """
+    Sample n rows from an iterable of DataFrames in a single pass. Each row gets a random
+    key and the n rows with the smallest keys so far are kept, so at most n rows plus one
+    chunk are held in memory. Rows are returned in their input order.
+    """
+    reservoir, reservoir_keys, offset = None, np.empty(0), 0
+    positions = np.empty(0, dtype=np.int64)
+    for chunk in chunks:
+        keys = np.concatenate((reservoir_keys, rng.random(len(chunk))))
+        candidates = chunk if reservoir is None else pd.concat([reservoir, chunk])
+        positions = np.concatenate((positions, offset + np.arange(len(chunk))))
+        offset += len(chunk)
+        if len(keys) > n:
+            keep = np.sort(np.argpartition(keys, n - 1)[:n]) if n > 0 else np.empty(0, dtype=np.int64)
+            candidates, keys, positions = candidates.iloc[keep], keys[keep], positions[keep]
+        reservoir, reservoir_keys = candidates, keys
+    if reservoir is None:
+        raise ValueError('Cannot sample from an empty iterable of DataFrames')
+    return reservoir
+
+
+def _check_sample_input(df):
+    # A Series is iterable, but sampled as a whole like a DataFrame (not as chunks)
+    if isinstance(df, (pd.DataFrame, pd.Series, pd.core.groupby.DataFrameGroupBy)):
+        return df
+    if isinstance(df, (str, bytes)) or not hasattr(df, '__iter__'):
+        raise TypeError(f"Expected pandas DataFrame, DataFrameGroupBy or an iterable of DataFrames, "
+                        f"but got {type(df).__name__}")
+    return iter(df)
+
+
 @Pipe
 def sample_n(df, n, random_state=None):
     """
@@ -667,19 +1473,28 @@ def sample_n(df, n, random_state=None):
 
     Parameters:
     -----------
-    df : pandas DataFrame
-        The DataFrame from which to sample.
+    df : pandas DataFrame, Series, DataFrameGroupBy or iterable of DataFrames
+        The DataFrame from which to sample. After group_by(), n rows are sampled from each
+        group (or the whole group if it is smaller). An iterable of DataFrames, such as
+        chunks read with pandas.read_csv(chunksize=...), is sampled in a single pass while
+        holding at most n rows and one chunk in memory.
     n : int
         The number of rows to sample.
     random_state : int or numpy.random.RandomState, optional
-        A random state for reproducible results.
+        A random state for reproducible results. For grouped and iterable inputs, the same
+        seed gives the same sample whatever the chunk sizes.
 
     Returns:
     --------
     pandas DataFrame
         A new DataFrame with n randomly sampled rows.
     """
-    return df.sample(n, random_state=random_state)
+    df = _check_sample_input(df)
+    if isinstance(df, (pd.DataFrame, pd.Series)):
+        return df.sample(n, random_state=random_state)
+    if isinstance(df, pd.core.groupby.DataFrameGroupBy):
+        return _grouped_sample(df, _random_generator(random_state), n=n)
+    return _reservoir_sample(df, _random_generator(random_state), n)
 
 
 @Pipe
@@ -690,8 +1505,10 @@ def sample_frac(df, frac, random_state=None):
 
     Parameters:
     -----------
-    df : pandas DataFrame
-        The DataFrame from which to sample.
+    df : pandas DataFrame, Series, DataFrameGroupBy or iterable of DataFrames
+        The DataFrame from which to sample. After group_by(), the fraction is taken from
+        each group. An iterable of DataFrames is sampled in a single pass by keeping each
+        row with probability frac, so the number of rows is only frac of the total on average.
     frac : float
         The fraction of rows to sample.
     random_state : int or numpy.random.RandomState, optional
@@ -702,7 +1519,16 @@ def sample_frac(df, frac, random_state=None):
     pandas DataFrame
         A new DataFrame with frac randomly sampled rows.
     """
-    return df.sample(frac=frac, random_state=random_state)
+    df = _check_sample_input(df)
+    if isinstance(df, (pd.DataFrame, pd.Series)):
+        return df.sample(frac=frac, random_state=random_state)
+    rng = _random_generator(random_state)
+    if isinstance(df, pd.core.groupby.DataFrameGroupBy):
+        return _grouped_sample(df, rng, frac=frac)
+    chunks = [chunk.loc[rng.random(len(chunk)) < frac] for chunk in df]
+    if not chunks:
+        raise ValueError('Cannot sample from an empty iterable of DataFrames')
+    return pd.concat(chunks)
 
 
 @Pipe
@@ -746,20 +1572,369 @@ def tail(df, n=5):
     return df.tail(n)
 
 
+def _count_input(df, cols):
+    """
+    The DataFrame and key columns to count: after group_by(), the group keys come first.
+    """
+    if isinstance(df, pd.core.groupby.DataFrameGroupBy):
+        keys = df.keys if isinstance(df.keys, list) else [df.keys]
+        return df.obj, keys + [col for col in cols if col not in keys]
+    if not isinstance(df, pd.DataFrame):
+        raise TypeError(f"Expected pandas DataFrame, but got {type(df).__name__}")
+    return df, list(cols)
+
+
+def _key_counts(df, cols, wt):
+    """
+    Codes of the distinct key combinations, the combinations, and the number of rows (or
+    sum of wt) per combination, from one bincount over the codes.
+    """
+    for col in cols + ([wt] if wt is not None else []):
+        if col not in df.columns:
+            raise KeyError(f"Column '{col}' does not exist in the DataFrame")
+    codes, keys_df = _group_codes(df, cols)
+    weights = None
+    if wt is not None:
+        weights = df[wt].to_numpy(dtype=np.float64, na_value=np.nan)
+        weights = np.where(np.isnan(weights), 0.0, weights)
+    counts = np.bincount(codes, weights=weights, minlength=len(keys_df))
+    return codes, keys_df, counts
+
+
+@Pipe
+def count(df, *cols, sort=True, name='n', wt=None, top=None):
+    """
+    Function to count the rows for each combination of values in one or more columns.
+    Keys are factorized into integer codes and counted with a single bincount.
+
+    Parameters:
+    -----------
+    df : pandas.DataFrame or DataFrameGroupBy
+        The input DataFrame. After group_by(), the group columns are counted first.
+    *cols : str
+        The column(s) to count by. Missing values are counted as their own key.
+    sort : bool, optional
+        Sort by decreasing count (ties keep key order). Default is True; otherwise the
+        result is sorted by the keys.
+    name : str, optional
+        Name of the count column. Default is 'n'.
+    wt : str, optional
+        Column whose values are summed instead of counting rows. Missing weights count as 0.
+    top : int, optional
+        Only return the `top` most frequent keys, found with a partial sort.
+
+    Returns:
+    --------
+    pandas.DataFrame
+        One row per key with its count.
+
+    Example Usage:
+    --------------
+    df = read_grades_dataset()
+    new_df = df >> count('Subject')
+    new_df = df >> count('Subject', wt='Grade', name='total', top=3)
+    """
+    df, cols = _count_input(df, cols)
+    codes, keys_df, counts = _key_counts(df, cols, wt)
+    if wt is None:
+        counts = counts.astype(np.int64)
+    order = np.arange(len(counts))
+    if top is not None and top < len(counts):
+        # Only the top entries need ordering: select them in linear time, then sort them
+        order = np.argpartition(-counts, top - 1)[:top]
+        order = order[np.lexsort((order, -counts[order]))]
+    elif sort:
+        order = np.argsort(-counts, kind='stable')
+    out_df = keys_df.take(order).reset_index(drop=True)
+    out_df[name] = counts[order]
+    return out_df
+
 
-# TO DO
 @Pipe
-def column_search(df):
-    pass
+def tally(df, sort=False, name='n', wt=None):
+    """
+    Function to count rows: the number of rows of a DataFrame, or of each group after
+    group_by().
 
+    Parameters:
+    -----------
+    df : pandas.DataFrame or DataFrameGroupBy
+        The input DataFrame.
+    sort : bool, optional
+        Sort groups by decreasing count. Default is False.
+    name : str, optional
+        Name of the count column. Default is 'n'.
+    wt : str, optional
+        Column whose values are summed instead of counting rows.
 
+    Returns:
+    --------
+    pandas.DataFrame
+        One row (per group) with the count.
 
+    Example Usage:
+    --------------
+    df = read_grades_dataset()
+    new_df = df >> group_by('Subject') >> tally()
+    """
+    return df >> count(sort=sort, name=name, wt=wt)
 
 
+@Pipe
+def add_count(df, *cols, name='n', wt=None):
+    """
+    Function to add a column with the number of rows sharing each row's key, without
+    aggregating. Counts are broadcast back to the rows through their key codes, so no join
+    is needed.
 
+    Parameters:
+    -----------
+    df : pandas.DataFrame or DataFrameGroupBy
+        The input DataFrame. After group_by(), the group columns are used as keys first.
+    *cols : str
+        The column(s) to count by.
+    name : str, optional
+        Name of the new column. Default is 'n'.
+    wt : str, optional
+        Column whose values are summed instead of counting rows.
 
+    Returns:
+    --------
+    pandas.DataFrame
+        The input DataFrame with the count column added.
 
+    Example Usage:
+    --------------
+    df = read_grades_dataset()
+    new_df = df >> add_count('Subject') >> where('n > 2')
+    """
+    df, cols = _count_input(df, cols)
+    codes, _, counts = _key_counts(df, cols, wt)
+    out_df = df.copy()
+    out_df[name] = counts[codes] if wt is not None else counts[codes].astype(np.int64)
+    return out_df
 
 
+@Pipe
+def spread(df, key, value, fill=None, sparse=False):
+    """
+    Function to spread a key-value pair across columns (long to wide format). Each distinct
+    value of `key` becomes a column holding the matching values of `value`, and the other
+    columns identify the rows. Keys and identifiers are factorized into integer codes and
+    the values are scattered into one preallocated array.
 
+    Parameters:
+    -----------
+    df : pandas.DataFrame
+        The input DataFrame.
+    key : str
+        The column whose values become column names.
+    value : str
+        The column whose values fill the new columns.
+    fill : any, optional
+        Value for combinations missing from the input. Default leaves them as NaN.
+    sparse : bool, optional
+        Return the new columns as pandas sparse arrays, storing only the cells present in
+        the input. Useful for wide, mostly empty results.
 
+    Returns:
+    --------
+    pandas.DataFrame
+        The wide DataFrame, sorted by the identifying columns, with new columns in sorted order.
+
+    Raises:
+    -------
+    ValueError
+        If several rows have the same identifiers and key.
+
+    Example Usage:
+    --------------
+    import pandas as pd
+    df = pd.DataFrame({'id': [1, 1, 2], 'metric': ['x', 'y', 'x'], 'v': [10, 20, 30]})
+    new_df = df >> spread('metric', 'v', fill=0)
+    """
+    # Error handling
+    if not isinstance(df, pd.DataFrame):
+        raise TypeError(f"Expected pandas DataFrame, but got {type(df).__name__}")
+    for col in (key, value):
+        if col not in df.columns:
+            raise KeyError(f"Column '{col}' does not exist in the DataFrame")
+
+    id_columns = [col for col in df.columns if col not in (key, value)]
+    row_codes, id_df = _group_codes(df, id_columns)
+    col_codes, col_uniques = pd.factorize(df[key], sort=True, use_na_sentinel=False)
+    n_rows, n_cols = len(id_df), len(col_uniques)
+    cells = row_codes * n_cols + col_codes
+    if pd.Series(cells).duplicated().any():
+        raise ValueError(f"Each row must have a unique combination of identifiers and '{key}'")
+
+    values = df[value].to_numpy()
+    if fill is None:
+        fill = np.nan
+        dtype = np.result_type(values.dtype, np.float64) if values.dtype.kind in 'biuf' else object
+    else:
+        dtype = np.result_type(values.dtype, np.asarray(fill).dtype) if values.dtype.kind in 'biuf' else object
+    if sparse:
+        from pandas._libs.sparse import IntIndex
+        # Cells sorted by column then row; each new column is a slice of them
+        order = np.argsort(col_codes * n_rows + row_codes)
+        bounds = np.searchsorted(col_codes[order], np.arange(n_cols + 1))
+        sparse_dtype = pd.SparseDtype(dtype, fill)
+        columns = {}
+        for j, name in enumerate(col_uniques):
+            cell_order = order[bounds[j]:bounds[j + 1]]
+            columns[name] = pd.arrays.SparseArray(
+                values[cell_order].astype(dtype), dtype=sparse_dtype,
+                sparse_index=IntIndex(n_rows, row_codes[cell_order].astype(np.int32)))
+        wide_df = pd.DataFrame(columns)
+    else:
+        block = np.full(n_rows * n_cols, fill, dtype=dtype)
+        block[cells] = values
+        wide_df = pd.DataFrame(block.reshape(n_rows, n_cols), columns=col_uniques)
+    return pd.concat([id_df, wide_df], axis=1)
+
+
+@Pipe
+def gather(df, *cols, into=('key', 'value'), drop_na=False):
+    """
+    Function to gather columns into key-value pairs (wide to long format). The values of
+    the gathered columns are copied into one preallocated array, column by column, and the
+    other columns are repeated for each of them.
+
+    Parameters:
+    -----------
+    df : pandas.DataFrame
+        The input DataFrame.
+    *cols : str, list or Selector
+        The columns to gather, by name or with selectors such as starts_with(). Default
+        gathers every column.
+    into : tuple, optional
+        Names of the new key and value columns. Default is ('key', 'value').
+    drop_na : bool, optional
+        Drop rows whose value is missing. Default is False.
+
+    Returns:
+    --------
+    pandas.DataFrame
+        The long DataFrame. The key column is categorical, with the gathered column names
+        as categories in their original order.
+
+    Example Usage:
+    --------------
+    import pandas as pd
+    df = pd.DataFrame({'id': [1, 2], 'x': [10, 30], 'y': [20, np.nan]})
+    new_df = df >> gather('x', 'y', into=('metric', 'v'))
+    """
+    # Error handling
+    if not isinstance(df, pd.DataFrame):
+        raise TypeError(f"Expected pandas DataFrame, but got {type(df).__name__}")
+    if len(cols) == 1 and isinstance(cols[0], (list, tuple)):
+        cols = tuple(cols[0])
+    positions = resolve_columns(df, cols) if cols else np.arange(len(df.columns))
+    gathered = df.columns[positions].tolist()
+    id_columns = [col for col in df.columns if col not in gathered]
+    key_name, value_name = into
+
+    n_rows, n_cols = len(df), len(gathered)
+    arrays = [df[col].to_numpy() for col in gathered]
+    dtype = object
+    if arrays and all(array.dtype.kind in 'biufcmM' for array in arrays):
+        try:
+            dtype = np.result_type(*[array.dtype for array in arrays])
+        except TypeError:
+            # No common dtype (e.g. integers and datetimes): keep the values as objects, as melt does
+            pass
+    values = np.empty(n_rows * n_cols, dtype=dtype)
+    for j, array in enumerate(arrays):
+        values[j * n_rows:(j + 1) * n_rows] = array
+    keys = pd.Categorical.from_codes(np.repeat(np.arange(n_cols), n_rows), categories=pd.Index(gathered))
+
+    long_df = df[id_columns].take(np.tile(np.arange(n_rows), n_cols)).reset_index(drop=True)
+    long_df[key_name] = keys
+    long_df[value_name] = values
+    if drop_na:
+        long_df = long_df.loc[long_df[value_name].notna()].reset_index(drop=True)
+    return long_df
+
+
+@Pipe
+def compact(df, max_unique_ratio=0.5, string_dtype='category', report=False):
+    """
+    A function to shrink the memory footprint of a DataFrame by narrowing its dtypes.
+    Integer columns are downcast to the smallest signed type that holds their values, float64
+    columns become float32 when that loses nothing, and string columns with few distinct
+    values become categorical. The number of bytes saved is stored in df.attrs['bytes_saved'].
+    This function can be used in a pyplyr pipeline.
+
+    Note that arithmetic on downcast integer columns wraps around on overflow, e.g. an
+    int8 column multiplied by 1000 in mutate().
+
+    Parameters:
+    -----------
+    df : pandas DataFrame
+        The DataFrame to compact.
+    max_unique_ratio : float, default 0.5
+        String columns whose number of distinct values is at most this fraction of the
+        number of rows are converted.
+    string_dtype : str, default 'category'
+        Dtype for converted string columns, either 'category' or 'arrow' (pyarrow-backed strings).
+    report : bool, default False
+        Print the memory usage before and after.
+
+    Returns:
+    --------
+    pandas DataFrame
+        A new DataFrame with narrower dtypes.
+
+    Example Usage:
+    --------------
+    import pandas as pd
+    df = pd.DataFrame({'A': ['foo', 'foo', 'foo', 'bar', 'bar', 'bar'],
+                       'B': [10, 20, 30, 40, 50, 60]})
+    new_df = df >> compact(report=True) >> group_by('A') >> summarise(SUM_B = ('B', 'sum'))
+    """
+    # Error handling
+    if not isinstance(df, pd.DataFrame):
+        raise TypeError(f"Expected pandas DataFrame, but got {type(df).__name__}")
+    if string_dtype not in ('category', 'arrow'):
+        raise ValueError('string_dtype should be either "category" or "arrow".')
+    out_df, bytes_saved = _compact_frame(df, max_unique_ratio=max_unique_ratio, string_dtype=string_dtype)
+    if report:
+        bytes_before = df.memory_usage(deep=True).sum()
+        print(f"compact: {bytes_before:,} -> {bytes_before - bytes_saved:,} bytes "
+              f"({bytes_saved / max(bytes_before, 1):.1%} saved)")
+    return out_df
+
+
+
+@Pipe
+def column_search(df, *patterns):
+    """
+    Function to find column names in a pandas DataFrame. Names are matched against a cached
+    index of the DataFrame's columns, so repeated searches on wide DataFrames are cheap.
+
+    Parameters:
+    -----------
+    df : pandas.DataFrame
+        The input DataFrame.
+    *patterns : str or Selector
+        Regular expressions searched for in the column names, or selectors such as
+        starts_with() or of_type(). Columns matching any of them are returned.
+
+    Returns:
+    --------
+    list
+        The matching column names, in DataFrame order.
+
+    Example Usage:
+    --------------
+    import pandas as pd
+    df = pd.DataFrame({'x_1': [1, 2], 'x_2': [3, 4], 'y': ['a', 'b']})
+    names = df >> column_search('^x_')
+    names = df >> column_search(of_type('string'))
+    """
+    # Error handling
+    if not isinstance(df, pd.DataFrame):
+        raise TypeError(f"Expected pandas DataFrame, but got {type(df).__name__}")
+    positions = np.sort(resolve_columns(df, patterns, strings='patterns'))
+    return df.columns[positions].tolist()
@@ -0,0 +1,213 @@
+### Configuration
+###############################################################################
+# Import packages
+import asyncio
+import os
+import time
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+
+# Import modules
+from .pandaplyr import _apply_pipeline
+from .scan import Scan
+
+# Pipeline stages timed by run_async()
+_STAGES = ('read', 'compute', 'write')
+
+# Marks the end of a stage's queue
+_DONE = object()
+
+
+### Define Classes & Functions
+###############################################################################
+class RunResult:
+    """
+    The outcome of run_async(): the per-source results and how long each stage took.
+
+    Parameters:
+    -----------
+    results : list
+        For each source, in order, the pipeline's result, or the writer's return value
+        when a writer was given.
+    stats : pandas.DataFrame
+        One row per stage (read, compute, write) with the number of items, the total,
+        mean and max seconds spent on them, and the seconds the stage was blocked: reads
+        on a full queue (backpressure), compute and writes on an empty one (starvation).
+    elapsed : float
+        Wall-clock seconds for the whole run. When stages overlap, the stage totals add
+        up to more than this.
+    """
+    def __init__(self, results, stats, elapsed):
+        self.results = results
+        self.stats = stats
+        self.elapsed = elapsed
+
+    def __repr__(self):
+        return f"RunResult({len(self.results)} sources, elapsed={self.elapsed:.3f}s)"
+
+
+class _StageStats:
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.wait_seconds = 0.0
+
+    def add(self, seconds):
+        self.count += 1
+        self.seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+
+
+def _timed(func, *args):
+    start = time.perf_counter()
+    value = func(*args)
+    return value, time.perf_counter() - start
+
+
+def read_source(source):
+    """
+    Default reader of run_async(): DataFrames are used as they are, scans are collected,
+    callables are called, and paths are read with pandas according to their extension
+    (.parquet/.pq, or CSV otherwise).
+    """
+    if isinstance(source, pd.DataFrame):
+        return source
+    if isinstance(source, Scan):
+        return source.collect()
+    if callable(source):
+        return source()
+    if isinstance(source, (str, os.PathLike)):
+        if str(source).lower().endswith(('.parquet', '.pq')):
+            return pd.read_parquet(source)
+        return pd.read_csv(source)
+    raise TypeError(f"Cannot read a source of type {type(source).__name__}")
+
+
+async def run_async(sources, pipeline, prefetch=2, reader=None, writer=None, read_workers=None):
+    """
+    Run a pipeline over many sources, overlapping reads, computation and writes. Upcoming
+    sources are read in worker threads while the current DataFrame goes through the
+    pipeline, and finished results are written in the background. Bounded queues between
+    the stages apply backpressure, so at most `prefetch` DataFrames wait at each stage.
+
+    Parameters:
+    -----------
+    sources : iterable
+        Paths, DataFrames, scans (scan_csv(), scan_parquet()) or functions returning a
+        DataFrame. The iterable is consumed lazily.
+    pipeline : Pipeline or Pipe
+        The pipeline to apply to each DataFrame.
+    prefetch : int, optional
+        Number of sources read ahead, and of results waiting to be written. Default is 2.
+    reader : function, optional
+        Function of a source returning a DataFrame. Default is read_source().
+    writer : function, optional
+        Function of (result, source) called in a background thread for each result,
+        e.g. to save it. Its return value replaces the result in RunResult.results.
+    read_workers : int, optional
+        Number of reader threads. Default is prefetch.
+
+    Returns:
+    --------
+    RunResult
+        The results, per-stage timings and elapsed time.
+
+    Example Usage:
+    --------------
+    pipeline = where('Grade > 70') >> group_by('Subject') >> summarise(AvgGrade = ('Grade', 'mean'))
+    run = await run_async(glob.glob('grades/*.csv'), pipeline, prefetch=2,
+                          writer=lambda df, path: df.to_parquet(path.replace('.csv', '.parquet')))
+    print(run.stats)
+    """
+    if prefetch < 1:
+        raise ValueError('prefetch should be at least 1.')
+    reader = reader or read_source
+    loop = asyncio.get_running_loop()
+    stats = {stage: _StageStats() for stage in _STAGES}
+    read_queue = asyncio.Queue(maxsize=prefetch)
+    write_queue = asyncio.Queue(maxsize=prefetch)
+    results = {}
+    read_pool = ThreadPoolExecutor(max_workers=read_workers or prefetch, thread_name_prefix='pandaplyr-read')
+    compute_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='pandaplyr-compute')
+    write_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='pandaplyr-write')
+
+    async def read_stage():
+        # Reads start as soon as they are queued; a full queue holds back further reads
+        for i, source in enumerate(sources):
+            future = loop.run_in_executor(read_pool, _timed, reader, source)
+            start = time.perf_counter()
+            await read_queue.put((i, source, future))
+            stats['read'].wait_seconds += time.perf_counter() - start
+        await read_queue.put(_DONE)
+
+    async def compute_stage():
+        while True:
+            start = time.perf_counter()
+            item = await read_queue.get()
+            if item is _DONE:
+                break
+            i, source, future = item
+            try:
+                df, seconds = await future
+            except Exception as e:
+                raise RuntimeError(f"Reader failed on source {source!r}: {e}") from e
+            stats['compute'].wait_seconds += time.perf_counter() - start
+            stats['read'].add(seconds)
+            try:
+                result, seconds = await loop.run_in_executor(compute_pool, _timed, _apply_pipeline, df, pipeline)
+            except Exception as e:
+                raise RuntimeError(f"Pipeline failed on source {source!r}: {e}") from e
+            stats['compute'].add(seconds)
+            await write_queue.put((i, source, result))
+        await write_queue.put(_DONE)
+
+    async def write_stage():
+        while True:
+            start = time.perf_counter()
+            item = await write_queue.get()
+            stats['write'].wait_seconds += time.perf_counter() - start
+            if item is _DONE:
+                break
+            i, source, result = item
+            if writer is not None:
+                try:
+                    result, seconds = await loop.run_in_executor(write_pool, _timed, writer, result, source)
+                except Exception as e:
+                    raise RuntimeError(f"Writer failed on source {source!r}: {e}") from e
+                stats['write'].add(seconds)
+            results[i] = result
+
+    start = time.perf_counter()
+    tasks = [asyncio.ensure_future(stage()) for stage in (read_stage, compute_stage, write_stage)]
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+    finally:
+        for pool in (read_pool, compute_pool, write_pool):
+            pool.shutdown(wait=False, cancel_futures=True)
+    elapsed = time.perf_counter() - start
+
+    stats_df = pd.DataFrame({
+        'count': [stats[stage].count for stage in _STAGES],
+        'seconds': [stats[stage].seconds for stage in _STAGES],
+        'mean_seconds': [stats[stage].seconds / max(stats[stage].count, 1) for stage in _STAGES],
+        'max_seconds': [stats[stage].max_seconds for stage in _STAGES],
+        'wait_seconds': [stats[stage].wait_seconds for stage in _STAGES],
+    }, index=pd.Index(_STAGES, name='stage'))
+    return RunResult([results[i] for i in range(len(results))], stats_df, elapsed)
+
+
+def run_pipeline(sources, pipeline, prefetch=2, reader=None, writer=None, read_workers=None):
+    """
+    Run run_async() from synchronous code, in a new event loop. Takes the same arguments.
+
+    Example Usage:
+    --------------
+    run = run_pipeline(paths, pipeline, writer=save_result)
+    """
+    return asyncio.run(run_async(sources, pipeline, prefetch=prefetch, reader=reader, writer=writer,
+                                 read_workers=read_workers))
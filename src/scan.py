@@ -0,0 +1,367 @@
+### Configuration
+###############################################################################
+# Import packages
+import ast
+import pandas as pd
+
+# Import modules
+from .expressions import expression_names, parse_condition
+from .pandaplyr import (Pipe, arrange, distinct, drop_na, fill_na, group_by, head, mutate,
+                        rename, sample_frac, sample_n, select, summarise, tail, where)
+from .sinks import write_csv, write_dataset, write_parquet
+
+# Verbs that only look at one row at a time, so they can run on each chunk of a streamed read
+_ROW_WISE_VERBS = (where.func, select.func, rename.func, fill_na.func, drop_na.func)
+
+# Verbs that keep or drop whole rows without reading any column
+_ROW_SUBSET_VERBS = (head.func, tail.func, sample_n.func, sample_frac.func)
+
+# Verbs that consume the scan's chunks as they are read instead of a collected DataFrame
+_SINK_VERBS = (write_parquet.func, write_csv.func, write_dataset.func)
+
+# Comparison operators that can be pushed into Parquet row-group filtering. != and not in
+# are left out: pyarrow drops null rows for them, while where() keeps them
+_PUSHDOWN_OPERATORS = {ast.Eq: '==', ast.Lt: '<', ast.LtE: '<=', ast.Gt: '>', ast.GtE: '>=', ast.In: 'in'}
+_FLIPPED_OPERATORS = {'<': '>', '<=': '>=', '>': '<', '>=': '<=', '==': '=='}
+
+
+### Define Classes & Functions
+###############################################################################
+class Scan:
+    """
+    A lazy pipeline source. Verbs chained onto a Scan with >> are recorded rather than
+    executed, so the file read can be narrowed to the columns (and, for Parquet, the row
+    groups) that the pipeline actually needs. Chain collect() to run the pipeline.
+
+    Parameters:
+    -----------
+    path : str
+        Path of the file to scan.
+    file_format : str
+        Either "csv" or "parquet".
+    chunksize : int, optional
+        If provided, read the file in chunks of this many rows and run the leading row-wise
+        verbs (where, select, rename, fill_na, drop_na) on each chunk as it is read.
+    **read_kwargs : dict, optional
+        Additional keyword arguments to be passed to the reader.
+    """
+    def __init__(self, path, file_format, chunksize=None, steps=(), **read_kwargs):
+        self.path = path
+        self.file_format = file_format
+        self.chunksize = chunksize
+        self.steps = list(steps)
+        self.read_kwargs = read_kwargs
+
+    def __rshift__(self, other):
+        if not isinstance(other, Pipe):
+            return NotImplemented
+        if other.func is collect.func:
+            return self.collect()
+        if other.func in _SINK_VERBS:
+            return other.func(self.iter_batches(), *getattr(other, 'args', ()), **getattr(other, 'kwargs', {}))
+        step = (other.func, getattr(other, 'args', ()), getattr(other, 'kwargs', {}))
+        return Scan(self.path, self.file_format, self.chunksize, self.steps + [step], **self.read_kwargs)
+
+    def __repr__(self):
+        verbs = ' >> '.join(func.__name__ for func, _, _ in self.steps)
+        return f"Scan('{self.path}', {self.file_format}){' >> ' + verbs if verbs else ''}"
+
+    def file_columns(self):
+        """
+        Column names stored in the scanned file, read from the header or schema only.
+        """
+        if self.file_format == 'parquet':
+            import pyarrow.parquet as pq
+            return list(pq.read_schema(self.path).names)
+        return list(pd.read_csv(self.path, nrows=0, **self.read_kwargs).columns)
+
+    def projected_columns(self):
+        """
+        Columns that the recorded verbs need from the file, in file order.
+        Returns None when every column is needed.
+        """
+        required = _required_columns(self.steps)
+        if required is None:
+            return None
+        return [col for col in self.file_columns() if col in required]
+
+    def pushdown_filters(self):
+        """
+        Simple predicates from the leading where() steps, in pyarrow filter format
+        (a list of (column, operator, value) tuples that are and-ed together). For Parquet,
+        only predicates whose literals match the column's type in the file are kept; the
+        others (e.g. a timestamp compared with a string) are left to the where() step.
+        """
+        filters = []
+        for func, args, kwargs in self.steps:
+            if func is where.func:
+                filters.extend(_condition_filters(args[0] if args else kwargs['condition']))
+            elif func is not select.func:
+                break
+        if filters and self.file_format == 'parquet':
+            import pyarrow.parquet as pq
+            schema = pq.read_schema(self.path)
+            filters = [(col, operator, value) for col, operator, value in filters
+                       if col in schema.names and all(_literal_fits(schema.field(col).type, literal)
+                                                      for literal in (value if operator == 'in' else [value]))]
+        return filters
+
+    def collect(self):
+        """
+        Read the file and run the recorded verbs.
+
+        Returns:
+        --------
+        pandas.DataFrame
+            The result of the pipeline.
+        """
+        columns = self.projected_columns()
+        steps = self.steps
+        if self.chunksize is None:
+            df = self._read(columns)
+        else:
+            n_row_wise = 0
+            while n_row_wise < len(steps) and steps[n_row_wise][0] in _ROW_WISE_VERBS:
+                n_row_wise += 1
+            chunks = [_apply_steps(chunk, steps[:n_row_wise]) for chunk in self._read_chunks(columns)]
+            if not chunks:
+                return _apply_steps(self._read(columns), steps)
+            df = pd.concat(chunks, ignore_index=self.file_format == 'parquet')
+            steps = steps[n_row_wise:]
+        return _apply_steps(df, steps)
+
+    def iter_batches(self):
+        """
+        Read the file and run the recorded verbs, yielding the result in batches. With a
+        chunksize and only row-wise verbs, each chunk is yielded as soon as it is read and
+        processed; otherwise the whole result is collected and yielded at once.
+
+        Returns:
+        --------
+        generator
+            pandas.DataFrame batches of the result.
+        """
+        if self.chunksize is None or any(func not in _ROW_WISE_VERBS for func, _, _ in self.steps):
+            yield self.collect()
+            return
+        columns = self.projected_columns()
+        for chunk in self._read_chunks(columns):
+            yield _apply_steps(chunk, self.steps)
+
+    def _read(self, columns):
+        if self.file_format == 'parquet':
+            filters = self.pushdown_filters() or None
+            return pd.read_parquet(self.path, columns=columns, filters=filters, **self.read_kwargs)
+        return pd.read_csv(self.path, usecols=columns, **self.read_kwargs)
+
+    def _read_chunks(self, columns):
+        if self.file_format == 'parquet':
+            import pyarrow.dataset as ds
+            import pyarrow.parquet as pq
+            filters = self.pushdown_filters()
+            expression = pq.filters_to_expression(filters) if filters else None
+            dataset = ds.dataset(self.path, format='parquet')
+            for batch in dataset.to_batches(columns=columns, filter=expression, batch_size=self.chunksize):
+                yield batch.to_pandas()
+        else:
+            with pd.read_csv(self.path, usecols=columns, chunksize=self.chunksize, **self.read_kwargs) as reader:
+                yield from reader
+
+
+def _apply_steps(df, steps):
+    for func, args, kwargs in steps:
+        df = func(df, *args, **kwargs)
+    return df
+
+
+def _as_list(columns):
+    return list(columns) if isinstance(columns, (list, tuple)) else [columns]
+
+
+def _summarise_columns(args, kwargs):
+    """
+    Source columns read by a summarise() step, or None if they cannot be determined.
+    """
+    columns = set()
+    for arg in args:
+        if not isinstance(arg, dict):
+            return None
+        columns.update(arg)
+    for spec in kwargs.values():
+        if not isinstance(spec, tuple):
+            return None
+        columns.add(spec[0])
+    return columns
+
+
+def _required_columns(steps):
+    """
+    Walk the recorded verbs from last to first and work out which source columns
+    they read. Returns None when every column may be needed (an unrecognized verb,
+    a callable in mutate, distinct() over all columns, ...).
+    """
+    required = None
+    for func, args, kwargs in reversed(steps):
+        if func is select.func:
+            # Selectors (starts_with(), of_type(), ...) need the file's columns
+            required = set(args) if all(isinstance(arg, str) for arg in args) else None
+        elif func is summarise.func:
+            required = _summarise_columns(args, kwargs)
+        elif required is None or func in _ROW_SUBSET_VERBS:
+            continue
+        elif func is where.func:
+            required |= expression_names(args[0] if args else kwargs['condition'])
+        elif func is mutate.func:
+            if any(callable(op) for op in kwargs.values()):
+                required = None
+            else:
+                required -= set(kwargs)
+                for op in kwargs.values():
+                    if isinstance(op, str):
+                        required |= expression_names(op)
+        elif func is group_by.func:
+            required.update(args[0] if args and isinstance(args[0], list) else args)
+        elif func is arrange.func:
+            required.update(_as_list(args[0] if args else kwargs['column_name']))
+        elif func is rename.func:
+            required = (required - set(kwargs)) | set(kwargs.values())
+        elif func is fill_na.func:
+            required.add(args[0] if args else kwargs['column'])
+        elif func in (distinct.func, drop_na.func) and args:
+            required.update(args)
+        else:
+            required = None
+    return required
+
+
+def _condition_filters(condition):
+    """
+    Translate the top-level and-ed comparisons of a where() condition into pyarrow filters.
+    Comparisons that are not simple (column operator literal) are skipped, which is safe
+    because the where() step still runs on the rows that are read. The literals' types are
+    checked against the file in Scan.pushdown_filters().
+    """
+    tree = parse_condition(condition)
+    if tree is None:
+        return []
+    tree = tree.body
+    terms = tree.values if isinstance(tree, ast.BoolOp) and isinstance(tree.op, ast.And) else [tree]
+    filters = []
+    for term in terms:
+        if not (isinstance(term, ast.Compare) and len(term.ops) == 1):
+            continue
+        operator = _PUSHDOWN_OPERATORS.get(type(term.ops[0]))
+        left, right = term.left, term.comparators[0]
+        if operator is None:
+            continue
+        if isinstance(right, ast.Name) and not isinstance(left, ast.Name) and operator in _FLIPPED_OPERATORS:
+            left, right, operator = right, left, _FLIPPED_OPERATORS[operator]
+        if not isinstance(left, ast.Name):
+            continue
+        try:
+            value = ast.literal_eval(right)
+        except ValueError:
+            continue
+        if operator == 'in':
+            if not isinstance(value, (list, tuple, set)):
+                continue
+            value = list(value)
+        filters.append((left.id, operator, value))
+    return filters
+
+
+def _literal_fits(arrow_type, value):
+    """
+    Whether pyarrow can compare a column of arrow_type with a literal the way pandas does.
+    """
+    import pyarrow as pa
+    if pa.types.is_dictionary(arrow_type):
+        arrow_type = arrow_type.value_type
+    if isinstance(value, bool):
+        return pa.types.is_boolean(arrow_type)
+    if isinstance(value, int):
+        return (pa.types.is_integer(arrow_type) or pa.types.is_floating(arrow_type)) and -2**63 <= value < 2**63
+    if isinstance(value, float):
+        return pa.types.is_integer(arrow_type) or pa.types.is_floating(arrow_type)
+    if isinstance(value, str):
+        return pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type)
+    return False
+
+
+def scan_csv(path, chunksize=None, **kwargs):
+    """
+    Start a lazy pipeline from a CSV file. Only the columns used by the chained verbs are
+    parsed, and with chunksize the leading row-wise verbs run chunk by chunk.
+
+    Parameters:
+    -----------
+    path : str
+        Path of the CSV file.
+    chunksize : int, optional
+        Number of rows to read at a time. Default reads the whole file at once.
+    **kwargs : dict, optional
+        Additional keyword arguments to be passed to pandas.read_csv.
+
+    Returns:
+    --------
+    Scan
+        A lazy pipeline source. Chain collect() to run it.
+
+    Example Usage:
+    --------------
+    new_df = (scan_csv('grades.csv') >>
+              where('Grade > 90') >>
+              select('StudentID', 'Subject') >>
+              collect())
+    """
+    return Scan(path, 'csv', chunksize=chunksize, **kwargs)
+
+
+def scan_parquet(path, chunksize=None, **kwargs):
+    """
+    Start a lazy pipeline from a Parquet file. Only the columns used by the chained verbs
+    are read, and simple comparisons in leading where() steps are used to skip row groups.
+    Requires pyarrow.
+
+    Parameters:
+    -----------
+    path : str
+        Path of the Parquet file.
+    chunksize : int, optional
+        Number of rows to read at a time. Default reads the whole file at once.
+    **kwargs : dict, optional
+        Additional keyword arguments to be passed to pandas.read_parquet.
+
+    Returns:
+    --------
+    Scan
+        A lazy pipeline source. Chain collect() to run it.
+
+    Example Usage:
+    --------------
+    new_df = (scan_parquet('grades.parquet') >>
+              where('Grade > 90 & Year == 2') >>
+              group_by('Subject') >>
+              summarise(N = ('StudentID', 'count')) >>
+              collect())
+    """
+    return Scan(path, 'parquet', chunksize=chunksize, **kwargs)
+
+
+@Pipe
+def collect(df):
+    """
+    Run a lazy pipeline started with scan_csv() or scan_parquet(). On an ordinary
+    DataFrame this is a no-op, so pipelines can end with collect() either way.
+
+    Parameters:
+    -----------
+    df : pandas.DataFrame
+        The input DataFrame.
+
+    Returns:
+    --------
+    pandas.DataFrame
+        The input DataFrame.
+    """
+    return df
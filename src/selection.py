@@ -0,0 +1,306 @@
+### Configuration
+###############################################################################
+# Import packages
+import re
+import weakref
+import numpy as np
+import pandas as pd
+
+# Column-name indexes by id() of the pandas.Index they describe (see _column_index())
+_INDEXES = {}
+
+# of_type() shorthands -> test on a column dtype
+_DTYPE_KINDS = {
+    'number': lambda dtype: pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype),
+    'numeric': lambda dtype: pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype),
+    'integer': pd.api.types.is_integer_dtype,
+    'float': pd.api.types.is_float_dtype,
+    'bool': pd.api.types.is_bool_dtype,
+    'string': lambda dtype: pd.api.types.is_object_dtype(dtype) or pd.api.types.is_string_dtype(dtype),
+    'category': lambda dtype: isinstance(dtype, pd.CategoricalDtype),
+    'datetime': pd.api.types.is_datetime64_any_dtype,
+}
+
+
+### Define Classes & Functions
+###############################################################################
+class _ColumnIndex:
+    """
+    Column names of a DataFrame prepared for repeated matching. Names are joined into a
+    single newline-separated string, so a literal prefix, suffix or substring is found
+    with one regular expression scan over all columns instead of one match per name.
+    Each selector's result is kept, so selecting again from a frame with the same
+    columns is a dictionary lookup.
+    """
+    def __init__(self, columns):
+        self.names = list(columns)
+        self.is_unique = columns.is_unique
+        self.positions = {name: i for i, name in enumerate(self.names)} if self.is_unique else None
+        self.results = {}
+        self.blob = None
+        if all(isinstance(name, str) and '\n' not in name for name in self.names):
+            self.blob = '\n'.join(self.names)
+            lengths = np.fromiter((len(name) + 1 for name in self.names), dtype=np.int64, count=len(self.names))
+            self.line_starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+
+    def literal(self, kind, text, ignore_case):
+        """
+        Positions of the columns whose name starts with, ends with or contains text.
+        """
+        key = (kind, text, ignore_case)
+        if key not in self.results:
+            flags = re.MULTILINE | (re.IGNORECASE if ignore_case else 0)
+            if self.blob is not None and '\n' in text:
+                # No name contains the separator, and a match would span two names
+                self.results[key] = np.array([], dtype=np.int64)
+            elif self.blob is not None:
+                pattern = {'starts': '^{}', 'ends': '{}$', 'contains': '{}'}[kind].format(re.escape(text))
+                starts = [match.start() for match in re.finditer(pattern, self.blob, flags)]
+                lines = np.searchsorted(self.line_starts, np.asarray(starts, dtype=np.int64), side='right') - 1
+                self.results[key] = np.unique(lines)
+            else:
+                test = {'starts': str.startswith, 'ends': str.endswith, 'contains': str.__contains__}[kind]
+                names = [str(name).lower() if ignore_case else str(name) for name in self.names]
+                text = text.lower() if ignore_case else text
+                self.results[key] = np.array([i for i, name in enumerate(names) if test(name, text)], dtype=np.int64)
+        return self.results[key]
+
+    def pattern(self, pattern, ignore_case):
+        """
+        Positions of the columns whose name matches a regular expression (re.search).
+        """
+        key = ('matches', pattern, ignore_case)
+        if key not in self.results:
+            regex = re.compile(pattern, re.IGNORECASE if ignore_case else 0)
+            self.results[key] = np.array([i for i, name in enumerate(self.names) if regex.search(str(name))],
+                                         dtype=np.int64)
+        return self.results[key]
+
+    def lookup(self, names):
+        """
+        Positions of the given column names, in the given order.
+        """
+        if self.positions is None:
+            raise ValueError('Column names are not unique')
+        try:
+            return np.array([self.positions[name] for name in names], dtype=np.int64)
+        except KeyError as e:
+            raise KeyError(f"Column '{e.args[0]}' does not exist in the DataFrame") from None
+
+
+def _column_index(columns):
+    """
+    The _ColumnIndex for a pandas.Index, built once and dropped when the Index is freed.
+    Frames derived from one another without changing their columns share the Index object.
+    """
+    key = id(columns)
+    entry = _INDEXES.get(key)
+    if entry is not None and entry[0]() is columns:
+        return entry[1]
+    index = _ColumnIndex(columns)
+    _INDEXES[key] = (weakref.ref(columns, lambda ref, key=key: _INDEXES.pop(key, None)), index)
+    return index
+
+
+class Selector:
+    """
+    A rule picking columns by name or dtype, for use in select() and column_search().
+    Selectors combine with | (either), & (both) and ~ (all other columns). Create them
+    with starts_with(), ends_with(), contains(), matches(), one_of(), col_range(),
+    of_type() or everything().
+
+    Parameters:
+    -----------
+    resolve : function
+        Function of (df, column index) returning the positions of the selected columns.
+    description : str
+        Text shown by repr().
+    """
+    def __init__(self, resolve, description):
+        self.resolve = resolve
+        self.description = description
+
+    def __repr__(self):
+        return self.description
+
+    def __invert__(self):
+        return _Negation(self)
+
+    def __or__(self, other):
+        return Selector(lambda df, index: np.union1d(self.resolve(df, index), other.resolve(df, index)),
+                        f'({self!r} | {other!r})')
+
+    def __and__(self, other):
+        return Selector(lambda df, index: np.intersect1d(self.resolve(df, index), other.resolve(df, index)),
+                        f'({self!r} & {other!r})')
+
+
+class _Negation(Selector):
+    """
+    All columns except those of another selector. As the first argument of select(), it
+    starts the selection from every column.
+    """
+    def __init__(self, selector):
+        self.selector = selector
+        super().__init__(lambda df, index: np.setdiff1d(np.arange(len(index.names)), selector.resolve(df, index)),
+                         f'~{selector!r}')
+
+    def __invert__(self):
+        return self.selector
+
+
+def starts_with(prefix, ignore_case=False):
+    """
+    Select columns whose name starts with a prefix.
+
+    Example Usage:
+    --------------
+    new_df = df >> select('id', starts_with('feature_'))
+    """
+    return Selector(lambda df, index: index.literal('starts', prefix, ignore_case), f'starts_with({prefix!r})')
+
+
+def ends_with(suffix, ignore_case=False):
+    """
+    Select columns whose name ends with a suffix.
+
+    Example Usage:
+    --------------
+    new_df = df >> select(ends_with('_mean'))
+    """
+    return Selector(lambda df, index: index.literal('ends', suffix, ignore_case), f'ends_with({suffix!r})')
+
+
+def contains(text, ignore_case=False):
+    """
+    Select columns whose name contains a string.
+
+    Example Usage:
+    --------------
+    new_df = df >> select(contains('grade', ignore_case=True))
+    """
+    return Selector(lambda df, index: index.literal('contains', text, ignore_case), f'contains({text!r})')
+
+
+def matches(pattern, ignore_case=False):
+    """
+    Select columns whose name matches a regular expression (anywhere in the name).
+
+    Example Usage:
+    --------------
+    new_df = df >> select(matches(r'^x\\d+$'))
+    """
+    return Selector(lambda df, index: index.pattern(pattern, ignore_case), f'matches({pattern!r})')
+
+
+def one_of(*names):
+    """
+    Select columns by exact name, e.g. to drop them with ~one_of('A', 'B').
+    """
+    return Selector(lambda df, index: index.lookup(names), f"one_of({', '.join(map(repr, names))})")
+
+
+def col_range(start, end):
+    """
+    Select the columns from start to end (both included), in DataFrame order.
+
+    Example Usage:
+    --------------
+    new_df = df >> select(col_range('B', 'D'))
+    """
+    def resolve(df, index):
+        first, last = index.lookup([start, end])
+        return np.arange(min(first, last), max(first, last) + 1)
+    return Selector(resolve, f'col_range({start!r}, {end!r})')
+
+
+def of_type(*dtypes):
+    """
+    Select columns by dtype. Accepts 'number', 'integer', 'float', 'bool', 'string',
+    'category' and 'datetime', or any dtype understood by pandas (e.g. 'float32').
+
+    Example Usage:
+    --------------
+    new_df = df >> select('id', of_type('number'))
+    """
+    tests = []
+    for dtype in dtypes:
+        if isinstance(dtype, str) and dtype in _DTYPE_KINDS:
+            tests.append(_DTYPE_KINDS[dtype])
+        else:
+            dtype = pd.api.types.pandas_dtype(dtype)
+            tests.append(lambda column_dtype, dtype=dtype: column_dtype == dtype)
+
+    def resolve(df, index):
+        # Columns sharing a dtype object are tested once
+        selected = {}
+        for column_dtype in df.dtypes:
+            if column_dtype not in selected:
+                selected[column_dtype] = any(test(column_dtype) for test in tests)
+        return np.flatnonzero([selected[column_dtype] for column_dtype in df.dtypes])
+    return Selector(resolve, f"of_type({', '.join(map(repr, dtypes))})")
+
+
+def everything():
+    """
+    Select all columns, e.g. to move some to the front with select('id', everything()).
+    """
+    return Selector(lambda df, index: np.arange(len(index.names)), 'everything()')
+
+
+def resolve_columns(df, args, strings='names'):
+    """
+    Positions of the columns picked by a list of column names and selectors, in order and
+    without repeats (except for names repeated on purpose). Negated selectors remove
+    columns; if the first argument is negated, the selection starts from every column.
+
+    Parameters:
+    -----------
+    df : pandas.DataFrame
+        The DataFrame to select from.
+    args : tuple
+        Column names and Selector objects.
+    strings : str
+        "names" to treat strings as exact column names, or "patterns" to treat them as
+        regular expressions. Other labels (e.g. integers) are always exact names.
+
+    Returns:
+    --------
+    numpy.ndarray
+        Integer column positions.
+    """
+    index = _column_index(df.columns)
+    if strings == 'names' and not any(isinstance(arg, Selector) for arg in args):
+        if index.positions is None:
+            missing = [arg for arg in args if arg not in df.columns]
+            if missing:
+                raise KeyError(f"Column '{missing[0]}' does not exist in the DataFrame")
+            return df.columns.get_indexer_for(list(args))
+        return index.lookup(args)
+    selected = []
+    seen = set()
+    for i, arg in enumerate(args):
+        if not isinstance(arg, Selector):
+            arg = matches(arg) if strings == 'patterns' and isinstance(arg, str) else one_of(arg)
+        if isinstance(arg, _Negation):
+            if i == 0:
+                selected = list(range(len(index.names)))
+            drop = set(arg.selector.resolve(df, index).tolist())
+            selected = [position for position in selected if position not in drop]
+            seen -= drop
+            continue
+        for position in arg.resolve(df, index).tolist():
+            if position not in seen:
+                seen.add(position)
+                selected.append(position)
+    return np.array(selected, dtype=np.int64)
+
+
+def take_columns(df, positions):
+    """
+    Select columns by position. A run of adjacent columns is taken as a slice, which
+    pandas returns as a view of the input's blocks.
+    """
+    if len(positions) and positions[-1] - positions[0] == len(positions) - 1 and np.all(np.diff(positions) == 1):
+        return df.iloc[:, positions[0]:positions[-1] + 1]
+    return df.iloc[:, positions]
@@ -0,0 +1,414 @@
+### Configuration
+###############################################################################
+# Import packages
+import gzip
+import os
+import shutil
+import time
+import urllib.parse
+import pandas as pd
+from collections import OrderedDict
+
+# Import modules
+from .pandaplyr import Pipe, _group_codes
+
+# Directory name used by Hive-style partitioning for missing partition values
+_NULL_PARTITION = '__HIVE_DEFAULT_PARTITION__'
+
+# Partition files write_dataset() keeps open at once, well below the usual limit of 1024
+# file descriptors per process
+_MAX_OPEN_FILES = 256
+
+
+### Define Classes & Functions
+###############################################################################
+class WriteStats:
+    """
+    The outcome of a sink verb (write_parquet(), write_csv(), write_dataset()).
+
+    Parameters:
+    -----------
+    path : str
+        The file or directory written.
+    rows : int
+        Number of rows written.
+    bytes : int
+        Size of the written file(s) on disk.
+    files : int
+        Number of files written.
+    batches : int
+        Number of input batches (DataFrames) consumed.
+    seconds : float
+        Wall-clock seconds from the first batch to the final rename.
+    """
+    def __init__(self, path, rows, bytes, files, batches, seconds):
+        self.path = path
+        self.rows = rows
+        self.bytes = bytes
+        self.files = files
+        self.batches = batches
+        self.seconds = seconds
+
+    def __repr__(self):
+        return (f"WriteStats('{self.path}', rows={self.rows}, bytes={self.bytes}, files={self.files}, "
+                f"batches={self.batches}, seconds={self.seconds:.3f})")
+
+
+def _is_arrow(data):
+    # pyarrow is optional, so Arrow tables and record batches are recognized by their module
+    return type(data).__module__.startswith('pyarrow') and hasattr(data, 'to_pandas')
+
+
+def _batches(data, size=None):
+    """
+    Iterate over the DataFrames of a sink's input: a DataFrame (in slices of `size` rows
+    if given), a pyarrow.Table (one record batch at a time) or an iterable of DataFrames
+    or pyarrow tables, consumed lazily.
+    """
+    if _is_arrow(data):
+        if not hasattr(data, 'to_batches') or data.num_rows == 0:
+            yield data.to_pandas()
+            return
+        for batch in data.to_batches(max_chunksize=size):
+            yield batch.to_pandas()
+        return
+    if isinstance(data, pd.DataFrame):
+        if size is None or len(data) <= size:
+            yield data
+        else:
+            for start in range(0, len(data), size):
+                yield data.iloc[start:start + size]
+        return
+    if isinstance(data, (str, bytes)) or not hasattr(data, '__iter__'):
+        raise TypeError('The input should be a pandas DataFrame, a pyarrow Table or an iterable of DataFrames.')
+    for batch in data:
+        if _is_arrow(batch):
+            batch = batch.to_pandas()
+        if not isinstance(batch, pd.DataFrame):
+            raise TypeError(f"Expected DataFrame batches, got {type(batch).__name__}")
+        yield batch
+
+
+def _check_columns(columns, batch):
+    if list(batch.columns) != columns:
+        raise ValueError(f"Batch columns {list(batch.columns)} differ from the first batch's {columns}")
+
+
+def _tmp_path(path):
+    return f'{path}.{os.getpid()}.tmp'
+
+
+def _remove(path):
+    if os.path.isdir(path):
+        shutil.rmtree(path, ignore_errors=True)
+    elif os.path.exists(path):
+        os.remove(path)
+
+
+class _ParquetFile:
+    """
+    A Parquet file written batch by batch. With row_group_size, batches are buffered and
+    written as row groups of exactly that many rows (the last one may be smaller), so
+    small input batches do not turn into many small row groups.
+    """
+    def __init__(self, path, schema, row_group_size=None, **kwargs):
+        import pyarrow.parquet as pq
+        self.path = path
+        self.schema = schema
+        self.row_group_size = row_group_size
+        self.writer = pq.ParquetWriter(path, schema, **kwargs)
+        self.buffer = []
+        self.buffered_rows = 0
+        self.rows = 0
+
+    def write(self, df):
+        import pyarrow as pa
+        try:
+            table = pa.Table.from_pandas(df, schema=self.schema, preserve_index=False)
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError) as error:
+            raise ValueError(_schema_error(df, self.schema)) from error
+        self.rows += table.num_rows
+        if self.row_group_size is None:
+            if table.num_rows:
+                self.writer.write_table(table)
+            return
+        self.buffer.append(table)
+        self.buffered_rows += table.num_rows
+        if self.buffered_rows >= self.row_group_size:
+            table = pa.concat_tables(self.buffer)
+            full = table.num_rows // self.row_group_size * self.row_group_size
+            self.writer.write_table(table.slice(0, full), row_group_size=self.row_group_size)
+            self.buffer = [table.slice(full)]
+            self.buffered_rows = table.num_rows - full
+
+    def close(self):
+        import pyarrow as pa
+        if self.buffered_rows:
+            self.writer.write_table(pa.concat_tables(self.buffer), row_group_size=self.row_group_size)
+        self.buffer = []
+        self.writer.close()
+
+
+class _CsvFile:
+    """
+    A CSV file written batch by batch, with the header written once, optionally
+    gzip-compressed.
+    """
+    def __init__(self, path, compress=False, **kwargs):
+        self.path = path
+        self.kwargs = kwargs
+        self.handle = gzip.open(path, 'wt', newline='') if compress else open(path, 'w', newline='')
+        self.header = True
+        self.rows = 0
+
+    def write(self, df):
+        df.to_csv(self.handle, index=False, header=self.header, **self.kwargs)
+        self.header = False
+        self.rows += len(df)
+
+    def close(self):
+        self.handle.close()
+
+
+def _schema_error(df, schema):
+    """
+    Explain why a batch does not fit the Parquet schema taken from the first batch.
+    """
+    import pyarrow as pa
+    for field in schema:
+        try:
+            pa.Table.from_pandas(df[[field.name]], schema=pa.schema([field]), preserve_index=False)
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+            return (f"Column '{field.name}' ({df[field.name].dtype}) cannot be written as {field.type}, the type "
+                    f"set by the first batch; cast it to one type before writing (e.g. with mutate())")
+    return f"Batch does not match the Parquet schema of the first batch: {schema}"
+
+
+def _parquet_schema(df):
+    import pyarrow as pa
+    return pa.Schema.from_pandas(df, preserve_index=False).remove_metadata()
+
+
+def _write_file(data, path, open_file, size=None):
+    """
+    Stream batches into one file opened by open_file(tmp_path, first_batch), then move it
+    to `path` in a single rename.
+    """
+    start = time.perf_counter()
+    tmp_path = _tmp_path(path)
+    output, columns, n_batches = None, None, 0
+    try:
+        for batch in _batches(data, size):
+            if output is None:
+                columns = list(batch.columns)
+                output = open_file(tmp_path, batch)
+            _check_columns(columns, batch)
+            output.write(batch)
+            n_batches += 1
+        if output is None:
+            # An empty stream still produces a (empty) file
+            output = open_file(tmp_path, pd.DataFrame())
+        output.close()
+        os.replace(tmp_path, path)
+    except BaseException:
+        if output is not None:
+            try:
+                output.close()
+            except Exception:
+                pass
+        _remove(tmp_path)
+        raise
+    return WriteStats(path, output.rows, os.path.getsize(path), 1, n_batches, time.perf_counter() - start)
+
+
+@Pipe
+def write_parquet(data, path, row_group_size=None, **kwargs):
+    """
+    Function to write a DataFrame or a stream of DataFrames to a Parquet file, one batch at
+    a time, so the full result never has to be held in memory. The file is written under a
+    temporary name and renamed into place once complete, so readers never see a partial
+    file. Requires pyarrow.
+
+    Parameters:
+    -----------
+    data : pandas.DataFrame, pyarrow.Table or iterable
+        A DataFrame or pyarrow.Table, or an iterable (e.g. a generator) of DataFrames with the
+        same columns. A scan with a chunksize streams its chunks here. Every batch must fit
+        the column types of the first one.
+    path : str
+        The output file.
+    row_group_size : int, optional
+        Rows per row group. Small batches are buffered into full row groups, and a large
+        DataFrame is converted this many rows at a time. Default writes each batch as it comes.
+    **kwargs : dict, optional
+        Additional keyword arguments to be passed to pyarrow.parquet.ParquetWriter
+        (compression, ...).
+
+    Returns:
+    --------
+    WriteStats
+        The rows, bytes and batches written.
+
+    Example Usage:
+    --------------
+    stats = scan_csv('grades.csv', chunksize=100_000) >> where('Grade > 70') >> write_parquet('passed.parquet')
+    stats = df >> write_parquet('grades.parquet', row_group_size=50_000)
+    """
+    def open_file(tmp_path, batch):
+        return _ParquetFile(tmp_path, _parquet_schema(batch), row_group_size, **kwargs)
+
+    return _write_file(data, path, open_file, row_group_size)
+
+
+@Pipe
+def write_csv(data, path, **kwargs):
+    """
+    Function to write a DataFrame or a stream of DataFrames to a CSV file, one batch at a
+    time. The header is written once, and the file is renamed into place once complete.
+    Paths ending in .gz are gzip-compressed.
+
+    Parameters:
+    -----------
+    data : pandas.DataFrame, pyarrow.Table or iterable
+        A DataFrame or pyarrow.Table, or an iterable of DataFrames with the same columns.
+    path : str
+        The output file.
+    **kwargs : dict, optional
+        Additional keyword arguments to be passed to DataFrame.to_csv (sep, date_format, ...).
+
+    Returns:
+    --------
+    WriteStats
+        The rows, bytes and batches written.
+
+    Example Usage:
+    --------------
+    chunks = (chunk >> mutate(Total = 'Grade * 2') for chunk in pd.read_csv('grades.csv', chunksize=100_000))
+    stats = chunks >> write_csv('totals.csv')
+    """
+    def open_file(tmp_path, batch):
+        return _CsvFile(tmp_path, compress=path.endswith('.gz'), **kwargs)
+
+    return _write_file(data, path, open_file)
+
+
+def _partition_dir(columns, values):
+    parts = []
+    for column, value in zip(columns, values):
+        # Values are URI-encoded, as pyarrow does, so that e.g. '/' cannot leave the directory
+        value = _NULL_PARTITION if pd.isna(value) else urllib.parse.quote(str(value), safe='')
+        parts.append(f'{column}={value}')
+    return os.path.join(*parts)
+
+
+@Pipe
+def write_dataset(data, path, partition_by, format='parquet', row_group_size=None, max_open_files=_MAX_OPEN_FILES,
+                  **kwargs):
+    """
+    Function to write a DataFrame or a stream of DataFrames to a directory partitioned by
+    the values of one or more columns, in the Hive layout (path/col=value/part-0.parquet)
+    that pandas.read_parquet and pyarrow read back with the partition columns restored.
+    Values are URI-encoded in the directory names (e.g. 'a/b' becomes 'a%2Fb'), as pyarrow does.
+    Each batch is split by partition with one sort and appended to the open file of each
+    partition. At most max_open_files files are open at once: when a new partition needs a
+    file, the least recently written one is closed, and that partition continues in a new
+    part file (part-1, part-2, ...) if it shows up again. The dataset is built in a temporary
+    directory and renamed into place once complete, replacing any previous dataset at `path`.
+
+    Parameters:
+    -----------
+    data : pandas.DataFrame, pyarrow.Table or iterable
+        A DataFrame or pyarrow.Table, or an iterable of DataFrames with the same columns.
+    path : str
+        The output directory.
+    partition_by : str or list
+        The column(s) to partition on. They are stored in the directory names, not the files.
+    format : str, optional
+        'parquet' (default, requires pyarrow) or 'csv'.
+    row_group_size : int, optional
+        Rows per Parquet row group, as in write_parquet().
+    max_open_files : int, optional
+        Largest number of partition files open at once. Default is 256.
+    **kwargs : dict, optional
+        Additional keyword arguments to be passed to the file writers.
+
+    Returns:
+    --------
+    WriteStats
+        The rows, bytes, files and batches written.
+
+    Example Usage:
+    --------------
+    stats = df >> write_dataset('grades_by_year', partition_by=['Year', 'Subject'])
+    df = pd.read_parquet('grades_by_year')
+    """
+    if format not in ('parquet', 'csv'):
+        raise ValueError('format should be either "parquet" or "csv".')
+    if max_open_files < 1:
+        raise ValueError('max_open_files should be at least 1.')
+    partition_by = [partition_by] if isinstance(partition_by, str) else list(partition_by)
+    start = time.perf_counter()
+    tmp_path = _tmp_path(path)
+    _remove(tmp_path)
+    os.makedirs(tmp_path)
+    # Open files by partition directory, least recently written first
+    open_files, closed_files, n_parts = OrderedDict(), [], {}
+    columns, schema, n_batches = None, None, 0
+    try:
+        for batch in _batches(data):
+            if columns is None:
+                columns = list(batch.columns)
+                for col in partition_by:
+                    if col not in columns:
+                        raise KeyError(f"Column '{col}' does not exist in the DataFrame")
+                if format == 'parquet':
+                    schema = _parquet_schema(batch.drop(columns=partition_by))
+            _check_columns(columns, batch)
+            n_batches += 1
+            if len(batch) == 0:
+                continue
+            codes, keys = _group_codes(batch, partition_by)
+            order = codes.argsort(kind='stable')
+            bounds = codes[order].searchsorted(range(len(keys) + 1))
+            values = batch.drop(columns=partition_by)
+            for code, key in enumerate(keys.itertuples(index=False)):
+                directory = _partition_dir(partition_by, key)
+                output = open_files.pop(directory, None)
+                if output is None:
+                    if len(open_files) >= max_open_files:
+                        _, evicted = open_files.popitem(last=False)
+                        closed_files.append(evicted)
+                        evicted.close()
+                    part = n_parts.get(directory, 0)
+                    n_parts[directory] = part + 1
+                    os.makedirs(os.path.join(tmp_path, directory), exist_ok=True)
+                    file_path = os.path.join(tmp_path, directory, f'part-{part}.{format}')
+                    if format == 'parquet':
+                        output = _ParquetFile(file_path, schema, row_group_size, **kwargs)
+                    else:
+                        output = _CsvFile(file_path, **kwargs)
+                open_files[directory] = output
+                output.write(values.take(order[bounds[code]:bounds[code + 1]]))
+        while open_files:
+            _, output = open_files.popitem(last=False)
+            closed_files.append(output)
+            output.close()
+        if os.path.exists(path):
+            # Swap the new dataset in, then drop the old one
+            old_path = f'{path}.{os.getpid()}.old'
+            os.replace(path, old_path)
+            os.replace(tmp_path, path)
+            _remove(old_path)
+        else:
+            os.replace(tmp_path, path)
+    except BaseException:
+        for output in open_files.values():
+            try:
+                output.close()
+            except Exception:
+                pass
+        _remove(tmp_path)
+        raise
+    rows = sum(output.rows for output in closed_files)
+    size = sum(os.path.getsize(os.path.join(path, os.path.relpath(output.path, tmp_path))) for output in closed_files)
+    return WriteStats(path, rows, size, len(closed_files), n_batches, time.perf_counter() - start)
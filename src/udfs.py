@@ -0,0 +1,187 @@
+### Configuration
+###############################################################################
+# Import packages
+import functools
+import importlib.util
+import inspect
+import numpy as np
+import pandas as pd
+
+# Kinds of user-defined function accepted by udf()
+_KINDS = ('agg', 'row')
+
+
+### Define Classes & Functions
+###############################################################################
+def numba_available():
+    """
+    Whether Numba is installed, without importing it.
+    """
+    return importlib.util.find_spec('numba') is not None
+
+
+class UDF:
+    """
+    A user-defined function compiled with Numba when it is installed. Create one with the
+    udf() decorator rather than directly.
+
+    Parameters:
+    -----------
+    func : function
+        The Python function.
+    kind : str
+        "agg" for a function reducing a 1-D array to a scalar, or "row" for a function of
+        scalars applied element-wise to the columns named by its parameters.
+    jit : bool
+        Compile with Numba if it is installed.
+    """
+    def __init__(self, func, kind, jit=True):
+        if kind not in _KINDS:
+            raise ValueError(f"kind should be one of {list(_KINDS)}, but got '{kind}'")
+        functools.update_wrapper(self, func)
+        self.func = func
+        self.kind = kind
+        self.jit = jit and numba_available()
+        self.columns = list(inspect.signature(func).parameters) if kind == 'row' else None
+        self._compiled = None
+        self._grouped_kernel = None
+
+    def __repr__(self):
+        return f"udf({self.func.__name__}, kind='{self.kind}', jit={self.jit})"
+
+    @property
+    def compiled(self):
+        """
+        The Numba-compiled function (a vectorized ufunc for kind="row"), or its NumPy
+        fallback when Numba is not available. Compiled on first use.
+        """
+        if self._compiled is None:
+            if self.jit:
+                import numba
+                self._compiled = numba.njit(self.func) if self.kind == 'agg' else numba.vectorize(self.func)
+            else:
+                self._compiled = self.func if self.kind == 'agg' else np.vectorize(self.func)
+        return self._compiled
+
+    def __call__(self, *args):
+        # Row functions called with a DataFrame (as mutate() does) read their arguments
+        # from the columns named by their parameters
+        if self.kind == 'row' and len(args) == 1 and isinstance(args[0], pd.DataFrame):
+            df = args[0]
+            for col in self.columns:
+                if col not in df.columns:
+                    raise KeyError(f"Column '{col}' does not exist in the DataFrame")
+            return self.compiled(*[df[col].to_numpy() for col in self.columns])
+        if self.kind == 'agg':
+            return self.compiled(np.asarray(args[0]))
+        return self.compiled(*args)
+
+    def grouped(self, values, offsets):
+        """
+        Apply an aggregation to contiguous groups in one call.
+
+        Parameters:
+        -----------
+        values : numpy.ndarray
+            Values sorted so that each group is contiguous.
+        offsets : numpy.ndarray
+            Group boundaries: group i is values[offsets[i]:offsets[i + 1]].
+
+        Returns:
+        --------
+        numpy.ndarray
+            One float64 result per group.
+        """
+        out = np.empty(len(offsets) - 1, dtype=np.float64)
+        if self.jit:
+            self._get_grouped_kernel()(values, offsets, out)
+        else:
+            for i in range(len(out)):
+                out[i] = self.func(values[offsets[i]:offsets[i + 1]])
+        return out
+
+    def _get_grouped_kernel(self):
+        if self._grouped_kernel is None:
+            import numba
+            compiled = self.compiled
+
+            @numba.njit
+            def kernel(values, offsets, out):
+                for i in range(len(out)):
+                    out[i] = compiled(values[offsets[i]:offsets[i + 1]])
+
+            self._grouped_kernel = kernel
+        return self._grouped_kernel
+
+
+def udf(func=None, kind='agg', jit=True):
+    """
+    Decorator for user-defined functions used in summarise() and mutate(). The function is
+    compiled with Numba when it is installed, and runs as plain Python/NumPy otherwise.
+
+    In summarise(), a kind="agg" function receives each group's values as a NumPy array and
+    returns a scalar. All groups are handled in a single call on values sorted by group.
+    In mutate(), a kind="row" function receives one value per parameter, read from the
+    columns with the same names, and is applied element-wise.
+
+    Parameters:
+    -----------
+    func : function
+        The function to wrap.
+    kind : str, optional
+        Either "agg" (default) or "row".
+    jit : bool, optional
+        Compile with Numba if it is installed. Default is True.
+
+    Returns:
+    --------
+    UDF
+        The wrapped function.
+
+    Example Usage:
+    --------------
+    import pandas as pd
+    @udf(kind='agg')
+    def range_ratio(values):
+        return (values.max() - values.min()) / values.mean()
+
+    @udf(kind='row')
+    def B_OVER_C(B, C):
+        return B / C if C != 0 else 0.0
+
+    df = pd.DataFrame({'A': ['foo', 'foo', 'bar', 'bar'], 'B': [10, 20, 30, 40], 'C': [1, 0, 3, 4]})
+    new_df = df >> mutate(D = B_OVER_C) >> group_by('A') >> summarise(R = ('B', range_ratio))
+    """
+    if func is None:
+        return lambda f: UDF(f, kind, jit)
+    return UDF(func, kind, jit)
+
+
+def grouped_aggregate(grouped, column, agg_udf):
+    """
+    Run an aggregation UDF over one column of a DataFrameGroupBy, in the order of its groups.
+
+    Parameters:
+    -----------
+    grouped : pandas.DataFrameGroupBy
+        The grouped DataFrame.
+    column : str
+        The column to aggregate.
+    agg_udf : UDF
+        A kind="agg" UDF.
+
+    Returns:
+    --------
+    numpy.ndarray
+        One result per group.
+    """
+    codes = grouped.ngroup().to_numpy()
+    values = grouped.obj[column].to_numpy()
+    valid = codes >= 0
+    if not valid.all():
+        codes, values = codes[valid], values[valid]
+    codes = codes.astype(np.int64)
+    order = np.argsort(codes, kind='stable')
+    offsets = np.zeros(grouped.ngroups + 1, dtype=np.int64)
+    np.cumsum(np.bincount(codes, minlength=grouped.ngroups), out=offsets[1:])
+    return agg_udf.grouped(np.ascontiguousarray(values[order]), offsets)
@@ -1,12 +1,225 @@
 ### Configuration
 ###############################################################################
 # Import packages
+import hashlib
+import importlib.util
+import os
 import pandas as pd
-import pkg_resources
+from importlib import resources
+
+# Bundled datasets (dataset name -> CSV file in the data directory)
+DATASETS = {
+    'titanic': 'titanic.csv',
+    'grades': 'student_grades.csv',
+    'grades_by_year': 'student_grades_by_year.csv',
+    'subject': 'subject_categories.csv',
+}
+
+# Parsed datasets kept for the life of the process (dataset name -> (stamp, DataFrame))
+_DATASET_MEMORY_CACHE = {}
 
 
 ### Define Classes & Functions
 ###############################################################################
+def dataset_cache_dir():
+    """
+    Directory holding the on-disk binary copies of the bundled datasets.
+    Set the PANDAPLYR_CACHE_DIR environment variable to override the default
+    location (~/.cache/PandaPlyr).
+
+    Returns:
+    -------
+    str:
+        Path to the cache directory.
+    """
+    default_dir = os.path.join(os.path.expanduser('~'), '.cache', 'PandaPlyr')
+    return os.environ.get('PANDAPLYR_CACHE_DIR', default_dir)
+
+
+def clear_dataset_cache(disk=False):
+    """
+    Drop the in-process copies of the bundled datasets and, optionally, the on-disk cache.
+
+    Parameters:
+    -----------
+    disk : bool, optional
+        Also delete the cached binary files. Default is False.
+    """
+    _DATASET_MEMORY_CACHE.clear()
+    if disk and os.path.isdir(dataset_cache_dir()):
+        for filename in os.listdir(dataset_cache_dir()):
+            if filename.split('-')[0] in DATASETS:
+                _remove_file(os.path.join(dataset_cache_dir(), filename))
+
+
+def _remove_file(path):
+    """
+    Delete a file that another process may be deleting at the same time.
+    """
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _cache_extension():
+    """
+    Parquet keeps the cache columnar when pyarrow is installed; pickle is the fallback.
+    Both round-trip dtypes exactly.
+    """
+    return 'parquet' if importlib.util.find_spec('pyarrow') is not None else 'pkl'
+
+
+def _csv_stamp(csv_path):
+    """
+    Short hash of the CSV's modification time and size, used to invalidate cached copies.
+    """
+    stat = os.stat(csv_path)
+    return hashlib.sha1(f'{stat.st_mtime_ns}-{stat.st_size}-{pd.__version__}'.encode()).hexdigest()[:12]
+
+
+def _read_cached_dataset(name, columns=None, nrows=None):
+    """
+    Read a bundled dataset, parsing the CSV only when no valid cached copy exists.
+
+    Parameters:
+    -----------
+    name : str
+        Key in DATASETS.
+    columns : list, optional
+        Columns to load. Only the full dataset is memoized in-process.
+    nrows : int, optional
+        Number of leading rows to load. Only these rows are read from the Parquet cache;
+        on a cache miss the whole CSV is parsed and cached, so dtypes are always those of
+        the full dataset.
+
+    Returns:
+    -------
+    pandas.DataFrame:
+        The loaded dataset. The memoized copy itself is never returned.
+    """
+    with resources.as_file(resources.files(__package__) / 'data' / DATASETS[name]) as csv_path:
+        stamp = _csv_stamp(csv_path)
+        memoized = _DATASET_MEMORY_CACHE.get(name)
+        if memoized is not None and memoized[0] == stamp:
+            df = memoized[1]
+            _check_columns(name, columns, df.columns)
+            df = df if columns is None else df.loc[:, columns]
+            return (df if nrows is None else df.iloc[:nrows]).copy()
+
+        extension = _cache_extension()
+        cache_path = os.path.join(dataset_cache_dir(), f'{name}-{stamp}.{extension}')
+        if os.path.exists(cache_path):
+            if extension == 'parquet':
+                import pyarrow.parquet as pq
+                _check_columns(name, columns, pq.read_schema(cache_path).names)
+                df = pd.read_parquet(cache_path, columns=columns) if nrows is None else \
+                    _read_parquet_head(cache_path, columns, nrows)
+            else:
+                df = pd.read_pickle(cache_path)
+                _check_columns(name, columns, df.columns)
+                df = df if columns is None else df.loc[:, columns]
+        else:
+            # The whole CSV is parsed even for a few rows, so that dtypes do not depend on the
+            # cache state
+            full_df = pd.read_csv(csv_path)
+            _write_dataset_cache(name, full_df, cache_path)
+            _DATASET_MEMORY_CACHE[name] = (stamp, full_df)
+            _check_columns(name, columns, full_df.columns)
+            df = full_df if columns is None else full_df.loc[:, columns]
+            return (df if nrows is None else df.iloc[:nrows]).copy()
+
+    if nrows is not None:
+        return df.iloc[:nrows]
+    if columns is None:
+        _DATASET_MEMORY_CACHE[name] = (stamp, df)
+        return df.copy()
+    return df
+
+
+def _read_parquet_head(path, columns, nrows):
+    """
+    Read the first nrows rows of a Parquet file, decoding only the row groups they span.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    parquet_file = pq.ParquetFile(path)
+    batches, n = [], 0
+    for batch in parquet_file.iter_batches(batch_size=max(nrows, 1), columns=columns):
+        if n >= nrows:
+            break
+        batches.append(batch.slice(0, nrows - n))
+        n += batches[-1].num_rows
+    schema = batches[0].schema if batches else parquet_file.schema_arrow
+    if columns is not None and not batches:
+        schema = pa.schema([schema.field(col) for col in columns], metadata=schema.metadata)
+    return pa.Table.from_batches(batches, schema=schema).to_pandas()
+
+
+def _check_columns(name, columns, available):
+    """
+    Raise a KeyError if any requested column is missing from a dataset.
+    """
+    for col in columns or []:
+        if col not in available:
+            raise KeyError(f"Column '{col}' does not exist in dataset '{name}'")
+
+
+def _write_dataset_cache(name, df, cache_path):
+    """
+    Atomically write the binary copy of a dataset and remove stale copies.
+    A read-only or missing cache location is not an error; the cache is just skipped.
+    """
+    cache_dir = os.path.dirname(cache_path)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = f'{cache_path}.{os.getpid()}.tmp'
+        if cache_path.endswith('.parquet'):
+            df.to_parquet(tmp_path, index=False)
+        else:
+            df.to_pickle(tmp_path)
+        os.replace(tmp_path, cache_path)
+        for filename in os.listdir(cache_dir):
+            if filename.startswith(f'{name}-') and os.path.join(cache_dir, filename) != cache_path:
+                _remove_file(os.path.join(cache_dir, filename))
+    except OSError:
+        pass
+
+
+def read_dataset(name, nrows=None, columns=None):
+    """
+    Read one of the bundled datasets into a pandas DataFrame.
+
+    The CSV is parsed once and stored in a binary cache on disk (see dataset_cache_dir())
+    and in memory, so repeated calls are cheap. Cached copies are invalidated whenever
+    the CSV file changes.
+
+    Parameters:
+    -----------
+    name : str
+        One of 'titanic', 'grades', 'grades_by_year' or 'subject'.
+    nrows : int, optional
+        Number of rows to return. Only these rows are read from the on-disk cache; the first
+        call parses and caches the whole CSV, so dtypes match a full read. Default returns all rows.
+    columns : list, optional
+        Columns to load. Default loads all columns.
+
+    Returns:
+    -------
+    pandas.DataFrame:
+        The loaded dataset.
+
+    Example Usage:
+    --------------
+    df = read_dataset('titanic', nrows=100, columns=['survived', 'age'])
+    """
+    if name not in DATASETS:
+        raise ValueError(f"Unknown dataset '{name}'. Expected one of {list(DATASETS)}")
+    if columns is not None:
+        columns = [columns] if isinstance(columns, str) else list(columns)
+    return _read_cached_dataset(name, columns=columns, nrows=nrows)
+
+
 def read_titanic_dataset():
     """
     Read the Titanic dataset from the CSV file into a pandas Dataframe
@@ -16,8 +229,7 @@ def read_titanic_dataset():
     pandas.DataFrame:
         The loaded Titanic dataset.
     """
-    data_path = pkg_resources.resource_filename('PandaPlyr', 'data/titanic.csv')
-    return pd.read_csv(data_path)
+    return read_dataset('titanic')
 
 def read_grades_dataset():
     """
@@ -28,8 +240,7 @@ def read_grades_dataset():
     pandas.DataFrame:
         The loaded Grades dataset.
     """
-    data_path = pkg_resources.resource_filename('PandaPlyr', 'data/student_grades.csv')
-    return pd.read_csv(data_path)
+    return read_dataset('grades')
 
 def read_grades_by_year_dataset():
     """
@@ -40,8 +251,7 @@ def read_grades_by_year_dataset():
     pandas.DataFrame:
         The loaded Grades dataset.
     """
-    data_path = pkg_resources.resource_filename('PandaPlyr', 'data/student_grades_by_year.csv')
-    return pd.read_csv(data_path)
+    return read_dataset('grades_by_year')
 
 def read_subject_dataset():
     """
@@ -52,5 +262,4 @@ def read_subject_dataset():
     pandas.DataFrame:
         The loaded Subject dataset.
     """
-    data_path = pkg_resources.resource_filename('PandaPlyr', 'data/subject_categories.csv')
-    return pd.read_csv(data_path)
+    return read_dataset('subject')
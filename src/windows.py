@@ -0,0 +1,216 @@
+### Configuration
+###############################################################################
+# Import packages
+import numpy as np
+import pandas as pd
+
+# Import modules
+from .pandaplyr import _group_codes, _time_values
+
+# Aggregations computed from cumulative sums over each window. Variances are left to
+# pandas, whose online algorithm avoids the cancellation of differenced sums of squares.
+_CUMULATIVE_AGGS = ('sum', 'mean', 'count')
+
+# Helper column holding the group codes in _pandas_rolling()
+_GROUP = '__pandaplyr_group'
+
+
+### Define Classes & Functions
+###############################################################################
+def _window_starts(codes, times, window, closed):
+    """
+    For rows sorted by group then time, the position of the first row of each row's window.
+    Timestamps are replaced by their rank among all distinct timestamps, so that the pair
+    (group, rank) fits in one sortable int64 key and a single searchsorted finds every
+    window start, across all groups at once.
+    """
+    distinct_times = np.sort(times)
+    distinct_times = distinct_times[np.concatenate(([True], distinct_times[1:] != distinct_times[:-1]))]
+    ranks = np.searchsorted(distinct_times, times)
+    # closed='right' covers (t - window, t], closed='both' covers [t - window, t]
+    side = 'left' if closed == 'both' else 'right'
+    bound_ranks = np.searchsorted(distinct_times, times - window, side=side)
+    width = len(distinct_times) + 1
+    keys = codes * width + ranks
+    return np.searchsorted(keys, codes * width + bound_ranks, side='left')
+
+
+def _cumulative_aggregate(values, starts, agg, min_periods):
+    """
+    Aggregate values[starts[i]:i + 1] for every row i from cumulative sums. Missing values
+    are skipped, and windows with fewer than min_periods values give NaN.
+    """
+    valid = ~np.isnan(values)
+    ends = np.arange(1, len(values) + 1)
+    counts = np.concatenate(([0], np.cumsum(valid)))
+    count = counts[ends] - counts[starts]
+    if agg == 'count':
+        result = count.astype(np.float64)
+    else:
+        # Centring the values first keeps the differenced sums accurate
+        center = np.nanmean(values) if valid.any() else 0.0
+        sums = np.concatenate(([0.0], np.cumsum(np.where(valid, values - center, 0.0))))
+        total = sums[ends] - sums[starts]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            result = total + center * count if agg == 'sum' else total / count + center
+    # As in pandas, count() checks min_periods against the rows in the window, including missing values
+    result[(ends - starts if agg == 'count' else count) < min_periods] = np.nan
+    return result
+
+
+def rolling(column, window, on=None, by=None, agg='mean', min_periods=None, closed='right'):
+    """
+    Build a rolling-window column for use in mutate(). Rows are sorted by group and time
+    once (skipped if the DataFrame is already sorted), every window start is found with a
+    single searchsorted over the contiguous group blocks, and sum, mean and count are
+    computed from cumulative sums without splitting the DataFrame into groups. Other
+    aggregations fall back to pandas groupby().rolling().
+
+    Parameters:
+    -----------
+    column : str
+        The column to aggregate.
+    window : str, pandas.Timedelta, int or float
+        The window length. With `on`, a time offset such as '7D' (or a number for numeric
+        `on` columns) covering (t - window, t] for each row's time t. Without `on`, a number
+        of rows ending at the current row.
+    on : str, optional
+        The time column. Default uses row positions.
+    by : str or list, optional
+        Column(s) whose groups are rolled separately.
+    agg : str, optional
+        'sum', 'mean', 'count' or any other pandas rolling aggregation ('min', 'max',
+        'std', ...). Default is 'mean'.
+    min_periods : int, optional
+        Minimum number of values in a window, as in pandas. Default is 1 for time windows
+        and the window length for row windows.
+    closed : str, optional
+        'right' (default) or 'both', to also include the row exactly `window` before.
+
+    Returns:
+    --------
+    function
+        A function of the DataFrame, to be passed to mutate().
+
+    Example Usage:
+    --------------
+    df = pd.DataFrame({'entity': ['a', 'a', 'b', 'a'],
+                       'ts': pd.to_datetime(['2024-01-01', '2024-01-05', '2024-01-06', '2024-01-10']),
+                       'value': [1.0, 2.0, 3.0, 4.0]})
+    new_df = df >> mutate(value_7d = rolling('value', '7D', on='ts', by='entity'))
+    """
+    if closed not in ('right', 'both'):
+        raise ValueError('closed should be either "right" or "both".')
+    by = [by] if isinstance(by, str) else list(by or [])
+
+    def evaluate(df):
+        for col in [column] + by + ([on] if on is not None else []):
+            if col not in df.columns:
+                raise KeyError(f"Column '{col}' does not exist in the DataFrame")
+        if agg not in _CUMULATIVE_AGGS:
+            return _pandas_rolling(df, column, window, on, by, agg, min_periods, closed)
+        codes, _ = _group_codes(df, by)
+        times = _time_values(df[on]) if on is not None else np.arange(len(df))
+        # Sort by group then time, unless the rows already are
+        if np.all((codes[1:] > codes[:-1]) | ((codes[1:] == codes[:-1]) & (times[1:] >= times[:-1]))):
+            order = None
+        else:
+            order = np.lexsort((times, codes))
+            codes, times = codes[order], times[order]
+
+        if on is None:
+            if not isinstance(window, (int, np.integer)):
+                raise ValueError('Without `on`, window should be a number of rows.')
+            positions = np.arange(len(df))
+            group_starts = np.searchsorted(codes, codes, side='left')
+            starts = np.maximum(group_starts, positions - window + 1)
+            periods = window if min_periods is None else min_periods
+        else:
+            span = pd.Timedelta(window).value if isinstance(window, (str, pd.Timedelta)) else window
+            starts = _window_starts(codes, times, span, closed)
+            periods = 1 if min_periods is None else min_periods
+        values = df[column].to_numpy(dtype=np.float64, na_value=np.nan)
+        if order is not None:
+            values = values[order]
+        result = _cumulative_aggregate(values, starts, agg, periods)
+        if order is not None:
+            unsorted = np.empty_like(result)
+            unsorted[order] = result
+            result = unsorted
+        return pd.Series(result, index=df.index)
+
+    return evaluate
+
+
+def _pandas_rolling(df, column, window, on, by, agg, min_periods, closed):
+    """
+    Rolling aggregation through pandas, for aggregations without a cumulative-sum kernel.
+    """
+    # Groups are numbered like the cumulative kernels do (missing keys form their own group),
+    # so that sorted by group code then time, the rolled values come out in the frame's row order
+    frame = df.reset_index(drop=True)
+    if by:
+        frame = frame[[column] + ([on] if on is not None else [])].assign(**{_GROUP: _group_codes(frame, by)[0]})
+    sort_columns = ([_GROUP] if by else []) + ([on] if on is not None else [])
+    if sort_columns:
+        frame = frame.sort_values(sort_columns, kind='stable')
+    source = frame.groupby(_GROUP)[[column] + ([on] if on is not None else [])] if by else frame
+    rolled = source.rolling(window, on=on, min_periods=min_periods, closed=closed)[column].agg(agg)
+    result = np.empty(len(frame))
+    result[frame.index.to_numpy()] = rolled.to_numpy()
+    return pd.Series(result, index=df.index)
+
+
+def time_bucket(column, every, origin=None):
+    """
+    Build a column assigning each row to a fixed-width time bucket, for use in mutate()
+    before group_by() and summarise() (like DataFrame.resample). Each value is floored to
+    the start of its bucket with integer arithmetic.
+
+    Parameters:
+    -----------
+    column : str
+        The datetime (or numeric) column.
+    every : str, pandas.Timedelta or number
+        The bucket width, e.g. '15min', '1h' or '7D'. Calendar frequencies ('W', 'M',
+        'Q', 'Y') use the start of the calendar period instead. For numeric columns, a number.
+    origin : str or pandas.Timestamp, optional
+        Start of the first bucket. Default is the Unix epoch (or 0 for numeric columns).
+
+    Returns:
+    --------
+    function
+        A function of the DataFrame, to be passed to mutate().
+
+    Example Usage:
+    --------------
+    new_df = (df >>
+              mutate(hour = time_bucket('ts', '1h')) >>
+              group_by('entity', 'hour') >>
+              summarise(total = ('value', 'sum')))
+    """
+    def evaluate(df):
+        if column not in df.columns:
+            raise KeyError(f"Column '{column}' does not exist in the DataFrame")
+        series = df[column]
+        if not pd.api.types.is_datetime64_any_dtype(series):
+            start = 0 if origin is None else origin
+            return np.floor((series.to_numpy() - start) / every) * every + start
+        try:
+            step = pd.Timedelta(every).value
+        except ValueError:
+            # Calendar frequency of uneven length
+            return series.dt.to_period(every).dt.start_time.to_numpy()
+        # Time zone aware columns are bucketed on local wall-clock time, like Series.dt.floor
+        tz = getattr(series.dt, 'tz', None)
+        wall_time = series.dt.tz_localize(None) if tz is not None else series
+        start = 0 if origin is None else pd.Timestamp(origin).value
+        values = wall_time.to_numpy(dtype='datetime64[ns]').view(np.int64)
+        buckets = pd.Series(pd.to_datetime((values - start) // step * step + start), index=df.index)
+        buckets = buckets.astype(wall_time.dtype)
+        buckets = buckets.where(series.notna())
+        if tz is not None:
+            return buckets.dt.tz_localize(tz, ambiguous='NaT', nonexistent='shift_forward')
+        return buckets
+
+    return evaluate
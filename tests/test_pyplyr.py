@@ -1,12 +1,29 @@
 ### Configuration
 ###############################################################################
 # Import packages
+import importlib.util
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
 import unittest
 import pandas as pd
 import numpy as np
 
 # Import modules
 from src import pandaplyr as pp
+from src import backends
+from src import incremental
+from src import microbatch
+from src import runner
+from src import scan
+from src import selection
+from src import sinks
+from src import udfs
+from src import utils
+from src import windows
 
 
 ### Define Functions and Classes
@@ -37,6 +54,17 @@ class TestDataManipulation(unittest.TestCase):
             'E': [1, 1, 1]
         })
 
+    def test_add_count(self):
+        """
+        Tests the add_count function.
+        Checks that each row gets the size of its key group, optionally weighted.
+        """
+        counted_df = self.df >> pp.add_count('B')
+        self.assertListEqual(counted_df['n'].tolist(), [2, 2, 2, 2, 1])
+        self.assertListEqual(list(counted_df.columns), ['A', 'B', 'C', 'n'])
+        weighted_df = self.df >> pp.group_by('C') >> pp.add_count(wt='A', name='total')
+        self.assertListEqual(weighted_df['total'].tolist(), [6.0, 6.0, 6.0, 9.0, 9.0])
+
     def test_arrange(self):
         """
         Tests the arrange function.
@@ -45,6 +73,93 @@ class TestDataManipulation(unittest.TestCase):
         arranged_df = self.df >> pp.arrange('A', ascending=False)
         self.assertEqual(arranged_df['A'].tolist(), [5, 4, 3, 2, 1])
         
+    def test_asof_join(self):
+        """
+        Tests the asof_join function.
+        Checks backward, forward and nearest matches within groups, on unsorted inputs, with a tolerance.
+        """
+        trades = pd.DataFrame({'t': [5, 1, 9, 3], 'g': ['x', 'x', 'y', 'y'], 'price': [1.0, 2.0, 3.0, 4.0]})
+        quotes = pd.DataFrame({'t': [4, 0, 8, 2, 6], 'g': ['x', 'x', 'y', 'y', 'x'], 'bid': [10, 20, 30, 40, 50]})
+        joined_df = trades >> pp.asof_join(quotes, on='t', by='g')
+        self.assertListEqual(list(joined_df.columns), ['t', 'g', 'price', 'bid'])
+        self.assertListEqual(joined_df['bid'].tolist(), [10, 20, 30, 40])
+        forward_df = trades >> pp.asof_join(quotes, on='t', by='g', direction='forward')
+        self.assertListEqual(forward_df['bid'].fillna(-1).tolist(), [50, 10, -1, 30])
+        nearest_df = trades >> pp.asof_join(quotes, on='t', by='g', direction='nearest', tolerance=1)
+        self.assertListEqual(nearest_df['bid'].tolist(), [10, 20, 30, 40])
+        close_df = trades >> pp.asof_join(quotes, on='t', by='g', direction='forward', tolerance=1)
+        self.assertListEqual(close_df['bid'].fillna(-1).tolist(), [50, -1, -1, -1])
+        expected = pd.merge_asof(trades.sort_values('t'), quotes.sort_values('t'), on='t', by='g')
+        self.assertListEqual(joined_df.sort_values('t')['bid'].tolist(), expected['bid'].tolist())
+
+    def test_case_when(self):
+        """
+        Tests the case_when and if_else helpers in mutate.
+        Checks if each row takes the first matching value, with stable dtypes.
+        """
+        mutated_df = self.df >> pp.mutate(
+            SIZE = pp.case_when(('A >= 4', '"large"'), ('A >= 2 & B == "a"', '"medium"'), default = '"small"'),
+            D = pp.if_else('C == 2', 'A * 10', 'A'),
+            E = pp.if_else('A > 3', '"x"'))
+        self.assertEqual(mutated_df['SIZE'].tolist(), ['small', 'medium', 'small', 'large', 'large'])
+        self.assertEqual(mutated_df['D'].tolist(), [1, 2, 3, 40, 50])
+        self.assertEqual(mutated_df['D'].dtype, np.int64)
+        self.assertEqual(mutated_df['E'].isna().tolist(), [True, True, True, False, False])
+
+    def test_compact(self):
+        """
+        Tests the compact function.
+        Checks if the function narrows dtypes without changing values and reports the bytes saved.
+        """
+        df = pd.DataFrame({
+            'A': np.arange(1000),
+            'B': ['foo', 'bar'] * 500,
+            'C': np.arange(1000) * 0.5,
+            'D': np.arange(1000) / 3
+        })
+        compact_df = df >> pp.compact()
+        self.assertEqual(compact_df['A'].dtype, np.int16)
+        self.assertIsInstance(compact_df['B'].dtype, pd.CategoricalDtype)
+        self.assertEqual(compact_df['C'].dtype, np.float32)
+        self.assertEqual(compact_df['D'].dtype, np.float64)
+        self.assertGreater(compact_df.attrs['bytes_saved'], 0)
+        pd.testing.assert_frame_equal(compact_df, df, check_dtype=False, check_categorical=False)
+
+    def test_compact_option(self):
+        """
+        Tests the 'compact' option.
+        Checks if DataFrames entering a verb are compacted when the option is set.
+        """
+        df = self.df.astype({'B': object})
+        pp.set_option('compact', True)
+        try:
+            mutated_df = df >> pp.mutate(D = 'A * 2', E = 'A - 10', F = 'A * 100')
+        finally:
+            pp.set_option('compact', False)
+        self.assertTrue(mutated_df.attrs['compacted'])
+        self.assertEqual(mutated_df['B'].dtype, 'str')
+        self.assertEqual(mutated_df['A'].dtype, self.df['A'].dtype)
+        self.assertEqual(mutated_df['D'].tolist(), [2, 4, 6, 8, 10])
+        self.assertEqual(mutated_df['E'].tolist(), [-9, -8, -7, -6, -5])
+        self.assertEqual(mutated_df['F'].tolist(), [100, 200, 300, 400, 500])
+
+    def test_count(self):
+        """
+        Tests the count function.
+        Checks counts sorted by frequency, weights, missing keys and partial top-n sorting.
+        """
+        df = pd.DataFrame({'K': ['x', 'y', 'x', None, 'z', 'x', 'y'], 'W': [1.0, 2.0, np.nan, 4.0, 5.0, 6.0, 7.0]})
+        counted_df = df >> pp.count('K')
+        self.assertListEqual(counted_df['K'].tolist()[:2], ['x', 'y'])
+        self.assertListEqual(counted_df['n'].tolist(), [3, 2, 1, 1])
+        self.assertListEqual((df >> pp.count('K', sort=False))['n'].tolist(), [3, 2, 1, 1])
+        self.assertListEqual((df >> pp.count('K', wt='W', top=2))['n'].tolist(), [9.0, 7.0])
+        expected_df = self.df.groupby(['C', 'B']).size().reset_index(name='count')
+        pd.testing.assert_frame_equal(self.df >> pp.count('C', 'B', sort=False, name='count'), expected_df)
+        self.assertListEqual((self.df >> pp.group_by('C') >> pp.count('B'))['n'].tolist(), [2, 1, 1, 1])
+        with self.assertRaises(KeyError):
+            self.df >> pp.count('Z')
+
     def test_distinct(self):
         """
         Tests the distinct function.
@@ -81,6 +196,23 @@ class TestDataManipulation(unittest.TestCase):
         joined_df = self.df >> pp.full_join(self.df2, on='B')
         self.assertEqual(sorted(joined_df['B'].tolist()), ['a', 'a', 'b', 'b', 'c', 'd'])
 
+    def test_gather(self):
+        """
+        Tests the gather function.
+        Checks the long result against pandas melt and that spread reverses it.
+        """
+        wide_df = pd.DataFrame({'id': [1, 2], 'x': [10.0, 30.0], 'y': [20.0, np.nan]})
+        long_df = wide_df >> pp.gather('x', 'y', into=('metric', 'v'))
+        expected_df = wide_df.melt(id_vars='id', var_name='metric', value_name='v')
+        pd.testing.assert_frame_equal(long_df.astype({'metric': object}), expected_df, check_dtype=False)
+        self.assertEqual(len(wide_df >> pp.gather(selection.one_of('x', 'y'), drop_na=True)), 3)
+        pd.testing.assert_frame_equal(long_df >> pp.spread('metric', 'v'), wide_df, check_names=False,
+                                      check_column_type=False)
+        mixed_df = pd.DataFrame({'id': [1, 2], 'n': [1, 2], 't': pd.to_datetime(['2024-01-01', '2024-01-02'])})
+        long_df = mixed_df >> pp.gather('n', 't')
+        self.assertEqual(long_df['value'].dtype, object)
+        self.assertListEqual(long_df['value'].tolist(), mixed_df.melt(id_vars='id')['value'].tolist())
+
     def test_group_by(self):
         """
         Tests the group_by function.
@@ -90,6 +222,15 @@ class TestDataManipulation(unittest.TestCase):
         self.assertIsInstance(grouped_df, pd.core.groupby.DataFrameGroupBy)
         self.assertEqual(list(grouped_df.groups.keys()), ['a', 'b', 'c'])
         
+    def test_group_by_factorize(self):
+        """
+        Tests the group_by function with factorized keys.
+        Checks if the aggregated values match grouping on the original keys.
+        """
+        summarised_df = self.df >> pp.group_by('B', factorize=True) >> pp.summarise(A = ('A', 'sum'))
+        self.assertEqual(summarised_df['B'].tolist(), ['a', 'b', 'c'])
+        self.assertEqual(summarised_df['A'].tolist(), [3, 7, 5])
+
     def test_head(self):
         """
         Tests the head function.
@@ -115,6 +256,28 @@ class TestDataManipulation(unittest.TestCase):
         joined_df = self.df >> pp.left_join(self.df2, on='B', fill_na = 0)
         self.assertEqual(joined_df['D'].tolist(), [10, 10, 20, 20, 0])
 
+    def test_join_factorize(self):
+        """
+        Tests the join functions with factorized keys.
+        Checks if joining on integer codes gives the same result as joining on the original keys.
+        """
+        for join in (pp.left_join, pp.inner_join, pp.right_join, pp.full_join):
+            expected_df = self.df >> join(self.df2, on='B')
+            joined_df = self.df >> join(self.df2, on='B', factorize=True)
+            pd.testing.assert_frame_equal(joined_df, expected_df)
+
+    def test_join_different_key_names(self):
+        """
+        Tests the join functions with differently named keys (left_on / right_on).
+        Checks if they match DataFrame.merge, with and without factorized keys.
+        """
+        df2 = self.df2.rename(columns={'B': 'K'})
+        for join, how in ((pp.left_join, 'left'), (pp.inner_join, 'inner'), (pp.right_join, 'right'), (pp.full_join, 'outer')):
+            expected_df = self.df.merge(df2, how=how, left_on='B', right_on='K')
+            for factorize in (False, True):
+                joined_df = self.df >> join(df2, left_on='B', right_on='K', factorize=factorize)
+                pd.testing.assert_frame_equal(joined_df, expected_df)
+
     def test_mutate(self):
         """
         Tests the mutate function.
@@ -127,6 +290,51 @@ class TestDataManipulation(unittest.TestCase):
         self.assertEqual(mutated_df['D'].tolist(), [2, 4, 6, 8, 10])
         self.assertEqual(mutated_df['A_X_C_PLUS_TWO'].tolist(), [3, 4, 5, 10, 12])
         
+    def test_pipeline(self):
+        """
+        Tests composing verbs into a reusable Pipeline.
+        Checks if the pipeline gives the same result as chaining the verbs on the DataFrame.
+        """
+        pipeline = pp.where('A > 1') >> pp.mutate(D = 'A * 2') >> pp.where('D < 10')
+        self.assertIsInstance(pipeline, pp.Pipeline)
+        self.assertEqual(len(pipeline >> pp.select('A', 'D')), 4)
+        expected_df = self.df >> pp.where('A > 1') >> pp.mutate(D = 'A * 2') >> pp.where('D < 10')
+        pd.testing.assert_frame_equal(self.df >> pipeline.validate(self.df), expected_df)
+        with self.assertRaises(ValueError):
+            pipeline.validate({'B': str})
+
+    def test_map_frames(self):
+        """
+        Tests the map_frames function.
+        Checks if a pipeline is applied to every DataFrame, keeping order and keys.
+        """
+        pipeline = pp.group_by('B') >> pp.summarise(A = ('A', 'sum'))
+        frames = {'first': self.df, 'second': self.df.head(2)}
+        results = pp.map_frames(frames, pipeline, workers=2)
+        self.assertListEqual(list(results), ['first', 'second'])
+        self.assertEqual(results['first']['A'].tolist(), [3, 7, 5])
+        self.assertEqual(results['second']['A'].tolist(), [3])
+        results = pp.map_frames(list(frames.values()), pipeline, workers=2, executor='process')
+        self.assertEqual(results[1]['A'].tolist(), [3])
+
+    def test_range_join(self):
+        """
+        Tests the range_join function.
+        Checks that points match every overlapping interval of their group, and that how='left' keeps unmatched rows.
+        """
+        events = pd.DataFrame({'host': ['a', 'a', 'b', 'b'], 'ts': [3, 12, 5, 1]})
+        windows_df = pd.DataFrame({'host': ['a', 'a', 'a', 'b'], 'start': [0, 10, 2, 0], 'end': [5, 15, 3, 4],
+                                   'label': ['boot', 'deploy', 'probe', 'boot']})
+        joined_df = events >> pp.range_join(windows_df, on='ts', lo='start', hi='end', by='host')
+        self.assertListEqual(joined_df['label'].tolist(), ['boot', 'probe', 'deploy', 'boot'])
+        self.assertListEqual(joined_df['ts'].tolist(), [3, 3, 12, 1])
+        open_df = events >> pp.range_join(windows_df, on='ts', lo='start', hi='end', by='host', closed='left')
+        self.assertListEqual(open_df['label'].tolist(), ['boot', 'deploy', 'boot'])
+        left_df = events >> pp.range_join(windows_df, on='ts', lo='start', hi='end', by='host', how='left')
+        self.assertListEqual(left_df['label'].fillna('-').tolist(), ['boot', 'probe', 'deploy', '-', 'boot'])
+        with self.assertRaises(KeyError):
+            events >> pp.range_join(windows_df, on='ts', lo='begin', hi='end')
+
     def test_rename(self):
         """
         Tests the rename function.
@@ -143,6 +351,46 @@ class TestDataManipulation(unittest.TestCase):
         joined_df = self.df >> pp.right_join(self.df2, on='B')
         self.assertEqual(joined_df['B'].tolist(), ['a', 'a', 'b', 'b', 'd'])
 
+    def test_rolling(self):
+        """
+        Tests the rolling helper in mutate.
+        Checks time and row windows per group against pandas groupby().rolling().
+        """
+        df = pd.DataFrame({
+            'E': ['a', 'a', 'b', 'a', 'b', 'a'],
+            'T': pd.to_datetime(['2024-01-01', '2024-01-05', '2024-01-06', '2024-01-10', '2024-01-20', '2024-01-10']),
+            'V': [1.0, 2.0, 3.0, np.nan, 5.0, 6.0]
+        })
+        sorted_df = df.sort_values(['E', 'T'], kind='stable')
+        for agg in ('mean', 'sum', 'count', 'max'):
+            rolled_df = df >> pp.mutate(R = windows.rolling('V', '7D', on='T', by='E', agg=agg))
+            expected = sorted_df.groupby('E')[['V', 'T']].rolling('7D', on='T')['V'].agg(agg)
+            np.testing.assert_allclose(rolled_df['R'].loc[sorted_df.index], expected.to_numpy())
+        rolled_df = df >> pp.mutate(R = windows.rolling('V', 2, by='E', agg='sum', min_periods=1))
+        self.assertListEqual(rolled_df['R'].tolist(), [1.0, 3.0, 3.0, 2.0, 8.0, 6.0])
+        # Missing keys form their own group for every aggregation
+        df.loc[[1, 4], 'E'] = None
+        for agg in ('max', 'std', 'sum'):
+            rolled_df = df >> pp.mutate(R = windows.rolling('V', '7D', on='T', by='E', agg=agg))
+            for _, group_df in df.groupby('E', dropna=False):
+                expected = group_df.sort_values('T', kind='stable').rolling('7D', on='T')['V'].agg(agg)
+                np.testing.assert_allclose(rolled_df['R'].loc[expected.index], expected.to_numpy())
+        with self.assertRaises(ValueError):
+            df >> pp.mutate(R = windows.rolling('V', '7D', on='Z'))
+
+    def test_time_bucket(self):
+        """
+        Tests the time_bucket helper in mutate.
+        Checks fixed-width, calendar and numeric buckets.
+        """
+        df = pd.DataFrame({'T': pd.to_datetime(['2024-01-01 10:20', '2024-01-01 10:50', '2024-02-03 00:10', None]),
+                           'X': [0.5, 1.5, 7.0, 9.9]})
+        bucketed_df = df >> pp.mutate(H = windows.time_bucket('T', '1h'), M = windows.time_bucket('T', 'M'),
+                                      B = windows.time_bucket('X', 5))
+        pd.testing.assert_series_equal(bucketed_df['H'], df['T'].dt.floor('1h'), check_names=False, check_dtype=False)
+        self.assertEqual(bucketed_df['M'][2], pd.Timestamp('2024-02-01'))
+        self.assertListEqual(bucketed_df['B'].tolist(), [0.0, 0.0, 5.0, 5.0])
+
     def test_sample_n(self):
         """
         Tests the sample_n function.
@@ -150,6 +398,20 @@ class TestDataManipulation(unittest.TestCase):
         """
         sampled_df = self.df >> pp.sample_n(3)
         self.assertEqual(len(sampled_df), 3)
+        sampled = self.df['A'] >> pp.sample_n(2, random_state=0)
+        pd.testing.assert_series_equal(sampled, self.df['A'].sample(2, random_state=0))
+        self.assertEqual(len(self.df['A'] >> pp.sample_frac(0.4, random_state=0)), 2)
+        grouped_df = self.df >> pp.group_by('B') >> pp.sample_n(1, random_state=0)
+        self.assertListEqual(sorted(grouped_df['B']), ['a', 'b', 'c'])
+        capped_df = self.df >> pp.group_by('B') >> pp.sample_n(2, random_state=0)
+        self.assertListEqual(sorted(capped_df['B']), ['a', 'a', 'b', 'b', 'c'])
+        big_df = pd.DataFrame({'A': np.arange(1000)})
+        chunked = lambda size: (big_df.iloc[i:i + size] for i in range(0, len(big_df), size))
+        stream_df = chunked(100) >> pp.sample_n(10, random_state=3)
+        self.assertEqual(len(stream_df), 10)
+        self.assertListEqual(stream_df['A'].tolist(), (chunked(37) >> pp.sample_n(10, random_state=3))['A'].tolist())
+        with self.assertRaises(TypeError):
+            5 >> pp.sample_n(1)
 
     def test_sample_frac(self):
         """
@@ -158,6 +420,10 @@ class TestDataManipulation(unittest.TestCase):
         """
         sampled_df = self.df >> pp.sample_frac(0.6)
         self.assertEqual(len(sampled_df), 3)  # As the original df has 5 rows
+        grouped_df = self.df >> pp.group_by('C') >> pp.sample_frac(0.5, random_state=0)
+        self.assertListEqual(sorted(grouped_df['C']), [1, 1, 2])
+        stream_df = [self.df, self.df] >> pp.sample_frac(1.0, random_state=0)
+        self.assertEqual(len(stream_df), 10)
 
     def test_select(self):
         """
@@ -166,7 +432,80 @@ class TestDataManipulation(unittest.TestCase):
         """
         selected_df = self.df >> pp.select('A', 'B')
         self.assertListEqual(list(selected_df.columns), ['A', 'B'])
+        with self.assertRaises(KeyError):
+            self.df >> pp.select('A', 'Z')
+
+    def test_select_helpers(self):
+        """
+        Tests selecting columns with selectors, including negation and ranges.
+        Checks that adjacent columns are returned as a view.
+        """
+        df = pd.DataFrame({'id': [1, 2], 'x_1': [1.0, 2.0], 'x_2': [3.0, 4.0], 'Y': ['a', 'b'], 'y_x': [True, False]})
+        self.assertListEqual(list((df >> pp.select(selection.starts_with('x_'))).columns), ['x_1', 'x_2'])
+        self.assertListEqual(list((df >> pp.select(selection.ends_with('X', ignore_case=True))).columns), ['y_x'])
+        self.assertListEqual(list((df >> pp.select(selection.contains('_'))).columns), ['x_1', 'x_2', 'y_x'])
+        self.assertListEqual(list((df >> pp.select(selection.matches(r'^\w_\d$'))).columns), ['x_1', 'x_2'])
+        self.assertListEqual(list((df >> pp.select(selection.of_type('number'))).columns), ['id', 'x_1', 'x_2'])
+        self.assertListEqual(list((df >> pp.select(selection.col_range('x_2', 'id'))).columns), ['id', 'x_1', 'x_2'])
+        self.assertListEqual(list((df >> pp.select(~selection.starts_with('x'))).columns), ['id', 'Y', 'y_x'])
+        self.assertListEqual(list((df >> pp.select('Y', selection.everything(), ~selection.one_of('id'))).columns),
+                             ['Y', 'x_1', 'x_2', 'y_x'])
+        self.assertListEqual(list((df >> pp.select(selection.of_type('float') & ~selection.ends_with('2'))).columns),
+                             ['x_1'])
+        for selector in (selection.contains('1\nx'), selection.starts_with('x_1\nx'), selection.ends_with('1\nx_2')):
+            # Names are searched one by one, never across adjacent names
+            self.assertListEqual(list((df >> pp.select(selector)).columns), [])
+        view_df = df >> pp.select(selection.col_range('x_1', 'x_2'))
+        self.assertTrue(np.shares_memory(view_df['x_1'].to_numpy(), df['x_1'].to_numpy()))
+
+    def test_column_search(self):
+        """
+        Tests the column_search function.
+        Checks that strings are searched as regular expressions and results keep column order.
+        """
+        self.assertListEqual(self.df >> pp.column_search('[BC]'), ['B', 'C'])
+        self.assertListEqual(self.df >> pp.column_search('C', 'A'), ['A', 'C'])
+        self.assertListEqual(self.df >> pp.column_search(selection.of_type('string')), ['B'])
+        self.assertListEqual(self.df >> pp.column_search('Z'), [])
         
+    def test_spread(self):
+        """
+        Tests the spread function.
+        Checks the wide result against pandas pivot, with a fill value and sparse output.
+        """
+        long_df = pd.DataFrame({'id': [2, 1, 1, 3], 'metric': ['x', 'y', 'x', 'z'], 'v': [10, 20, 30, 40]})
+        wide_df = long_df >> pp.spread('metric', 'v')
+        expected_df = long_df.pivot(index='id', columns='metric', values='v').reset_index()
+        expected_df.columns.name = None
+        pd.testing.assert_frame_equal(wide_df, expected_df)
+        filled_df = long_df >> pp.spread('metric', 'v', fill=0)
+        self.assertListEqual(filled_df['z'].tolist(), [0, 0, 40])
+        sparse_df = long_df >> pp.spread('metric', 'v', fill=0, sparse=True)
+        self.assertIsInstance(sparse_df['x'].dtype, pd.SparseDtype)
+        pd.testing.assert_frame_equal(sparse_df.astype({col: 'int64' for col in 'xyz'}), filled_df)
+        with self.assertRaises(ValueError):
+            pd.concat([long_df, long_df]) >> pp.spread('metric', 'v')
+
+    def test_udf(self):
+        """
+        Tests user-defined functions in summarise and mutate, with and without compilation.
+        Checks if the results match applying the plain Python functions.
+        """
+        def spread(values):
+            return values.max() - values.min()
+
+        def a_over_c(A, C):
+            return A / C if C > 1 else 0.0
+
+        for jit in (True, False):
+            spread_udf = udfs.udf(spread, kind='agg', jit=jit)
+            summarised_df = self.df >> pp.group_by('B') >> pp.summarise(A = ('A', 'sum'), R = ('A', spread_udf))
+            self.assertListEqual(list(summarised_df.columns), ['B', 'A', 'R'])
+            self.assertEqual(summarised_df['R'].tolist(), [1, 1, 0])
+            self.assertEqual(summarised_df['A'].tolist(), [3, 7, 5])
+            mutated_df = self.df >> pp.mutate(D = udfs.udf(a_over_c, kind='row', jit=jit))
+            self.assertEqual(mutated_df['D'].tolist(), [0, 0, 0, 2, 2.5])
+
     def test_summarise(self):
         """
         Tests the summarise function.
@@ -176,6 +515,14 @@ class TestDataManipulation(unittest.TestCase):
         self.assertEqual(summarised_df['A'].tolist(), [3, 7, 5])
         self.assertEqual(summarised_df['C'].tolist(), [1, 1.5, 2])
         
+    def test_tally(self):
+        """
+        Tests the tally function.
+        Checks row counts for a DataFrame and for each group.
+        """
+        self.assertListEqual((self.df >> pp.tally())['n'].tolist(), [5])
+        self.assertListEqual((self.df >> pp.group_by('B') >> pp.tally())['n'].tolist(), [2, 2, 1])
+
     def test_tail(self):
         """
         Tests the tail function.
@@ -208,7 +555,630 @@ class TestDataManipulation(unittest.TestCase):
         """
         filtered_df = self.df >> pp.where('A > 2')
         self.assertEqual(filtered_df['A'].tolist(), [3, 4, 5])
-        
+        for condition in ['A > 2 & B == "b" | C == 2', '1 < A < 5 and not B in ["a"]', 'A == [1, 5]', 'B.str.len() > 0']:
+            pd.testing.assert_frame_equal(self.df >> pp.where(condition), self.df.query(condition))
+
+
+class TestDatasets(unittest.TestCase):
+    """
+    A class for unit testing the bundled dataset loaders and their caches.
+    """
+    def setUp(self):
+        """
+        Points the on-disk dataset cache at a temporary directory.
+        """
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.old_cache_dir = os.environ.get('PANDAPLYR_CACHE_DIR')
+        os.environ['PANDAPLYR_CACHE_DIR'] = self.cache_dir.name
+        utils.clear_dataset_cache()
+
+    def tearDown(self):
+        utils.clear_dataset_cache()
+        if self.old_cache_dir is None:
+            del os.environ['PANDAPLYR_CACHE_DIR']
+        else:
+            os.environ['PANDAPLYR_CACHE_DIR'] = self.old_cache_dir
+        self.cache_dir.cleanup()
+
+    def test_read_dataset_cache(self):
+        """
+        Tests that cached reads match the CSV, keep dtypes and return independent copies.
+        """
+        first_df = utils.read_titanic_dataset()
+        self.assertEqual(len(os.listdir(self.cache_dir.name)), 1)
+        first_df.loc[0, 'age'] = -1
+        memory_df = utils.read_titanic_dataset()
+        self.assertNotEqual(memory_df.loc[0, 'age'], -1)
+        utils.clear_dataset_cache()
+        disk_df = utils.read_titanic_dataset()
+        pd.testing.assert_frame_equal(disk_df, memory_df)
+
+    def test_read_dataset_projection(self):
+        """
+        Tests that read_dataset only returns the requested rows and columns.
+        """
+        for _ in range(2):
+            df = utils.read_dataset('grades', nrows=4, columns=['Grade', 'Subject'])
+            self.assertListEqual(list(df.columns), ['Grade', 'Subject'])
+            self.assertEqual(len(df), 4)
+            utils.read_dataset('grades')
+        with self.assertRaises(KeyError):
+            utils.read_dataset('grades', columns=['Missing'])
+        with self.assertRaises(ValueError):
+            utils.read_dataset('missing')
+
+    def test_read_dataset_nrows(self):
+        """
+        Tests that nrows returns the leading rows with the full dataset's dtypes, whether the
+        cache is cold, on disk or in memory.
+        """
+        cold_df = utils.read_dataset('titanic', nrows=1)
+        self.assertEqual(len(os.listdir(self.cache_dir.name)), 1)
+        full_df = utils.read_dataset('titanic')
+        pd.testing.assert_frame_equal(cold_df, full_df.iloc[:1])
+        pd.testing.assert_frame_equal(utils.read_dataset('titanic', nrows=1), full_df.iloc[:1])
+        utils.clear_dataset_cache()
+        pd.testing.assert_frame_equal(utils.read_dataset('titanic', nrows=5, columns=['deck', 'age']),
+                                      full_df.loc[:, ['deck', 'age']].iloc[:5])
+        self.assertEqual(len(utils.read_dataset('titanic', nrows=0)), 0)
+
+    def test_clear_dataset_cache_concurrently(self):
+        """
+        Tests that removing cache files another process already removed is not an error.
+        """
+        utils.read_dataset('grades')
+        path = os.path.join(self.cache_dir.name, os.listdir(self.cache_dir.name)[0])
+        os.remove(path)
+        utils._remove_file(path)
+        utils.clear_dataset_cache(disk=True)
+
+
+class TestMaterializedSummary(unittest.TestCase):
+    """
+    A class for unit testing incrementally maintained group_by >> summarise results.
+    """
+    def setUp(self):
+        """
+        Sets up a DataFrame that is appended in batches, and the pipeline to maintain.
+        """
+        rng = np.random.default_rng(0)
+        self.df = pd.DataFrame({
+            'K': rng.choice(['a', 'b', 'c', 'd'], 500),
+            'V': rng.integers(0, 100, 500),
+            'W': rng.normal(size=500)
+        })
+        self.df.loc[7, 'W'] = np.nan
+        self.pipeline = pp.group_by('K') >> pp.summarise(
+            S = ('V', 'sum'), N = ('W', 'count'), M = ('W', 'mean'),
+            MIN = ('V', 'min'), MAX = ('W', 'max'), VAR = ('W', 'var'), STD = ('V', 'std'))
+
+    def test_append(self):
+        """
+        Tests that appending batches gives the same summary as aggregating all rows at once.
+        """
+        summary = incremental.MaterializedSummary(self.pipeline)
+        for batch in np.array_split(np.arange(len(self.df)), 6):
+            summary.append(self.df.iloc[batch])
+        pd.testing.assert_frame_equal(summary.to_frame(), self.df >> self.pipeline)
+
+    def test_large_integers(self):
+        """
+        Tests that sums and extremes of integers above 2**53 stay exact across batches.
+        """
+        df = pd.DataFrame({'K': ['a', 'a', 'b', 'a'], 'V': [2**60 + 1, 3, 2**60 + 7, 2**62 + 1]})
+        pipeline = pp.group_by('K') >> pp.summarise(S = ('V', 'sum'), MIN = ('V', 'min'), MAX = ('V', 'max'),
+                                                    M = ('V', 'mean'))
+        summary = incremental.MaterializedSummary(pipeline)
+        for i in range(len(df)):
+            summary.append(df.iloc[[i]])
+        pd.testing.assert_frame_equal(summary.to_frame(), df >> pipeline)
+        self.assertEqual(summary.to_frame()['S'].tolist(), [2**62 + 2**60 + 5, 2**60 + 7])
+
+    def test_save_and_load(self):
+        """
+        Tests that the summary state survives a round trip through disk.
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'summary.pkl')
+            summary = incremental.MaterializedSummary(self.pipeline, path=path)
+            summary.append(self.df.iloc[:250])
+            summary.save()
+            reloaded = incremental.MaterializedSummary(self.pipeline, path=path)
+            new_df = self.df.iloc[250:] >> incremental.materialize(reloaded)
+            pd.testing.assert_frame_equal(new_df, self.df >> self.pipeline)
+            with self.assertRaises(ValueError):
+                incremental.MaterializedSummary(pp.group_by('K') >> pp.summarise(S = ('V', 'sum')), path=path)
+        with self.assertRaises(ValueError):
+            incremental.MaterializedSummary(pp.group_by('K') >> pp.summarise(S = ('V', 'median')))
+
+
+class TestRunAsync(unittest.TestCase):
+    """
+    A class for unit testing the asynchronous pipeline runner.
+    """
+    def setUp(self):
+        """
+        Writes a few small CSV files to a temporary directory.
+        """
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.paths = []
+        for i in range(5):
+            path = os.path.join(self.tmp_dir.name, f'part_{i}.csv')
+            pd.DataFrame({'A': np.arange(10) + i, 'B': ['x', 'y'] * 5}).to_csv(path, index=False)
+            self.paths.append(path)
+        self.pipeline = pp.where('A > 5') >> pp.group_by('B') >> pp.summarise(N = ('A', 'count'))
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_results_match_sequential(self):
+        """
+        Tests that results come back in source order and match running each file in turn.
+        """
+        run = runner.run_pipeline(self.paths, self.pipeline, prefetch=2)
+        self.assertEqual(len(run.results), 5)
+        for path, result in zip(self.paths, run.results):
+            pd.testing.assert_frame_equal(result, pd.read_csv(path) >> self.pipeline)
+        self.assertListEqual(run.stats['count'].tolist(), [5, 5, 0])
+
+    def test_writer_and_overlap(self):
+        """
+        Tests that the writer gets every result and that reading, computing and writing overlap:
+        the first source's pipeline only finishes once the next source is being read, and its
+        write only once the next pipeline has started.
+        """
+        read_started = [threading.Event() for _ in self.paths]
+        compute_started = [threading.Event() for _ in self.paths]
+        overlaps = []
+
+        def read(path):
+            i = self.paths.index(path)
+            read_started[i].set()
+            return pd.read_csv(path).assign(I = i)
+
+        def compute(df):
+            i = df['I'].iloc[0]
+            compute_started[i].set()
+            if i == 0:
+                overlaps.append(('read', read_started[1].wait(timeout=10)))
+            return df['A']
+
+        def write(df, path):
+            if path == self.paths[0]:
+                overlaps.append(('compute', compute_started[1].wait(timeout=10)))
+            df.to_csv(path.replace('.csv', '_out.csv'), index=False)
+            return len(df)
+
+        run = runner.run_pipeline(self.paths, pp.mutate(A = compute) >> self.pipeline, prefetch=1,
+                                  reader=read, writer=write)
+        self.assertListEqual(run.results, [2] * 5)
+        self.assertTrue(all(os.path.exists(path.replace('.csv', '_out.csv')) for path in self.paths))
+        self.assertListEqual(overlaps, [('read', True), ('compute', True)])
+        self.assertListEqual(run.stats['count'].tolist(), [5, 5, 5])
+        # Reads were held back by the full queue while the first pipeline waited
+        self.assertGreater(run.stats.loc['read', 'wait_seconds'], 0)
+        self.assertTrue((run.stats['wait_seconds'] >= 0).all())
+
+    def test_errors_name_the_source(self):
+        """
+        Tests that a failing reader, pipeline or writer stops the run and names the source.
+        """
+        with self.assertRaisesRegex(RuntimeError, 'Pipeline failed on source .*part_0'):
+            runner.run_pipeline(self.paths, pp.select('Z'))
+
+        def read(path):
+            if path == self.paths[2]:
+                raise OSError('unreadable')
+            return pd.read_csv(path)
+
+        with self.assertRaisesRegex(RuntimeError, 'Reader failed on source .*part_2.*unreadable'):
+            runner.run_pipeline(self.paths, self.pipeline, reader=read)
+        with self.assertRaisesRegex(RuntimeError, 'Writer failed on source .*part_0'):
+            runner.run_pipeline(self.paths, self.pipeline, writer=lambda df, path: 1 / 0)
+        with self.assertRaises(ValueError):
+            runner.run_pipeline(self.paths, self.pipeline, prefetch=0)
+
+
+class TestScan(unittest.TestCase):
+    """
+    A class for unit testing the lazy scan_csv / scan_parquet pipeline sources.
+    """
+    def setUp(self):
+        """
+        Writes a small DataFrame to CSV and Parquet files in a temporary directory.
+        """
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.df = pd.DataFrame({
+            'A': np.arange(100),
+            'B': np.arange(100) % 7,
+            'C': ['x', 'y'] * 50,
+            'D': 1.5
+        })
+        self.csv_path = os.path.join(self.tmp_dir.name, 'df.csv')
+        self.parquet_path = os.path.join(self.tmp_dir.name, 'df.parquet')
+        self.df.to_csv(self.csv_path, index=False)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _check_scan(self, source):
+        """
+        Runs the same pipeline eagerly and through a scan and compares the results.
+        """
+        pipeline = source >> pp.where('A > 50 & C == "x"') >> pp.mutate(E = 'B * 2') >> pp.select('A', 'E')
+        self.assertListEqual(pipeline.projected_columns(), ['A', 'B', 'C'])
+        expected_df = self.df >> pp.where('A > 50 & C == "x"') >> pp.mutate(E = 'B * 2') >> pp.select('A', 'E')
+        scanned_df = pipeline >> scan.collect()
+        pd.testing.assert_frame_equal(scanned_df.reset_index(drop=True), expected_df.reset_index(drop=True))
+
+    def test_scan_csv(self):
+        """
+        Tests that scan_csv only parses the needed columns and matches an eager pipeline.
+        """
+        self._check_scan(scan.scan_csv(self.csv_path))
+        self._check_scan(scan.scan_csv(self.csv_path, chunksize=13))
+        summary = scan.scan_csv(self.csv_path) >> pp.group_by('C') >> pp.summarise(N = ('A', 'count'))
+        self.assertListEqual(summary.projected_columns(), ['A', 'C'])
+        self.assertEqual((summary >> scan.collect())['N'].tolist(), [50, 50])
+        self.assertIsNone((scan.scan_csv(self.csv_path) >> pp.distinct()).projected_columns())
+
+    @unittest.skipUnless(importlib.util.find_spec('pyarrow'), 'pyarrow is not installed')
+    def test_scan_parquet(self):
+        """
+        Tests that scan_parquet pushes simple predicates down and matches an eager pipeline.
+        """
+        self.df.to_parquet(self.parquet_path, row_group_size=10)
+        source = scan.scan_parquet(self.parquet_path)
+        filters = (source >> pp.where('3 < A and B in [1, 2]')).pushdown_filters()
+        self.assertListEqual(filters, [('A', '>', 3), ('B', 'in', [1, 2])])
+        self.assertListEqual((source >> pp.where('A > 3 | B == 1')).pushdown_filters(), [])
+        self._check_scan(source)
+        self._check_scan(scan.scan_parquet(self.parquet_path, chunksize=13))
+
+    @unittest.skipUnless(importlib.util.find_spec('pyarrow'), 'pyarrow is not installed')
+    def test_scan_parquet_literal_types(self):
+        """
+        Tests that predicates whose literal does not match the column type in the file are not
+        pushed down, and still give the eager pipeline's result.
+        """
+        df = self.df.assign(T = pd.date_range('2024-01-01', periods=100), K = self.df['C'].astype('category'),
+                            F = self.df['A'] * 0.5, G = self.df['B'] == 1)
+        df.to_parquet(self.parquet_path, row_group_size=10)
+        source = scan.scan_parquet(self.parquet_path)
+        for condition, pushed in (('T > "2024-01-05"', []), ('C == 1', []), ('A in ["1", 2]', []),
+                                  ('A == True', []), ('G == 1', []),
+                                  ('F > 3', [('F', '>', 3)]), ('K == "x"', [('K', '==', 'x')]),
+                                  ('G == True', [('G', '==', True)]), ('A in [1, 2.0]', [('A', 'in', [1, 2.0])])):
+            self.assertListEqual((source >> pp.where(condition)).pushdown_filters(), pushed, condition)
+            expected_df = df >> pp.where(condition) >> pp.select('A')
+            for chunksize in (None, 13):
+                scanned = scan.scan_parquet(self.parquet_path, chunksize=chunksize) >> pp.where(condition)
+                scanned_df = scanned >> pp.select('A') >> scan.collect()
+                self.assertListEqual(scanned_df['A'].tolist(), expected_df['A'].tolist(), condition)
+
+    @unittest.skipUnless(importlib.util.find_spec('pyarrow'), 'pyarrow is not installed')
+    def test_scan_parquet_nulls(self):
+        """
+        Tests that predicates keep the same rows as an eager pipeline when columns have nulls.
+        """
+        df = self.df.assign(B = self.df['B'].where(self.df['A'] % 5 > 0), C = self.df['C'].where(self.df['A'] % 3 > 0))
+        df.to_parquet(self.parquet_path, row_group_size=10)
+        for condition in ('B != 2', 'C != "x"', 'B not in [1, 2]', 'C not in ["y"]', 'B == 2 | B != 3'):
+            expected_df = df >> pp.where(condition) >> pp.select('A')
+            for chunksize in (None, 13):
+                source = scan.scan_parquet(self.parquet_path, chunksize=chunksize)
+                scanned_df = source >> pp.where(condition) >> pp.select('A') >> scan.collect()
+                self.assertListEqual(scanned_df['A'].tolist(), expected_df['A'].tolist(), condition)
+
+
+class TestSinks(unittest.TestCase):
+    """
+    A class for unit testing the streaming sink verbs write_parquet, write_csv and write_dataset.
+    """
+    def setUp(self):
+        """
+        Creates a temporary directory and a small DataFrame to write.
+        """
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.df = pd.DataFrame({
+            'A': np.arange(100),
+            'B': np.arange(100) % 3,
+            'C': ['x', 'y'] * 50
+        })
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _path(self, name):
+        return os.path.join(self.tmp_dir.name, name)
+
+    def _chunks(self, size=30):
+        return (self.df.iloc[start:start + size] for start in range(0, len(self.df), size))
+
+    def test_write_csv(self):
+        """
+        Tests that write_csv streams chunks with one header and reports what was written.
+        """
+        stats = self._chunks() >> sinks.write_csv(self._path('out.csv'))
+        self.assertEqual((stats.rows, stats.batches, stats.files), (100, 4, 1))
+        self.assertEqual(stats.bytes, os.path.getsize(self._path('out.csv')))
+        pd.testing.assert_frame_equal(pd.read_csv(self._path('out.csv')), self.df)
+        source_path = self._path('source.csv')
+        self.df.to_csv(source_path, index=False)
+        stats = scan.scan_csv(source_path, chunksize=40) >> pp.where('B == 1') >> sinks.write_csv(self._path('b.csv.gz'))
+        self.assertEqual((stats.rows, stats.batches), (33, 3))
+        self.assertEqual(pd.read_csv(self._path('b.csv.gz'))['B'].unique().tolist(), [1])
+
+    def test_failed_write_leaves_no_file(self):
+        """
+        Tests that a failing stream or mismatched batches leave neither the output nor a temporary file behind.
+        """
+        def failing_chunks():
+            yield self.df
+            raise RuntimeError('read failed')
+        with self.assertRaises(RuntimeError):
+            failing_chunks() >> sinks.write_csv(self._path('out.csv'))
+        with self.assertRaises(ValueError):
+            [self.df, self.df[['A']]] >> sinks.write_csv(self._path('out.csv'))
+        with self.assertRaises(TypeError):
+            'not a frame' >> sinks.write_csv(self._path('out.csv'))
+        self.assertListEqual(os.listdir(self.tmp_dir.name), [])
+
+    @unittest.skipUnless(importlib.util.find_spec('pyarrow'), 'pyarrow is not installed')
+    def test_write_parquet(self):
+        """
+        Tests that write_parquet buffers small batches into full row groups.
+        """
+        import pyarrow.parquet as pq
+        stats = self._chunks(size=15) >> sinks.write_parquet(self._path('out.parquet'), row_group_size=40)
+        self.assertEqual((stats.rows, stats.batches), (100, 7))
+        metadata = pq.ParquetFile(self._path('out.parquet')).metadata
+        self.assertListEqual([metadata.row_group(i).num_rows for i in range(metadata.num_row_groups)], [40, 40, 20])
+        pd.testing.assert_frame_equal(pd.read_parquet(self._path('out.parquet')), self.df)
+
+    @unittest.skipUnless(importlib.util.find_spec('pyarrow'), 'pyarrow is not installed')
+    def test_write_parquet_inputs(self):
+        """
+        Tests that write_parquet takes pyarrow tables, and explains batches that do not fit
+        the first batch's column types.
+        """
+        import pyarrow as pa
+        stats = pa.Table.from_pandas(self.df) >> sinks.write_parquet(self._path('table.parquet'), row_group_size=30)
+        self.assertEqual((stats.rows, stats.batches), (100, 4))
+        pd.testing.assert_frame_equal(pd.read_parquet(self._path('table.parquet')), self.df)
+        batches = [pd.DataFrame({'A': [np.nan]}), pd.DataFrame({'A': [3]})]
+        self.assertEqual((batches >> sinks.write_parquet(self._path('ints.parquet'))).rows, 2)
+        batches = [pd.DataFrame({'A': [np.nan]}), pd.DataFrame({'A': ['x']})]
+        with self.assertRaisesRegex(ValueError, "Column 'A'"):
+            batches >> sinks.write_parquet(self._path('mixed.parquet'))
+        self.assertListEqual(sorted(os.listdir(self.tmp_dir.name)), ['ints.parquet', 'table.parquet'])
+
+    @unittest.skipUnless(importlib.util.find_spec('pyarrow'), 'pyarrow is not installed')
+    def test_write_dataset(self):
+        """
+        Tests that write_dataset writes one file per partition and replaces an existing dataset.
+        """
+        path = self._path('dataset')
+        stats = self._chunks() >> sinks.write_dataset(path, partition_by=['C', 'B'])
+        self.assertEqual((stats.rows, stats.files), (100, 6))
+        self.assertListEqual(sorted(os.listdir(path)), ['C=x', 'C=y'])
+        self.assertListEqual(sorted(os.listdir(os.path.join(path, 'C=x'))), ['B=0', 'B=1', 'B=2'])
+        read_df = pd.read_parquet(path).sort_values('A').reset_index(drop=True)
+        self.assertListEqual(read_df['A'].tolist(), self.df['A'].tolist())
+        self.assertListEqual(read_df['C'].astype(str).tolist(), self.df['C'].tolist())
+        stats = self.df >> sinks.write_dataset(path, partition_by='C', format='csv')
+        self.assertEqual(stats.files, 2)
+        self.assertListEqual(os.listdir(os.path.join(path, 'C=x')), ['part-0.csv'])
+        self.assertListEqual(os.listdir(self.tmp_dir.name), ['dataset'])
+        stats = self._chunks(size=10) >> sinks.write_dataset(path, partition_by='B', format='csv', max_open_files=2)
+        self.assertEqual((stats.rows, stats.files), (100, 30))
+        self.assertListEqual(sorted(os.listdir(os.path.join(path, 'B=0')))[:3], ['part-0.csv', 'part-1.csv', 'part-2.csv'])
+        read_df = pd.concat(pd.read_csv(os.path.join(path, f'B={b}', name)).assign(B = b)
+                            for b in range(3) for name in os.listdir(os.path.join(path, f'B={b}')))
+        self.assertListEqual(sorted(read_df['A'].tolist()), self.df['A'].tolist())
+        self.assertTrue((read_df['A'] % 3 == read_df['B']).all())
+        df = pd.DataFrame({'P': ['a/b', '../c', 'd'], 'V': [1, 2, 3]})
+        stats = df >> sinks.write_dataset(path, partition_by='P')
+        self.assertListEqual(sorted(os.listdir(path)), ['P=..%2Fc', 'P=a%2Fb', 'P=d'])
+        read_df = pd.read_parquet(path).sort_values('V')
+        self.assertListEqual(read_df['P'].astype(str).tolist(), ['a/b', '../c', 'd'])
+        self.assertListEqual(os.listdir(self.tmp_dir.name), ['dataset'])
+
+
+class TestMicroBatch(unittest.TestCase):
+    """
+    A class for unit testing micro_batch() and latency_benchmark().
+    """
+    def setUp(self):
+        """
+        Creates a small request DataFrame, a lookup table and a pipeline joining them.
+        """
+        self.df = pd.DataFrame({
+            'id': np.arange(50),
+            'amount': np.arange(50) * 1.5 - 10,
+            'segment': ['a', 'b', 'c', 'z', 'b'] * 10
+        })
+        self.segments = pd.DataFrame({'segment': ['a', 'b', 'c'], 'weight': [1, 2, 3]})
+        self.pipeline = (pp.where('amount > 0 & segment != "c"') >>
+                         pp.mutate(double = 'amount * 2', flag = 1) >>
+                         pp.left_join(self.segments, on='segment') >>
+                         pp.select('id', 'double', 'flag', 'weight'))
+
+    def test_matches_pipeline(self):
+        """
+        Tests that micro-batch runs give the same result as the pipeline itself, for
+        unmatched join keys, empty results and repeated calls.
+        """
+        scorer = microbatch.micro_batch(self.pipeline, schema=self.df)
+        for size in (0, 1, 7, 50):
+            df = self.df.iloc[:size]
+            for _ in range(2):
+                pd.testing.assert_frame_equal(df >> scorer, df >> self.pipeline)
+        self.assertEqual(scorer.calls, {'arrays': 8, 'pandas': 0})
+        self.assertEqual(len(scorer.plans), 1)
+        filled = pp.Pipeline(self.pipeline.steps[:2] + [pp.left_join(self.segments, on='segment', fill_na=0)])
+        pd.testing.assert_frame_equal(microbatch.MicroBatch(filled)(self.df), self.df >> filled)
+
+    def test_fallback(self):
+        """
+        Tests that steps without an array version, and large DataFrames, run through
+        the regular verbs with the same result.
+        """
+        pipeline = (pp.mutate(double = lambda df: df['amount'] * 2) >>
+                    pp.arrange('double', ascending=False) >>
+                    pp.where('segment.str.startswith("b")'))
+        scorer = microbatch.micro_batch(pipeline)
+        pd.testing.assert_frame_equal(self.df >> scorer, self.df >> pipeline)
+        scorer = microbatch.micro_batch(self.pipeline, max_rows=10)
+        pd.testing.assert_frame_equal(scorer(self.df), self.df >> self.pipeline)
+        self.assertEqual(scorer.calls, {'arrays': 0, 'pandas': 1})
+
+    def test_latency_benchmark(self):
+        """
+        Tests that the benchmark reports p50 and p99 per verb for each size and mode.
+        """
+        report = microbatch.latency_benchmark(self.pipeline, self.df, sizes=(10, 100), repeat=5)
+        self.assertListEqual(list(report.columns), ['rows', 'mode', 'step', 'verb', 'p50_us', 'p99_us'])
+        self.assertEqual(len(report), 2 * 2 * 5)
+        self.assertSetEqual(set(report['verb']), {'where', 'mutate', 'left_join', 'select', 'total'})
+        self.assertTrue((report['p99_us'] >= report['p50_us']).all())
+
+
+class TestBackends(unittest.TestCase):
+    """
+    A class for unit testing verb dispatch and the pyarrow backend.
+    """
+    def setUp(self):
+        """
+        Creates two small DataFrames with missing values and repeated join keys.
+        """
+        self.df = pd.DataFrame({
+            'A': ['foo', 'foo', 'bar', 'bar', None, 'baz'],
+            'B': [10, 20, 30, 40, 50, np.nan],
+            'C': [1, 2, 3, 4, 5, 6]
+        })
+        self.df2 = pd.DataFrame({'A': ['foo', 'bar', 'qux', 'foo'], 'D': [1.5, 2.5, 3.5, 4.5], 'C': [9, 8, 7, 6]})
+
+    def test_register_backend(self):
+        """
+        Tests that verbs dispatch on the input type to a registered backend.
+        """
+        class Rows(list):
+            pass
+
+        class RowsBackend(backends.Backend):
+            def __init__(self):
+                super().__init__()
+                self.verbs = {pp.head.func: lambda rows, n=5: Rows(rows[:n])}
+
+        backends.register_backend(RowsBackend(), Rows)
+        self.assertListEqual(Rows(range(10)) >> pp.head(3), [0, 1, 2])
+        self.assertIsInstance(backends.get_backend(self.df), backends.PandasBackend)
+        self.assertIsNone(backends.get_backend([1, 2]))
+
+    @unittest.skipUnless(importlib.util.find_spec('pyarrow'), 'pyarrow is not installed')
+    def test_arrow_parity(self):
+        """
+        Tests that verbs on a pyarrow.Table match their pandas results.
+        """
+        from src import arrow_backend
+        import pyarrow as pa
+        table, table2 = self.df >> arrow_backend.to_arrow(), self.df2 >> arrow_backend.to_arrow()
+        pipelines = [
+            pp.where('B > 15 & A == "bar" | C == 6'),
+            pp.where('A in ["foo", "baz"] and not C > 1'),
+            pp.select('C', 'A'),
+            pp.mutate(E = 'B * 2 + C', F = 'B / C', G = 1),
+            pp.mutate(E = 'B.abs()', F = 'E + 1'),
+            pp.rename(Z = 'B'),
+            pp.arrange('C', 'desc'),
+            pp.head(2) >> pp.tail(1),
+            pp.distinct('A'),
+            pp.group_by('A') >> pp.summarise(S = ('B', 'sum'), M = ('C', 'mean'), V = ('C', 'var'),
+                                             N = ('B', 'count'), U = ('C', 'nunique')),
+            pp.group_by('A') >> pp.summarise(S = ('B', lambda x: x.sum())),
+            pp.fill_na('B', 0),
+        ]
+        for pipeline in pipelines:
+            result = table >> pipeline
+            self.assertIsInstance(result, pa.Table)
+            pd.testing.assert_frame_equal(result >> arrow_backend.to_pandas(),
+                                          (self.df >> pipeline).reset_index(drop=True), check_dtype=False)
+        for join in (pp.left_join, pp.inner_join, pp.right_join, pp.full_join):
+            pd.testing.assert_frame_equal(table >> join(table2, on='A') >> arrow_backend.to_pandas(),
+                                          self.df >> join(self.df2, on='A'), check_dtype=False)
+        no_nulls = pp.where('A == A')
+        inner_df = table >> no_nulls >> pp.inner_join(table2, on='A') >> arrow_backend.to_pandas()
+        self.assertListEqual(inner_df['B'].tolist(), [10, 10, 20, 20, 30, 40])
+        filled_df = table >> pp.full_join(table2.drop_columns(['C']), on='A', fill_na={'D': 0}) >> arrow_backend.to_pandas()
+        self.assertEqual(filled_df['D'].isna().sum(), 0)
+
+        # Missing values: != keeps them, and joins match missing keys, as in pandas
+        def rows(df):
+            df = df.reset_index(drop=True).astype(object)
+            return df.where(df.notna(), None).values.tolist()
+
+        df = pd.DataFrame({'K': ['a', None, 'b', 'a'], 'X': [5, np.nan, 1, 2]})
+        df2 = pd.DataFrame({'K': ['a', None], 'Y': [1, 2]})
+        table, table2 = df >> arrow_backend.to_arrow(), df2 >> arrow_backend.to_arrow()
+        for condition in ('X != 5', 'K != "a"', 'X != 5 & K != "b"', 'K not in ["a"]'):
+            self.assertListEqual(rows(table >> pp.where(condition) >> arrow_backend.to_pandas()),
+                                 rows(df >> pp.where(condition)), condition)
+        self.assertListEqual(rows(table >> pp.left_join(table2, on='K') >> arrow_backend.to_pandas()),
+                             rows(df >> pp.left_join(df2, on='K')))
+
+
+class TestImportTime(unittest.TestCase):
+    """
+    A class for checking that importing the package stays cheap.
+
+    The package is imported in a fresh interpreter with `python -X importtime`, which
+    reports the self and cumulative import time (in microseconds) of every module.
+    """
+    # Cumulative import time budget for the package itself, in microseconds
+    IMPORT_TIME_BUDGET_US = 50000
+
+    def _import_times(self):
+        """
+        Import the package in a subprocess and return {module name: cumulative microseconds}.
+        """
+        repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import src'],
+                                cwd=repo_root, capture_output=True, text=True, check=True)
+        times = {}
+        for line in result.stderr.splitlines():
+            if not line.startswith('import time:') or 'cumulative' in line:
+                continue
+            _, cumulative, name = line[len('import time:'):].split('|')
+            times[name.strip()] = int(cumulative)
+        return times
+
+    def test_import_is_lazy(self):
+        """
+        Tests that importing the package does not pull in numpy or pandas.
+        """
+        times = self._import_times()
+        self.assertIn('src', times)
+        self.assertNotIn('numpy', times)
+        self.assertNotIn('pandas', times)
+
+    def test_import_time_budget(self):
+        """
+        Tests that the cumulative import time of the package stays within budget.
+        """
+        times = self._import_times()
+        self.assertLess(times['src'], self.IMPORT_TIME_BUDGET_US)
+
+    def test_star_import_skips_optional_dependencies(self):
+        """
+        Tests that `from package import *` does not import the pyarrow backend, since pyarrow
+        is optional.
+        """
+        repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        code = "from src import *; import sys; print('src.arrow_backend' in sys.modules, 'to_arrow' in dir())"
+        result = subprocess.run([sys.executable, '-c', code], cwd=repo_root, capture_output=True, text=True, check=True)
+        self.assertEqual(result.stdout.split(), ['False', 'False'])
+
 
     
 